@@ -1 +1,6 @@
-from .xsession_manager import XSessionManager
+def __getattr__(name):
+    # Import XSessionManager lazily, so that the command line starts quickly if XSessionManager is not needed
+    if name == 'XSessionManager':
+        from .xsession_manager import XSessionManager
+        return XSessionManager
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
@@ -0,0 +1,152 @@
+import logging
+from enum import Enum
+from time import sleep, time
+from typing import List, Tuple
+
+from .settings.constants import MemoryAdmission
+from .settings.xsession_config import XSessionConfigObject
+from .utils.lazy_import import lazy_import
+from .utils.metrics import count_calls
+
+psutil = lazy_import('psutil')
+
+logger = logging.getLogger(__name__)
+
+MEMORY_PRESSURE_PATH = '/proc/pressure/memory'
+
+
+def read_memory_pressure(path: str = MEMORY_PRESSURE_PATH) -> float:
+    """
+    :return: the percent of time in the last 10 seconds some tasks were stalled on memory,
+             or None if pressure stall information is not supported by the kernel
+    """
+    try:
+        with open(path, 'r') as f:
+            # some avg10=0.00 avg60=0.00 avg300=0.00 total=0
+            # full avg10=0.00 avg60=0.00 avg300=0.00 total=0
+            for line in f:
+                fields = line.split()
+                if len(fields) > 1 and fields[0] == 'some':
+                    return float(fields[1].split('=')[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def _mib(size: int) -> int:
+    return size // (1024 * 1024)
+
+
+class Admission(Enum):
+    ADMITTED = 'admitted'
+    NOT_ENOUGH_MEMORY = 'not enough memory'
+    NEVER_FITS = 'larger than the memory of this machine'
+
+
+class AdmissionController:
+    """
+    Hold launching apps until there is enough memory for them, to avoid swapping hard while restoring a big session.
+
+    The memory an app takes is estimated from its saved memory_percent, scaled by the total memory of the machine
+    which saved the session. Apps launched recently but not having taken their memory yet are counted in as well.
+    """
+
+    def __init__(self,
+                 saved_total_memory: int = None,
+                 reserve_fraction: float = MemoryAdmission.RESERVE_FRACTION,
+                 pressure_threshold: float = MemoryAdmission.PRESSURE_THRESHOLD,
+                 max_wait: float = MemoryAdmission.MAX_WAIT,
+                 poll_interval: float = MemoryAdmission.POLL_INTERVAL,
+                 settle_time: float = MemoryAdmission.SETTLE_TIME):
+        """
+        :param saved_total_memory: the total memory of the machine which saved the session in bytes,
+                                   assume it is this machine if None
+        """
+        self.total_memory: int = psutil.virtual_memory().total
+        self.saved_total_memory = saved_total_memory if saved_total_memory else self.total_memory
+        self.reserve = int(self.total_memory * reserve_fraction)
+        self.pressure_threshold = pressure_threshold
+        self.max_wait = max_wait
+        self.poll_interval = poll_interval
+        self.settle_time = settle_time
+
+        # (app, estimated footprint, launched at)
+        self._launched_apps: List[Tuple[XSessionConfigObject, int, float]] = []
+        # (app, admission, estimated footprint)
+        self.rejected_apps: List[Tuple[XSessionConfigObject, Admission, int]] = []
+
+    def estimate_footprint(self, app: XSessionConfigObject) -> int:
+        """
+        :return: the memory the app is expected to take in bytes
+        """
+        memory_percent = getattr(app, 'memory_percent', None) or 0.0
+        return int(memory_percent / 100 * self.saved_total_memory)
+
+    def get_headroom(self) -> int:
+        """
+        :return: the memory which can be taken by apps to be launched in bytes, could be negative
+        """
+        count_calls('psutil')
+        return psutil.virtual_memory().available - self._get_pending_memory() - self.reserve
+
+    def _get_pending_memory(self) -> int:
+        """
+        :return: the memory which apps launched recently are expected to take but have not taken yet
+        """
+        now = time()
+        self._launched_apps = [launched_app for launched_app in self._launched_apps
+                               if now - launched_app[2] < self.settle_time]
+        pending_memory = 0
+        for app, footprint, _ in self._launched_apps:
+            rss = 0
+            # The pid of an app launched via Gio is set asynchronously
+            if app.pid:
+                count_calls('psutil')
+                try:
+                    rss = psutil.Process(app.pid).memory_info().rss
+                except psutil.Error:
+                    pass
+            pending_memory += max(footprint - rss, 0)
+        return pending_memory
+
+    def admit(self, app: XSessionConfigObject) -> Admission:
+        """
+        Wait until there is enough memory to launch the app, or until max_wait.
+        """
+        footprint = self.estimate_footprint(app)
+        if footprint > self.total_memory - self.reserve:
+            admission = Admission.NEVER_FITS
+        else:
+            deadline = time() + self.max_wait
+            waiting = False
+            while True:
+                headroom = self.get_headroom()
+                pressure = read_memory_pressure()
+                if footprint <= headroom and (pressure is None or pressure < self.pressure_threshold):
+                    return Admission.ADMITTED
+                if time() >= deadline:
+                    admission = Admission.NOT_ENOUGH_MEMORY
+                    break
+                if not waiting:
+                    logger.info('Waiting for memory to launch %s, needs about %d MiB, %d MiB available%s',
+                                app.app_name,
+                                _mib(footprint),
+                                max(_mib(headroom), 0),
+                                '' if pressure is None else ', memory pressure %.2f%%' % pressure)
+                    waiting = True
+                sleep(self.poll_interval)
+
+        self.rejected_apps.append((app, admission, footprint))
+        return admission
+
+    def launched(self, app: XSessionConfigObject):
+        self._launched_apps.append((app, self.estimate_footprint(app), time()))
+
+    def print_rejected_apps(self, session_name: str):
+        if len(self.rejected_apps) == 0:
+            return
+        logger.warning('%d application(s) were not restored due to memory:', len(self.rejected_apps))
+        for app, admission, footprint in self.rejected_apps:
+            logger.info('    %s: needs about %d MiB, %s', app.app_name, _mib(footprint), admission.value)
+        logger.info('Restore them later by `xsm -r %s -i %s`, add --ignore-memory to launch them regardless of memory',
+                    session_name, ' '.join(app.app_name for app, _, _ in self.rejected_apps))
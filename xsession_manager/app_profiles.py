@@ -0,0 +1,126 @@
+import json
+import logging
+import os
+import statistics
+import threading
+from pathlib import Path
+from typing import Dict, List
+
+from .settings.constants import StartupProfiles
+
+logger = logging.getLogger(__name__)
+
+
+class StartupSample:
+    """
+    How long an app took to start up in one restore, in seconds since it was launched.
+    """
+
+    def __init__(self, first_window: float, placed: float, timed_out: bool = False):
+        """
+        :param first_window: until its first window was mapped, None if no window was mapped
+        :param placed: until all of its windows were placed, or until giving up
+        :param timed_out: some of its windows were not placed in time, so placed is a lower bound
+        """
+        self.first_window = first_window
+        self.placed = placed
+        self.timed_out = timed_out
+
+    def to_dict(self) -> dict:
+        return {'first_window': self.first_window, 'placed': self.placed, 'timed_out': self.timed_out}
+
+    @staticmethod
+    def from_dict(d: dict) -> 'StartupSample':
+        return StartupSample(d.get('first_window'), d['placed'], d.get('timed_out', False))
+
+
+class AppProfile:
+    """
+    The startup latencies of an app in recent restores.
+    """
+
+    def __init__(self, samples: List[StartupSample] = None, max_samples: int = StartupProfiles.MAX_SAMPLES):
+        self.samples: List[StartupSample] = samples if samples else []
+        self.max_samples = max_samples
+
+    def add(self, sample: StartupSample):
+        self.samples.append(sample)
+        del self.samples[:-self.max_samples]
+
+    def get_launch_interval(self, default: float) -> float:
+        """
+        How long to wait before launching the next app.
+
+        Typically a fraction of the time the app takes to map its first window, so that a fast app does not hold
+        the next one for the whole default interval, while a slow app never holds it longer than that.
+        """
+        first_window_latencies = [sample.first_window for sample in self.samples if sample.first_window is not None]
+        if len(first_window_latencies) == 0 or default <= StartupProfiles.MIN_LAUNCH_INTERVAL:
+            return default
+        launch_interval = statistics.median(first_window_latencies) * StartupProfiles.LAUNCH_INTERVAL_FRACTION
+        return min(max(launch_interval, StartupProfiles.MIN_LAUNCH_INTERVAL), default)
+
+    def get_move_timeout(self, default: float) -> float:
+        """
+        How long to wait for the windows of the app to be placed.
+
+        Based on the longest time it took recently, so that an app which was slow once is not given up early.
+        """
+        if len(self.samples) == 0:
+            return default
+        move_timeout = max(sample.placed for sample in self.samples) * StartupProfiles.MOVE_TIMEOUT_FACTOR \
+            + StartupProfiles.MOVE_TIMEOUT_MARGIN
+        return min(max(move_timeout, StartupProfiles.MIN_MOVE_TIMEOUT), StartupProfiles.MAX_MOVE_TIMEOUT)
+
+
+class AppProfileStore:
+    """
+    The startup profiles of apps keyed by app name, kept in a small JSON file.
+    """
+
+    def __init__(self, path: Path = None):
+        """
+        :param path: where the profiles are saved, not saved if None
+        """
+        self.path = path
+        self.profiles: Dict[str, AppProfile] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def load(path: Path) -> 'AppProfileStore':
+        """
+        Load the profiles, start over if the file does not exist or is broken.
+        """
+        store = AppProfileStore(path)
+        try:
+            with open(path, 'r') as file:
+                apps: Dict[str, list] = json.load(file)['apps']
+            for app_name, samples in apps.items():
+                store.profiles[app_name] = AppProfile([StartupSample.from_dict(sample) for sample in samples])
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.warning('Ignored the broken app profiles [%s]: %s', path, e)
+            store.profiles.clear()
+        return store
+
+    def get(self, app_name: str) -> AppProfile:
+        with self._lock:
+            return self.profiles.get(app_name) or AppProfile()
+
+    def record(self, app_name: str, sample: StartupSample):
+        with self._lock:
+            self.profiles.setdefault(app_name, AppProfile()).add(sample)
+
+    def save(self):
+        if self.path is None:
+            return
+        with self._lock:
+            apps = {app_name: [sample.to_dict() for sample in profile.samples]
+                    for app_name, profile in self.profiles.items()}
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file and rename it, so that the profiles being read are never half written
+        temp_path = Path(str(self.path) + '.tmp')
+        with open(temp_path, 'w') as file:
+            json.dump({'apps': apps}, file, indent=4, sort_keys=True)
+        os.replace(temp_path, self.path)
@@ -1,4 +1,5 @@
 import json
+import logging
 import os
 import sys
 from pathlib import Path
@@ -6,15 +7,17 @@ from pathlib import Path
 from types import SimpleNamespace as Namespace
 
 import argparse
-from typing import List
+from typing import Any, Dict, List
 
-from .gui.askyesno_dialog import create_askyesno_dialog
-from .session_filter import ExcludeSessionFilter, IncludeSessionFilter
+from . import commands
+from .daemon import DaemonClient
+from .session_filter import ExcludeSessionFilter, IncludeSessionFilter, SessionMatcher
 from .settings import constants
 from .settings.constants import Locations
 from .settings.xsession_config import XSessionConfigObject, XSessionConfig
 from .utils import string_utils, wmctl_wrapper
-from .xsession_manager import XSessionManager
+
+logger = logging.getLogger(__name__)
 
 
 class ArgumentsHandler():
@@ -29,20 +32,23 @@ class ArgumentsHandler():
         restore = self.args.restore
         list_sessions = self.args.list
         detail = self.args.detail
+        restore_report = self.args.restore_report
         close_all = self.args.close_all
         pop_up_a_dialog_to_restore = self.args.pr
         move_automatically = self.args.move_automatically
+        daemon = self.args.daemon
+        autosave = self.args.autosave
+        status = self.args.status
+        cancel = self.args.cancel
         
         verbose = self.args.verbose
         vv = self.args.vv
 
-        if verbose:
-            print('Namespace object before handling by this program: ' + str(self.args))
+        logger.debug('Namespace object before handling by this program: %s', self.args)
 
         # Need to deal with this kind of case when user type -s' '
         argv = [a.strip() for a in sys.argv[1:]]
-        if verbose:
-            print('Arguments input by user: ' + str(argv))
+        logger.debug('Arguments input by user: %s', argv)
             
         if string_utils.empty_string(save) \
                 and ('-s' in argv or '--save' in argv):
@@ -60,18 +66,101 @@ class ArgumentsHandler():
                 and ('-t' in argv or '--detail' in argv):
             self.args.detail = Locations.DEFAULT_SESSION_NAME
             detail = self.args.detail
+        if string_utils.empty_string(restore_report) \
+                and '--restore-report' in argv:
+            self.args.restore_report = Locations.DEFAULT_SESSION_NAME
+            restore_report = self.args.restore_report
         if string_utils.empty_string(move_automatically) \
                 and ('-ma' in argv or '--move-automatically' in argv):
             self.args.move_automatically = Locations.DEFAULT_SESSION_NAME
             move_automatically = self.args.move_automatically
+        if string_utils.empty_string(autosave) \
+                and ('-as' in argv or '--autosave' in argv):
+            self.args.autosave = Locations.DEFAULT_SESSION_NAME
+            autosave = self.args.autosave
 
         # -im/--including-apps-with-multiple-windows can only be used along with -c/--close-all
         if ('-im' in argv or '--including-apps-with-multiple-windows' in argv) and not ('-c' in argv or '--close-all' in argv):
             raise argparse.ArgumentTypeError('argument -im/--including-apps-with-multiple-windows : '
                                             'only allowed with -c/--close-all')
+        if ('-cb' in argv or '--close-batch-size' in argv) and not ('-c' in argv or '--close-all' in argv):
+            raise argparse.ArgumentTypeError('argument -cb/--close-batch-size : '
+                                            'only allowed with -c/--close-all')
+        if ('-ct' in argv or '--close-timeout' in argv) and not ('-c' in argv or '--close-all' in argv):
+            raise argparse.ArgumentTypeError('argument -ct/--close-timeout : '
+                                            'only allowed with -c/--close-all')
+        if ('-rw' in argv or '--workspace-first' in argv) \
+                and not ('-r' in argv or '--restore' in argv or '-pr' in argv):
+            raise argparse.ArgumentTypeError('argument -rw/--workspace-first : '
+                                            'only allowed with -r/--restore or -pr')
+        if ('-rp' in argv or '--prefetch' in argv) and not ('-r' in argv or '--restore' in argv or '-pr' in argv):
+            raise argparse.ArgumentTypeError('argument -rp/--prefetch : '
+                                            'only allowed with -r/--restore or -pr')
+        if ('-rs' in argv or '--stage-priorities' in argv) \
+                and not ('-r' in argv or '--restore' in argv or '-pr' in argv):
+            raise argparse.ArgumentTypeError('argument -rs/--stage-priorities : '
+                                            'only allowed with -r/--restore or -pr')
+        if '--ignore-memory' in argv and not ('-r' in argv or '--restore' in argv or '-pr' in argv):
+            raise argparse.ArgumentTypeError('argument --ignore-memory : '
+                                            'only allowed with -r/--restore or -pr')
+        if ('-rmin' in argv or '--min-restoring-interval' in argv or '-rmax' in argv
+                or '--max-restoring-interval' in argv) \
+                and not ('-r' in argv or '--restore' in argv or '-pr' in argv):
+            raise argparse.ArgumentTypeError('argument -rmin/--min-restoring-interval, -rmax/--max-restoring-interval : '
+                                            'only allowed with -r/--restore or -pr')
+        min_restoring_interval = self.args.min_restoring_interval
+        max_restoring_interval = self.args.max_restoring_interval
+        if self.args.restoring_interval < 0 \
+                or (min_restoring_interval is not None and min_restoring_interval < 0) \
+                or (max_restoring_interval is not None and max_restoring_interval < 0):
+            raise argparse.ArgumentTypeError('argument -ri, -rmin, -rmax : '
+                                            'must not be negative')
+        if min_restoring_interval is not None and max_restoring_interval is not None \
+                and min_restoring_interval > max_restoring_interval:
+            raise argparse.ArgumentTypeError('argument -rmin/--min-restoring-interval : '
+                                            'must not be greater than -rmax/--max-restoring-interval')
+        if self.args.profile and not (save or restore or close_all is not None or pop_up_a_dialog_to_restore
+                                      or move_automatically):
+            raise argparse.ArgumentTypeError('argument --profile : '
+                                            'only allowed with -s/--save, -c/--close-all, -r/--restore, -pr '
+                                            'or -ma/--move-automatically')
+        if self.args.profile_output is not None:
+            if not self.args.profile:
+                raise argparse.ArgumentTypeError('argument --profile-output : '
+                                                'only allowed with --profile')
+            # The daemon may run in another directory
+            self.args.profile_output = os.path.abspath(self.args.profile_output)
+        if self.args.metrics_file is not None:
+            if not (save or restore or close_all is not None or pop_up_a_dialog_to_restore or move_automatically):
+                raise argparse.ArgumentTypeError('argument --metrics-file : '
+                                                'only allowed with -s/--save, -c/--close-all, -r/--restore, -pr '
+                                                'or -ma/--move-automatically')
+            self.args.metrics_file = os.path.abspath(self.args.metrics_file)
+        for option, patterns in (('-x/--exclude', self.args.exclude),
+                                 ('-i/--include', self.args.include),
+                                 ('-rs/--stage-priorities', self.args.stage_priorities),
+                                 ('-c/--close-all', close_all)):
+            try:
+                SessionMatcher(patterns)
+            except ValueError as e:
+                raise argparse.ArgumentTypeError('argument %s : %s' % (option, e))
+        if self.args.close_batch_size < 1:
+            raise argparse.ArgumentTypeError('argument -cb/--close-batch-size : '
+                                            'must be at least 1')
 
-        if verbose:
-            print('Namespace object after handling by this program: ' + str(self.args))
+        logger.debug('Namespace object after handling by this program: %s', self.args)
+
+        if (daemon or autosave) \
+                and (save or restore or close_all is not None or pop_up_a_dialog_to_restore or move_automatically
+                     or list_sessions or detail or restore_report):
+            raise argparse.ArgumentTypeError('argument --daemon, -as/--autosave : '
+                                            'not allowed with any other operation except each other')
+
+        if (status or cancel is not None) \
+                and (save or restore or close_all is not None or pop_up_a_dialog_to_restore or move_automatically
+                     or list_sessions or detail or restore_report or daemon or autosave):
+            raise argparse.ArgumentTypeError('argument --status, --cancel : '
+                                            'not allowed with any other operation except each other')
 
         if save or restore or close_all:
             if list_sessions:
@@ -80,6 +169,9 @@ class ArgumentsHandler():
             if detail:
                 raise argparse.ArgumentTypeError('argument -t/--detail : '
                                                 'not allowed with any argument of -s/--save, -r/--restore, -c/--close-all')
+            if restore_report:
+                raise argparse.ArgumentTypeError('argument --restore-report : '
+                                                'not allowed with any argument of -s/--save, -r/--restore, -c/--close-all')
             if pop_up_a_dialog_to_restore:
                 raise argparse.ArgumentTypeError('argument -pr : '
                                                 'not allowed with any argument of -s/--save, -r/--restore, -c/--close-all')
@@ -96,13 +188,60 @@ class ArgumentsHandler():
             else:
                 break
         
-        if self.args.verbose:
-            print('Your answer is: %s' % ('N' if answer.strip() == '' else answer.strip()))
+        logger.debug('Your answer is: %s', 'N' if answer.strip() == '' else answer.strip())
             
         if str.lower(answer.strip()) in ['n', '']:
             sys.exit(1)
 
 
+    def _run_command(self, command: str, resources: Dict[str, Any]=None, **options):
+        """
+        Run a command by the daemon if it is running, otherwise in this process.
+
+        :param resources: the resources to run the command with in this process, see XSessionManager.__init__()
+        """
+        if self.args.profile:
+            options.update(profile=True, profile_output=self.args.profile_output)
+        if self.args.metrics_file:
+            options.update(metrics_file=self.args.metrics_file)
+        exit_code = DaemonClient().request(command, options, self.args.verbose, self.args.vv)
+        if exit_code is None:
+            logger.debug('The daemon is not running, run %s in this process', command)
+            commands.run_command(command, options, self.args.verbose, self.args.vv, **(resources or {}))
+        elif exit_code != 0:
+            sys.exit(exit_code)
+
+    def _run_main_loop(self):
+        """
+        Run the daemon or the autosave or both until being interrupted.
+        """
+        # Import lazily, they import gi
+        from .autosave import AutoSaver
+        from .daemon import XSessionManagerDaemon
+        from .utils.main_loop import run_main_loop
+        from .xsession_manager import XSessionManager
+
+        daemon: XSessionManagerDaemon = None
+        if self.args.daemon:
+            daemon = XSessionManagerDaemon(verbose=self.args.verbose)
+            daemon.start()
+        if self.args.autosave:
+            xsm = XSessionManager(verbose=self.args.verbose,
+                                  vv=self.args.vv,
+                                  **(daemon.resources if daemon else {}))
+            auto_saver = AutoSaver(xsm,
+                                   self.args.autosave,
+                                   session_filters=[IncludeSessionFilter(self.args.include),
+                                                    ExcludeSessionFilter(self.args.exclude)],
+                                   # Do not save a session which is being restored
+                                   is_paused=(lambda: daemon.busy) if daemon else None)
+            auto_saver.start()
+        try:
+            run_main_loop()
+        finally:
+            if daemon:
+                daemon.close()
+
     def handle_arguments(self):
         session_name_for_saving: str = self.args.save
         session_name_for_restoring: str = self.args.restore
@@ -110,30 +249,35 @@ class ArgumentsHandler():
         session_details = self.args.detail
         close_all: list = self.args.close_all
         pop_up_a_dialog_to_restore = self.args.pr
-        restoring_interval: int = self.args.restoring_interval
+        restoring_interval: float = self.args.restoring_interval
         exclude: list = self.args.exclude
         include: list = self.args.include
         move_automatically = self.args.move_automatically
         including_apps_with_multiple_windows = self.args.including_apps_with_multiple_windows
 
+        if self.args.daemon or self.args.autosave:
+            self._run_main_loop()
+            return
+
         if session_name_for_saving:
             print(constants.Prompts.MSG_SAVE % session_name_for_saving)
             self.wait_for_answer()
-            xsm = XSessionManager(verbose=self.args.verbose, vv=self.args.vv)
-            xsm.save_session(session_name_for_saving)
+            self._run_command(commands.SAVE,
+                              session_name=session_name_for_saving,
+                              include=include,
+                              exclude=exclude)
 
         # Empty close_all means close all windows
         if close_all is not None:
             print(constants.Prompts.MSG_CLOSE_ALL_WINDOWS)
             self.wait_for_answer()
-            # TODO Order sensitive?
-            xsm = XSessionManager(verbose=self.args.verbose,
-                                  vv=self.args.vv,
-                                  session_filters=[IncludeSessionFilter(close_all),
-                                                   IncludeSessionFilter(include),
-                                                   ExcludeSessionFilter(exclude)])
-            xsm.close_windows(including_apps_with_multiple_windows)
-            print('Done!')
+            self._run_command(commands.CLOSE,
+                              close_all=close_all,
+                              include=include,
+                              exclude=exclude,
+                              including_apps_with_multiple_windows=including_apps_with_multiple_windows,
+                              close_batch_size=self.args.close_batch_size,
+                              close_timeout=self.args.close_timeout)
 
         if session_name_for_restoring:
             if self.args.vv:
@@ -145,18 +289,41 @@ class ArgumentsHandler():
                         
             print(constants.Prompts.MSG_RESTORE % session_name_for_restoring)
             self.wait_for_answer()
-            xsm = XSessionManager(verbose=self.args.verbose,
-                                  vv=self.args.vv,
-                                  session_filters=[IncludeSessionFilter(include),
-                                                   ExcludeSessionFilter(exclude)])
-            xsm.restore_session(session_name_for_restoring, restoring_interval)
+            self._run_command(commands.RESTORE,
+                              session_name=session_name_for_restoring,
+                              restoring_interval=restoring_interval,
+                              workspace_first=self.args.workspace_first,
+                              ignore_memory=self.args.ignore_memory,
+                              min_restoring_interval=self.args.min_restoring_interval,
+                              max_restoring_interval=self.args.max_restoring_interval,
+                              prefetch=self.args.prefetch,
+                              stage_priorities=self.args.stage_priorities,
+                              include=include,
+                              exclude=exclude)
 
         if pop_up_a_dialog_to_restore:
+            warm_up = None
+            # The daemon is warm already
+            if not DaemonClient().is_running():
+                # Get ready while the dialog counts down, including importing tkinter
+                warm_up = commands.RestoreWarmUp(pop_up_a_dialog_to_restore, prefetch=self.args.prefetch).start()
+            # Import lazily, tkinter is only needed by -pr
+            from .gui.askyesno_dialog import create_askyesno_dialog
             answer = create_askyesno_dialog(constants.Prompts.MSG_POP_UP_A_DIALOG_TO_RESTORE
                                             % pop_up_a_dialog_to_restore)
             if answer:
-                xsm = XSessionManager(verbose=self.args.verbose, vv=self.args.vv)
-                xsm.restore_session(pop_up_a_dialog_to_restore, restoring_interval)
+                self._run_command(commands.RESTORE,
+                                  resources=warm_up.get_resources() if warm_up else None,
+                                  session_name=pop_up_a_dialog_to_restore,
+                                  restoring_interval=restoring_interval,
+                                  workspace_first=self.args.workspace_first,
+                                  ignore_memory=self.args.ignore_memory,
+                                  min_restoring_interval=self.args.min_restoring_interval,
+                                  max_restoring_interval=self.args.max_restoring_interval,
+                                  prefetch=self.args.prefetch,
+                                  stage_priorities=self.args.stage_priorities,
+                                  include=include,
+                                  exclude=exclude)
 
         # Sort sessions based on modification time in ascending order
         if list_sessions:
@@ -183,8 +350,7 @@ class ArgumentsHandler():
                 
         if session_details:
             session_path = Path(constants.Locations.BASE_LOCATION_OF_SESSIONS, session_details)
-            if self.args.verbose:
-                print('Looking for session located [%s] ' % session_path)
+            logger.debug('Looking for session located [%s] ', session_path)
             if not session_path.exists():
                 print('[%s] not found.' % session_path)
                 return
@@ -232,9 +398,25 @@ class ArgumentsHandler():
                                 print('%s: %s' % (ordered_key.replace('_', ' '), value))
                     print()
 
+        if self.args.restore_report:
+            # Import lazily, it is only needed by --restore-report
+            from .restore_report import print_summary
+            print()
+            print_summary(Locations.RESTORE_REPORTS, self.args.restore_report)
+
+        if self.args.cancel is not None:
+            from .restore_job import CANCEL, print_statuses, request_jobs
+            statuses = request_jobs(CANCEL, self.args.cancel or None)
+            if len(statuses) == 0 and self.args.cancel:
+                print('No session is being restored as %s.' % self.args.cancel)
+            else:
+                print_statuses(statuses)
+        elif self.args.status:
+            from .restore_job import print_statuses, request_jobs
+            print_statuses(request_jobs())
+
         if move_automatically:
-            xsm = XSessionManager(verbose=self.args.verbose,
-                                  vv=self.args.vv,
-                                  session_filters=[IncludeSessionFilter(include),
-                                                   ExcludeSessionFilter(exclude)])
-            xsm.move_window(move_automatically)
+            self._run_command(commands.MOVE,
+                              session_name=move_automatically,
+                              include=include,
+                              exclude=exclude)
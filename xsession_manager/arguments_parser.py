@@ -1,5 +1,6 @@
 import argparse
 import sys
+from .settings.constants import LaunchPacing
 from .version import __version__
 
 
@@ -21,14 +22,52 @@ class ArgumentsParser:
         parser.add_argument('-im', '--including-apps-with-multiple-windows',
                             action='store_true',
                             help='Close the windows gracefully including apps with multiple windows')
+        parser.add_argument('-cb', '--close-batch-size', type=int,
+                            default=10,
+                            help='The max number of windows being closed at the same time, '
+                                 'only allowed with -c/--close-all. The default is 10.')
+        parser.add_argument('-ct', '--close-timeout', type=float,
+                            default=10,
+                            help='How long to wait for a window to be closed, in seconds. '
+                                 'Windows still open after it are reported, '
+                                 'only allowed with -c/--close-all. The default is 10 seconds.')
         parser.add_argument('-r', '--restore',
                             nargs='?',
                             help='Restore a session gracefully. '
                                  'Restore the default session if not specified a session name.')
-        parser.add_argument('-ri', '--restoring-interval', type=int,
+        parser.add_argument('-ri', '--restoring-interval', type=float,
                             default=0.5,
-                            help='Specify the interval between restoring applications, in seconds. '
-                                 'The default is 2 seconds. ')
+                            help='Specify the interval between restoring applications at normal loads, in seconds. '
+                                 'It is shortened on an idle system and lengthened on a loaded one, '
+                                 'within -rmin and -rmax. The default is 0.5 seconds.')
+        parser.add_argument('-rmin', '--min-restoring-interval', type=float,
+                            help='The shortest interval between restoring applications, in seconds. '
+                                 'The default is %s seconds.' % LaunchPacing.MIN_INTERVAL)
+        parser.add_argument('-rmax', '--max-restoring-interval', type=float,
+                            help='The longest interval between restoring applications, in seconds. '
+                                 'The default is %s seconds. Set -rmin and -rmax to the same value '
+                                 'for a fixed interval.' % LaunchPacing.MAX_INTERVAL)
+        parser.add_argument('-rw', '--workspace-first',
+                            action='store_true',
+                            help='Restore the apps on the current workspace first. Restore the apps on other '
+                                 'workspaces once the system is idle, or once you switch to their workspaces. '
+                                 'Only allowed with -r/--restore or -pr.')
+        parser.add_argument('-rp', '--prefetch',
+                            action='store_true',
+                            help='Read the executables and shared libraries of apps into the page cache in the '
+                                 'background before launching them, which speeds up restoring after a cold boot. '
+                                 'Only allowed with -r/--restore or -pr.')
+        parser.add_argument('-rs', '--stage-priorities',
+                            nargs='*',
+                            help='Launch the apps on the current workspace, and the apps specified if any, first '
+                                 'at normal priority. Launch the others at lower CPU and I/O priority until their '
+                                 'windows are placed or the former are restored. Apps are specified the same as -i. '
+                                 'Only allowed with -r/--restore or -pr.')
+        parser.add_argument('--ignore-memory',
+                            action='store_true',
+                            help='Launch apps regardless of the available memory when restoring. By default, '
+                                 'launching an app is held until there is enough memory for it, according to '
+                                 'the memory it took when saving. Only allowed with -r/--restore or -pr.')
 
         parser.add_argument('-pr',
                             nargs='?',
@@ -38,6 +77,22 @@ class ArgumentsParser:
         parser.add_argument('-t', '--detail',
                             nargs='?',
                             help='Check out the details of a session.')
+        parser.add_argument('--restore-report',
+                            nargs='?',
+                            help='Summarize the p50 and p95 latencies of restoring the apps of a session in recent '
+                                 'restores, from launching them to placing their windows, and the failures. '
+                                 'The default session is `xsession-default`.')
+
+        parser.add_argument('--status',
+                            action='store_true',
+                            help='Print how far along the sessions being restored are, such as the apps launched '
+                                 'and the windows placed so far.')
+        parser.add_argument('--cancel',
+                            nargs='?',
+                            const='',
+                            help='Cancel restoring a session, given its job name printed by --status or its session '
+                                 'name. The apps launched keep running, but no more apps are launched and no more '
+                                 'windows are moved. Cancel all sessions being restored if not specified.')
 
         # -x [<window_id>|<pid>|<app_name> or <title_name>]
         parser.add_argument('-x', '--exclude',
@@ -45,13 +100,16 @@ class ArgumentsParser:
                             nargs='+',
                             help='Exclude apps from the operation according to '
                                  '<window_id>, <pid>, <app_name> or <title_name>. '
+                                 'Prefix a pattern with app:, title: or cmd: to match the app name, the window title '
+                                 'or the command line only. A pattern is a substring, a glob like fire* or a regular '
+                                 'expression like /^gedit$/, ignoring case. '
                                  'Require at least one value')
         # -i [<window_id>|<pid>|<app_name> or <title_name>]
         parser.add_argument('-i', '--include',
                             # Require at least one value
                             nargs='+',
                             help='Include apps from the operation according to '
-                                 '<window_id>, <pid>, <app_name> or <title_name>. '
+                                 '<window_id>, <pid>, <app_name> or <title_name>, the same as -x. '
                                  'Require at least one value')
 
         parser.add_argument('-ma', '--move-automatically',
@@ -59,6 +117,38 @@ class ArgumentsParser:
                             help='Auto move windows to specified workspaces according to a saved session. '
                                  'The default session is `xsession-default`')
 
+        parser.add_argument('-as', '--autosave',
+                            nargs='?',
+                            help='Save the session automatically once windows are opened, closed, moved or resized, '
+                                 'until being interrupted. Save to the default session if not specified a session '
+                                 'name. Can be used along with --daemon.')
+
+        parser.add_argument('--daemon',
+                            action='store_true',
+                            help='Run in the foreground as a daemon, which keeps the windows, the apps and the '
+                                 'sessions cached, so that -s, -c, -r, -pr and -ma run faster. '
+                                 'These commands are sent to the daemon over a unix socket in $XDG_RUNTIME_DIR '
+                                 'if it is running, otherwise they run by themselves.')
+
+        parser.add_argument('--profile',
+                            action='store_true',
+                            help='Print how long each phase took, and each app in each phase of restoring it, '
+                                 'once done. A session is restored in the foreground then. Only allowed with '
+                                 '-s/--save, -c/--close-all, -r/--restore, -pr or -ma/--move-automatically.')
+        parser.add_argument('--profile-output',
+                            help='Write the profile to a file as well. A file ending with .json is written as '
+                                 'Chrome trace events, open it in chrome://tracing or https://ui.perfetto.dev. '
+                                 'Otherwise it is written by cProfile, open it by `python -m pstats`. '
+                                 'Only allowed with --profile.')
+
+        parser.add_argument('--metrics-file',
+                            help='Add the metrics of saving, restoring, closing and moving windows to a file in the '
+                                 'Prometheus text format after each of them, such as how long they took, the apps '
+                                 'launched, skipped and failed, and how long placing windows took. Point the '
+                                 'textfile collector of node_exporter to its directory, the file name must end with '
+                                 '.prom. Only allowed with -s/--save, -c/--close-all, -r/--restore, -pr or '
+                                 '-ma/--move-automatically.')
+
         parser.add_argument('--version',
                             action='version',
                             version=__version__)
@@ -69,6 +159,10 @@ class ArgumentsParser:
         parser.add_argument('-vv',
                             action='store_true',
                             help='Print more debugging information, could contain sensitive info')
+        parser.add_argument('--log-file',
+                            help='Write the log to a file as JSON lines as well, including the debugging '
+                                 'information even without -v/--verbose, and more if -vv is given. A command run by '
+                                 'the daemon is logged to the log file of the daemon.')
         
         if len(sys.argv) == 1:
             print('No arguments provided.\n')
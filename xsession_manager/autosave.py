@@ -0,0 +1,167 @@
+import logging
+import os
+from time import time
+from typing import Callable, Dict, List, Set, Tuple
+
+from .session_filter import SessionFilter
+from .settings.constants import Autosave
+from .settings.xsession_config import XSessionConfig, XSessionConfigObject
+from .utils.lazy_import import lazy_import
+
+wnck_utils = lazy_import('.utils.wnck_utils', __package__)
+
+logger = logging.getLogger(__name__)
+
+
+def session_fingerprint(windows: List[XSessionConfigObject]) -> Tuple:
+    """
+    What is restored from a session. Titles and the CPU and memory usage are left out, which change all the time.
+    """
+    fingerprint = []
+    for window in windows:
+        window_position: XSessionConfigObject.WindowPosition = getattr(window, 'window_position', None)
+        window_state: XSessionConfigObject.WindowState = getattr(window, 'window_state', None)
+        fingerprint.append((window.window_id_the_int_type,
+                            window.pid,
+                            window.desktop_number,
+                            window.app_name,
+                            tuple(window.cmd),
+                            (window_position.x_offset,
+                             window_position.y_offset,
+                             window_position.width,
+                             window_position.height) if window_position else None,
+                            (window_state.is_sticky, window_state.is_above) if window_state else None))
+    return tuple(sorted(fingerprint))
+
+
+def _get_cpu_time() -> float:
+    # Including the CPU time of child processes like wmctrl
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+class AutoSaver:
+    """
+    Save the session automatically once windows are opened, closed, moved to another workspace, moved, resized,
+    or their states are changed.
+
+    Window events are coalesced, the session is saved once windows have not been changed for debounce seconds,
+    or max_delay seconds after the first event. Only the changed windows are queried again, and the session is
+    written only if it is actually changed. Saving is postponed further to keep its CPU time within cpu_budget.
+
+    Work with a GLib main loop, see main_loop.run_main_loop().
+    """
+
+    def __init__(self,
+                 xsm: 'XSessionManager',
+                 session_name: str,
+                 session_filters: List[SessionFilter]=None,
+                 is_paused: Callable[[], bool]=None,
+                 debounce: float=Autosave.DEBOUNCE,
+                 max_delay: float=Autosave.MAX_DELAY,
+                 cpu_budget: float=Autosave.CPU_BUDGET):
+        """
+        :param is_paused: do not save while it returns True, such as while restoring a session
+        """
+        self.xsm = xsm
+        self.session_name = session_name
+        self.session_filters = session_filters
+        self.is_paused = is_paused
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.cpu_budget = cpu_budget
+
+        # The windows got last time, including the ones filtered out, keyed by xid
+        self._windows: Dict[int, XSessionConfigObject] = {}
+        self._changed_window_ids: Set[int] = set()
+        self._first_changed_at: float = None
+        self._last_changed_at: float = None
+        self._next_save_at = 0.0
+        self._saved_fingerprint: Tuple = None
+        # Backup the old session before the first save only, rather than every save
+        self._backup = True
+
+        self._timeout_id: int = None
+        self._handler_ids: List[int] = []
+
+    def start(self):
+        self._handler_ids = wnck_utils.connect_window_changes(self._on_window_changed)
+        logger.info('Saving the session `%s` automatically once windows are changed', self.session_name)
+
+    def stop(self):
+        from gi.repository import GLib
+
+        for handler_id in self._handler_ids:
+            wnck_utils.disconnect(handler_id)
+        self._handler_ids = []
+        if self._timeout_id is not None:
+            GLib.source_remove(self._timeout_id)
+            self._timeout_id = None
+
+    def _on_window_changed(self, xid: int):
+        now = time()
+        self._changed_window_ids.add(xid)
+        if self._first_changed_at is None:
+            self._first_changed_at = now
+        self._last_changed_at = now
+        if self._timeout_id is None:
+            self._schedule(self.debounce)
+
+    def _schedule(self, delay: float):
+        from gi.repository import GLib
+
+        self._timeout_id = GLib.timeout_add(max(int(delay * 1000), 1), self._on_timeout)
+
+    def _on_timeout(self) -> bool:
+        self._timeout_id = None
+        now = time()
+        quiet_time = now - self._last_changed_at
+        waited_time = now - self._first_changed_at
+        if quiet_time < self.debounce and waited_time < self.max_delay:
+            self._schedule(min(self.debounce - quiet_time, self.max_delay - waited_time))
+        elif now < self._next_save_at:
+            self._schedule(self._next_save_at - now)
+        elif self.is_paused is not None and self.is_paused():
+            self._schedule(self.debounce)
+        else:
+            try:
+                self.save()
+            except Exception:
+                logger.exception('Failed to save the session `%s` automatically', self.session_name)
+        # Remove this timeout, a new one is added if needed
+        return False
+
+    def save(self):
+        changed_window_ids = self._changed_window_ids
+        self._changed_window_ids = set()
+        self._first_changed_at = None
+        started_at = _get_cpu_time()
+        try:
+            x_session_config: XSessionConfig = self.xsm.get_session_details(remove_duplicates_by_pid=False,
+                                                                            previous_windows=self._windows,
+                                                                            changed_window_ids=changed_window_ids)
+            windows: List[XSessionConfigObject] = x_session_config.x_session_config_objects
+            self._windows = {window.window_id_the_int_type: window for window in windows}
+
+            if self.session_filters:
+                for session_filter in self.session_filters:
+                    if session_filter is None:
+                        continue
+                    windows = session_filter(windows)
+
+            fingerprint = session_fingerprint(windows)
+            if len(windows) == 0:
+                # Such as all windows are closed before logging out, keep the saved session
+                logger.debug('No window to save, skip saving')
+            elif fingerprint == self._saved_fingerprint:
+                logger.debug('The session is not changed, skip saving')
+            else:
+                x_session_config.x_session_config_objects = windows
+                self.xsm.write_session_config(self.session_name, x_session_config, backup=self._backup)
+                self._backup = False
+                self._saved_fingerprint = fingerprint
+        finally:
+            cpu_time = _get_cpu_time() - started_at
+            self._next_save_at = time() + cpu_time / self.cpu_budget
+            logger.debug('Took %.3fs of CPU time to save, do not save again in %.1fs',
+                         cpu_time, self._next_save_at - time())
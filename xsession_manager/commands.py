@@ -0,0 +1,200 @@
+import logging
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Dict, List
+
+from .session_filter import ExcludeSessionFilter, IncludeSessionFilter
+from .settings.constants import Locations, Prefetch
+from .utils.profiling import Profiler, profile_threads
+
+logger = logging.getLogger(__name__)
+
+# The commands which can be run in this process or by the daemon
+SAVE = 'save'
+CLOSE = 'close'
+RESTORE = 'restore'
+MOVE = 'move'
+
+COMMANDS = (SAVE, CLOSE, RESTORE, MOVE)
+
+
+class RestoreWarmUp:
+    """
+    Get ready to restore a session in a background thread while the user is asked whether to restore it, such as
+    by the dialog of -pr, so that the restore starts as warm as one run by the daemon. If the user says no,
+    the work is thrown away with the process.
+
+    The session is parsed, the process table is read, how the apps are launched is resolved from the .desktop files,
+    and the files of the apps are read into the page cache if prefetching is enabled, which the restore does not
+    read again. The .desktop files are parsed without GLib, whose state must not be forked with the threads of GLib
+    once the restore forks.
+    """
+
+    def __init__(self,
+                 session_name: str,
+                 prefetch: bool=False,
+                 base_location_of_sessions: Path=Locations.BASE_LOCATION_OF_SESSIONS):
+        self.session_name = session_name
+        self.prefetch = prefetch
+        self.base_location_of_sessions = base_location_of_sessions
+        self._resources: Dict[str, Any] = {}
+        self._prefetch_futures: List[Future] = []
+        self._prefetcher = None
+        self._thread = threading.Thread(target=self._warm_up, name='xsm-warm-up', daemon=True)
+
+    def start(self) -> 'RestoreWarmUp':
+        self._thread.start()
+        return self
+
+    def get_resources(self) -> Dict[str, Any]:
+        """
+        Wait until warmed up, the files not prefetched yet are left to the restore.
+
+        :return: the resources to restore the session with, see XSessionManager.__init__()
+        """
+        self._thread.join()
+        if self._prefetcher is not None:
+            for future in self._prefetch_futures:
+                future.cancel()
+            # No thread may be left running once the restore forks
+            self._prefetcher.shutdown(wait=True)
+            self._resources['prefetched_cmds'] = self._prefetcher.prefetched_cmds
+        return self._resources
+
+    def _warm_up(self):
+        # Import lazily, they are not needed unless restoring
+        from .launch_target import resolve_launch_targets
+        from .session_cache import SessionCache
+        from .utils import desktop_files
+        from .utils.process_snapshot import ProcessSnapshot
+
+        session_cache = SessionCache()
+        try:
+            session = session_cache.load(Path(self.base_location_of_sessions, self.session_name))
+        except (OSError, ValueError) as e:
+            # Reported by the restore
+            logger.debug('Failed to load %s ahead of restoring it: %s', self.session_name, e)
+            return
+        self._resources['session_cache'] = session_cache
+
+        if self.prefetch:
+            from .utils.prefetch import Prefetcher
+            self._prefetcher = Prefetcher(Prefetch.MAX_WORKERS, Prefetch.LDD_TIMEOUT)
+            self._prefetch_futures = [self._prefetcher.prefetch(app.cmd)
+                                      for app in session.x_session_config_objects if len(app.cmd) > 0]
+
+        self._resources['launch_targets'] = resolve_launch_targets(session.x_session_config_objects,
+                                                                   desktop_files.get_dbus_app_ids())
+
+        process_snapshot = ProcessSnapshot.take()
+        process_snapshot_lock = threading.Lock()
+
+        def get_process_snapshot() -> ProcessSnapshot:
+            # Only read the processes started since the snapshot was taken
+            with process_snapshot_lock:
+                process_snapshot.refresh()
+                return process_snapshot
+
+        self._resources['process_snapshot_provider'] = get_process_snapshot
+        logger.debug('Warmed up restoring %s', self.session_name)
+
+
+def run_command(command: str,
+                options: Dict[str, Any],
+                verbose: bool=False,
+                vv: bool=False,
+                fork: bool=True,
+                **resources):
+    """
+    Run a command of XSessionManager.
+
+    :param options: the options of the command, must be serializable to JSON so that they can be sent to the daemon
+    :param fork: restore sessions in a child process
+    :param resources: the resources shared by a long-running process, see XSessionManager.__init__()
+    """
+    if not options.get('profile'):
+        _run_command(command, options, verbose, vv, fork, None, resources)
+        return
+
+    profiler = Profiler()
+    profile_output = options.get('profile_output')
+    # The timings would be lost in a child process
+    fork = False
+    if profile_output and not profile_output.endswith('.json'):
+        with profile_threads(Path(profile_output)):
+            _run_command(command, options, verbose, vv, fork, profiler, resources)
+    else:
+        _run_command(command, options, verbose, vv, fork, profiler, resources)
+    print()
+    profiler.print_summary()
+    if profile_output:
+        if profile_output.endswith('.json'):
+            profiler.write_chrome_trace(Path(profile_output))
+        print('The profile is written to %s' % profile_output)
+
+
+def _run_command(command: str,
+                 options: Dict[str, Any],
+                 verbose: bool,
+                 vv: bool,
+                 fork: bool,
+                 profiler: Profiler,
+                 resources: Dict[str, Any]):
+    # Import lazily, XSessionManager is not needed if the daemon is running
+    from .xsession_manager import XSessionManager
+
+    include = options.get('include')
+    exclude = options.get('exclude')
+    metrics_path = options.get('metrics_file')
+    if command == SAVE:
+        xsm = XSessionManager(verbose=verbose,
+                              vv=vv,
+                              session_filters=[IncludeSessionFilter(include),
+                                               ExcludeSessionFilter(exclude)],
+                              metrics_path=metrics_path,
+                              profiler=profiler,
+                              **resources)
+        xsm.save_session(options['session_name'])
+    elif command == CLOSE:
+        # TODO Order sensitive?
+        xsm = XSessionManager(verbose=verbose,
+                              vv=vv,
+                              session_filters=[IncludeSessionFilter(options['close_all']),
+                                               IncludeSessionFilter(include),
+                                               ExcludeSessionFilter(exclude)],
+                              metrics_path=metrics_path,
+                              profiler=profiler,
+                              **resources)
+        xsm.close_windows(options['including_apps_with_multiple_windows'],
+                          options['close_batch_size'],
+                          options['close_timeout'])
+        logger.info('Done!')
+    elif command == RESTORE:
+        xsm = XSessionManager(verbose=verbose,
+                              vv=vv,
+                              session_filters=[IncludeSessionFilter(include),
+                                               ExcludeSessionFilter(exclude)],
+                              metrics_path=metrics_path,
+                              profiler=profiler,
+                              **resources)
+        xsm.restore_session(options['session_name'],
+                            options['restoring_interval'],
+                            fork=fork,
+                            workspace_first=options.get('workspace_first', False),
+                            check_memory=not options.get('ignore_memory', False),
+                            min_restoring_interval=options.get('min_restoring_interval'),
+                            max_restoring_interval=options.get('max_restoring_interval'),
+                            prefetch=options.get('prefetch', False),
+                            stage_priorities=options.get('stage_priorities'))
+    elif command == MOVE:
+        xsm = XSessionManager(verbose=verbose,
+                              vv=vv,
+                              session_filters=[IncludeSessionFilter(include),
+                                               ExcludeSessionFilter(exclude)],
+                              metrics_path=metrics_path,
+                              profiler=profiler,
+                              **resources)
+        xsm.move_window(options['session_name'])
+    else:
+        raise ValueError('Unknown command: %s' % command)
@@ -0,0 +1,322 @@
+import io
+import json
+import logging
+import os
+import queue
+import socket
+import sys
+import threading
+from concurrent.futures import Future
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, TextIO
+
+from .commands import COMMANDS, run_command
+from .settings.constants import Daemon, Locations
+from .utils import log, subprocess_utils
+from .utils.process_snapshot import ProcessSnapshot
+
+logger = logging.getLogger(__name__)
+
+# Messages are JSON objects, one per line:
+# client -> daemon: {"command": "restore", "options": {...}, "verbose": false, "vv": false}
+# daemon -> client: {"output": "..."} for what is printed, then {"exit_code": 0} once the command is done
+
+
+def _send(stream: BinaryIO, message: Dict[str, Any]):
+    stream.write(json.dumps(message).encode('utf-8') + b'\n')
+    stream.flush()
+
+
+class _OutputSender(io.TextIOBase):
+    """
+    Send what is printed while running a command to the client.
+    """
+
+    def __init__(self, stream: BinaryIO):
+        self._stream = stream
+        # Apps are launched and windows are moved in different threads
+        self._lock = threading.Lock()
+        self._disconnected = False
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, s: str) -> int:
+        with self._lock:
+            if s and not self._disconnected:
+                try:
+                    _send(self._stream, {'output': s})
+                except OSError:
+                    # The client has gone, such as being interrupted by Ctrl+C. Keep running the command.
+                    self._disconnected = True
+        return len(s)
+
+    def send(self, message: Dict[str, Any]):
+        with self._lock:
+            if not self._disconnected:
+                try:
+                    _send(self._stream, message)
+                except OSError:
+                    self._disconnected = True
+
+
+class DaemonClient:
+    """
+    Send commands to the daemon.
+    """
+
+    def __init__(self, socket_path: Path=Locations.DAEMON_SOCKET):
+        self.socket_path = Path(socket_path)
+
+    def _connect(self) -> socket.socket:
+        """
+        :return: None if the daemon is not running
+        """
+        if not self.socket_path.exists():
+            return None
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(str(self.socket_path))
+        except (ConnectionRefusedError, FileNotFoundError):
+            # A socket file left by a daemon which was killed
+            sock.close()
+            return None
+        return sock
+
+    def is_running(self) -> bool:
+        sock = self._connect()
+        if sock is None:
+            return False
+        sock.close()
+        return True
+
+    def request(self,
+                command: str,
+                options: Dict[str, Any],
+                verbose: bool=False,
+                vv: bool=False,
+                output: TextIO=None) -> int:
+        """
+        Run a command by the daemon, print its output while it is running.
+
+        The daemon runs one command at a time, wait until the previous ones are done.
+
+        :param output: where to print the output, sys.stdout by default
+        :return: the exit code of the command, or None if the daemon is not running
+        """
+        sock = self._connect()
+        if sock is None:
+            return None
+
+        if output is None:
+            output = sys.stdout
+
+        with sock, sock.makefile('rwb') as stream:
+            _send(stream, {'command': command, 'options': options, 'verbose': verbose, 'vv': vv})
+            for line in stream:
+                message = json.loads(line)
+                if 'output' in message:
+                    output.write(message['output'])
+                    output.flush()
+                elif 'exit_code' in message:
+                    return message['exit_code']
+
+        output.write('The daemon exited while running %s\n' % command)
+        return 1
+
+
+class XSessionManagerDaemon:
+    """
+    Keep a Wnck screen, the .desktop files, a process snapshot and parsed sessions warm in a long-running process,
+    and run the commands sent by DaemonClient with them.
+
+    Wnck is updated from X events and the .desktop files from file monitors by the GLib main loop.
+    The process snapshot is refreshed incrementally and sessions are parsed again only if they are modified,
+    right before they are used.
+
+    GTK and Wnck are not thread-safe, so the commands are run by the main loop one at a time, and the clients wait
+    meanwhile. A worker thread reads the requests and waits for them to be run, so that a slow client does not
+    block the main loop.
+    """
+
+    def __init__(self,
+                 socket_path: Path=Locations.DAEMON_SOCKET,
+                 verbose: bool=False,
+                 command_runner: Callable[..., None]=run_command,
+                 call_soon: Callable[[Callable[[], bool]], Any]=None):
+        """
+        :param command_runner: run a command, see commands.run_command()
+        :param call_soon: call a function by the main loop, GLib.idle_add() by default
+        """
+        self.socket_path = Path(socket_path)
+        self.verbose = verbose
+        self.command_runner = command_runner
+        self.call_soon = call_soon
+        self.resources: Dict[str, Any] = {}
+
+        # The requests accepted and not done yet
+        self._pending_requests = 0
+        self._pending_requests_lock = threading.Lock()
+
+        self._server: socket.socket = None
+        # The connections accepted, None stops the worker
+        self._connections: queue.Queue = queue.Queue()
+        self._worker = threading.Thread(target=self._serve_connections, name='xsm-daemon-worker', daemon=True)
+        self._process_snapshot: ProcessSnapshot = None
+        self._process_snapshot_lock = threading.Lock()
+
+    @property
+    def busy(self) -> bool:
+        """
+        True from when a request is accepted until it is done, which is checked by the main loop, such as by
+        the autosave, before it works with the desktop itself.
+        """
+        with self._pending_requests_lock:
+            return self._pending_requests > 0
+
+    def start(self):
+        """
+        Warm up the caches, and serve the clients while the GLib main loop is running, see main_loop.run_main_loop().
+        """
+        from gi.repository import GLib
+
+        from .session_cache import SessionCache
+        from .utils import gio_utils, snapd_workaround, wnck_utils
+
+        if DaemonClient(self.socket_path).is_running():
+            logger.info('The daemon is running already, listening on %s', self.socket_path)
+            sys.exit(1)
+
+        if self.call_soon is None:
+            self.call_soon = GLib.idle_add
+        wnck_utils.refresh_screen()
+        desktop_app_info = gio_utils.GDesktopAppInfo()
+        gio_utils.connect_app_info_changed(desktop_app_info.refresh)
+        self.resources = dict(desktop_app_info=desktop_app_info,
+                              snapd=snapd_workaround.Snapd(),
+                              session_cache=SessionCache(),
+                              process_snapshot_provider=self.get_process_snapshot)
+        self.get_process_snapshot()
+
+        self.listen()
+        self._worker.start()
+
+        def on_connection(fd, condition) -> bool:
+            self.accept_connection()
+            return True
+
+        GLib.io_add_watch(self._server.fileno(), GLib.PRIORITY_DEFAULT, GLib.IO_IN, on_connection)
+
+        def reap_children() -> bool:
+            subprocess_utils.reap_children()
+            return True
+
+        # Apps launched by a command may exit after it is done
+        GLib.timeout_add_seconds(Daemon.REAP_INTERVAL, reap_children)
+        logger.info('Listening on %s', self.socket_path)
+
+    def listen(self):
+        self.socket_path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        if self.socket_path.exists():
+            self.socket_path.unlink()
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(str(self.socket_path))
+        os.chmod(self.socket_path, 0o600)
+        self._server.listen()
+
+    def close(self):
+        self._connections.put(None)
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            if self.socket_path.exists():
+                self.socket_path.unlink()
+
+    def get_process_snapshot(self) -> ProcessSnapshot:
+        with self._process_snapshot_lock:
+            if self._process_snapshot is None:
+                self._process_snapshot = ProcessSnapshot.take()
+            else:
+                self._process_snapshot.refresh()
+            return self._process_snapshot
+
+    def accept_connection(self):
+        """
+        Accept a client without blocking, its request is run after the ones before it.
+        """
+        conn, _ = self._server.accept()
+        with self._pending_requests_lock:
+            self._pending_requests += 1
+        self._connections.put(conn)
+
+    def _serve_connections(self):
+        while True:
+            conn = self._connections.get()
+            if conn is None:
+                return
+            try:
+                self.handle_connection(conn)
+            except Exception:
+                # Such as a malformed request, keep serving the other clients
+                logger.exception('Failed to handle a request')
+            finally:
+                with self._pending_requests_lock:
+                    self._pending_requests -= 1
+
+    def handle_connection(self, conn: socket.socket):
+        with conn, conn.makefile('rwb') as stream:
+            line = stream.readline()
+            if not line:
+                return
+            request = json.loads(line)
+            output_sender = _OutputSender(stream)
+            exit_code = self._run_by_main_loop(request, output_sender)
+            output_sender.send({'exit_code': exit_code})
+
+    def _run_by_main_loop(self, request: Dict[str, Any], output_sender: _OutputSender) -> int:
+        """
+        Run a request by the main loop, which owns GTK and Wnck, and wait until it is done.
+        """
+        future = Future()
+
+        def run() -> bool:
+            if future.set_running_or_notify_cancel():
+                try:
+                    with redirect_stdout(output_sender):
+                        future.set_result(self._run_request(request))
+                except BaseException as e:
+                    future.set_exception(e)
+            # Call once
+            return False
+
+        self.call_soon(run)
+        return future.result()
+
+    def _run_request(self, request: Dict[str, Any]) -> int:
+        command = request.get('command')
+        if command not in COMMANDS:
+            logger.warning('Unknown command: %s', command)
+            return 1
+
+        if self.verbose:
+            sys.__stdout__.write('Running %s\n' % request)
+        try:
+            verbose = request.get('verbose', False)
+            vv = request.get('vv', False)
+            # Log at the verbosity of the client, to the client
+            with log.verbosity(verbose, vv):
+                try:
+                    # The daemon must not fork, or the child process would serve requests as well
+                    self.command_runner(command,
+                                        request.get('options', {}),
+                                        verbose,
+                                        vv,
+                                        fork=False,
+                                        **self.resources)
+                except Exception:
+                    logger.exception('Failed to run %s', command)
+                    return 1
+        finally:
+            subprocess_utils.reap_children()
+        return 0
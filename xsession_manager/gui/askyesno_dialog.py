@@ -1,6 +1,9 @@
+import logging
 import tkinter as tk
 from tkinter import Button
 
+logger = logging.getLogger(__name__)
+
 
 def create_askyesno_dialog(label_text: str, choose_yes_if_timeout: int=10):
 
@@ -56,7 +59,7 @@ def create_askyesno_dialog(label_text: str, choose_yes_if_timeout: int=10):
         root.after(0, _countdown, d, yes_button_text_with_countdown_template)
         # Display the dialog in the center of screen
         root.wait_window(d)
-        print('Your answer is: %s' % d.answer)
+        logger.debug('Your answer is: %s', d.answer)
         return d.answer
 
     root = tk.Tk()
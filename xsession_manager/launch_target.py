@@ -0,0 +1,39 @@
+import os
+from typing import Dict, List
+
+from .settings.xsession_config import XSessionConfigObject
+from .utils.base import Base
+from .utils.snapd_workaround import Snapd
+
+
+class LaunchTarget(Base):
+    """
+    How an app is launched, resolved ahead of restoring it without GLib, such as while the dialog of -pr counts down.
+    """
+
+    # The id on the bus if the app is D-Bus activatable, see DesktopBackend.activate_app()
+    dbus_app_id: str
+    # The name of the snap if the app is a Snap app
+    snap_app_name: str
+
+    def __init__(self, dbus_app_id: str=None, snap_app_name: str=None):
+        self.dbus_app_id = dbus_app_id
+        self.snap_app_name = snap_app_name
+
+
+def resolve_launch_targets(apps: List[XSessionConfigObject], dbus_app_ids: Dict[str, str]) -> Dict[str, LaunchTarget]:
+    """
+    :param dbus_app_ids: the executable names of the D-Bus activatable apps -> their ids on the bus,
+                         see desktop_files.get_dbus_app_ids()
+    :return: the launch targets keyed by the executables of the apps, apps without a command line are launched
+             by their .desktop files, which are not resolved ahead
+    """
+    launch_targets = {}
+    for app in apps:
+        if len(app.cmd) == 0 or app.cmd[0] in launch_targets:
+            continue
+        executable = app.cmd[0]
+        is_snap_app, snap_app_name = Snapd.is_snap_app(executable)
+        launch_targets[executable] = LaunchTarget(dbus_app_ids.get(os.path.basename(executable)),
+                                                  snap_app_name if is_snap_app else None)
+    return launch_targets
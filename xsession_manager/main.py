@@ -4,6 +4,7 @@ import sys
 
 from .arguments_parser import ArgumentsParser
 from .arguments_handler import ArgumentsHandler
+from .utils import log
 
 
 def run():
@@ -11,6 +12,7 @@ def run():
     parser = ArgumentsParser()
     args = parser.parse_arguments()
     arguments_handler = ArgumentsHandler(args)
+    log.configure(args.verbose, args.vv, args.log_file)
     arguments_handler.check_and_preset_args()
     arguments_handler.handle_arguments()
 
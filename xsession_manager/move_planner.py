@@ -0,0 +1,127 @@
+from typing import Callable, Dict, List, Set
+
+from .settings.xsession_config import XSessionConfigObject
+from .utils.base import Base
+from .utils.lazy_import import lazy_import
+from .utils.process_snapshot import ProcessSnapshot
+
+wnck_utils = lazy_import('.utils.wnck_utils', __package__)
+
+
+class WindowPlacement(Base):
+    """
+    Where a running window should be placed according to a saved window.
+    """
+
+    saved_window: XSessionConfigObject
+    running_window: XSessionConfigObject
+    # False if the running window is in its Workspace already
+    need_move: bool
+
+    def __init__(self, saved_window: XSessionConfigObject, running_window: XSessionConfigObject):
+        self.saved_window = saved_window
+        self.running_window = running_window
+        self.need_move = running_window.desktop_number != int(saved_window.desktop_number)
+
+
+class MovePlan(Base):
+
+    placements: List[WindowPlacement]
+    # Saved windows whose process can not be found
+    windows_not_found: List[XSessionConfigObject]
+    # Saved windows whose process is running but no window is matched, maybe the window is not mapped yet
+    windows_not_matched: List[XSessionConfigObject]
+
+    def __init__(self):
+        self.placements = []
+        self.windows_not_found = []
+        self.windows_not_matched = []
+
+
+class MovePlanner:
+    """
+    Compute where running windows should be moved according to saved windows.
+
+    Take one snapshot of running windows and one snapshot of processes, and match all saved windows against them,
+    instead of querying wmctrl and walking the process table for each saved window.
+    """
+
+    def __init__(self,
+                 running_windows: List[XSessionConfigObject],
+                 process_snapshot: ProcessSnapshot,
+                 claimed_window_ids: Set[str]=None,
+                 get_app_name: Callable[[int], str]=None):
+        """
+        :param claimed_window_ids: running windows which have been matched with saved windows in previous passes
+        :param get_app_name: get the app name of a running window by xid, via Wnck by default
+        """
+        self._get_app_name_of_window = get_app_name if get_app_name is not None else wnck_utils.get_app_name
+        self.process_snapshot = process_snapshot
+
+        # Running windows of each process, in the order of desktop number
+        self._running_windows_by_pid: Dict[int, List[XSessionConfigObject]] = {}
+        self._running_windows_by_id: Dict[str, XSessionConfigObject] = {}
+        for running_window in sorted(running_windows, key=lambda w: w.desktop_number):
+            self._running_windows_by_pid.setdefault(running_window.pid, []).append(running_window)
+            self._running_windows_by_id[running_window.window_id] = running_window
+
+        # A running window can only be placed according to one saved window
+        self._claimed_window_ids: Set[str] = set(claimed_window_ids) if claimed_window_ids else set()
+        self._app_names: Dict[int, str] = {}
+
+    def plan_window(self, saved_window: XSessionConfigObject, move_plan: MovePlan, pid: int = None) \
+            -> WindowPlacement:
+        """
+        Match a saved window with a running window which is not claimed yet, and add the placement to the plan.
+
+        :return: the placement, or None if no running window is matched
+        """
+        pids = self._find_pids(saved_window, pid)
+        if len(pids) == 0:
+            move_plan.windows_not_found.append(saved_window)
+            return None
+
+        for _pid in pids:
+            running_windows = self._running_windows_by_pid.get(_pid, [])
+            no_need_to_compare_title = len(running_windows) == 1
+            for running_window in running_windows:
+                if running_window.window_id in self._claimed_window_ids:
+                    continue
+                if no_need_to_compare_title or self._is_same_window(running_window, saved_window):
+                    self._claimed_window_ids.add(running_window.window_id)
+                    placement = WindowPlacement(saved_window, running_window)
+                    move_plan.placements.append(placement)
+                    return placement
+
+        move_plan.windows_not_matched.append(saved_window)
+        return None
+
+    def find_running_window(self, window_id: str) -> XSessionConfigObject:
+        return self._running_windows_by_id.get(window_id)
+
+    def _find_pids(self, saved_window: XSessionConfigObject, pid: int = None) -> List[int]:
+        # Get process info according to command line
+        pids = list(self.process_snapshot.find_pids_by_cmd(saved_window.cmd))
+        if pid:
+            # The window may belong to a child process, or the process may have changed its command line
+            for _pid in [pid] + self.process_snapshot.children(pid):
+                if _pid not in pids:
+                    pids.append(_pid)
+        return pids
+
+    def _get_app_name(self, xid: int) -> str:
+        if xid not in self._app_names:
+            self._app_names[xid] = self._get_app_name_of_window(xid)
+        return self._app_names[xid]
+
+    def _is_same_window(self, running_window: XSessionConfigObject, saved_window: XSessionConfigObject):
+        # Deal with JetBrains products. Move the window if they are the same project.
+        saved_app_name = saved_window.app_name
+        if saved_app_name.startswith('jetbrains-') \
+                and self._get_app_name(running_window.window_id_the_int_type) == saved_app_name:
+            return running_window.window_title.split(' ')[0] == saved_window.window_title.split(' ')[0]
+
+        if running_window.window_title == saved_window.window_title:
+            return True
+
+        return False
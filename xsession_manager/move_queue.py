@@ -0,0 +1,172 @@
+import heapq
+import itertools
+import logging
+import threading
+from concurrent.futures import Future
+from time import time
+from typing import Callable, List
+
+from .restore_state import WindowRestoreStatus, WindowRestoreState
+from .settings.xsession_config import XSessionConfigObject
+from .utils.retry import RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+
+class MoveJob:
+    """
+    A saved window waiting for being placed.
+    """
+
+    saved_window: XSessionConfigObject
+    pid: int
+    future: Future
+    # When to give up, in seconds since the epoch
+    deadline: float
+    retry_times: int
+    next_attempt_at: float
+
+    def __init__(self, saved_window: XSessionConfigObject, pid: int, deadline: float):
+        self.saved_window = saved_window
+        self.pid = pid
+        self.future = Future()
+        self.deadline = deadline
+        self.retry_times = 0
+        self.next_attempt_at = time()
+
+
+def _cancel(job: MoveJob):
+    job.future.cancel()
+    # Notify the waiters like as_completed(), as an executor does
+    job.future.set_running_or_notify_cancel()
+
+
+class MoveQueue:
+    """
+    Place saved windows in a worker thread, retry pending ones with backoff until their deadlines.
+
+    All due jobs are placed in one batch, so they share one snapshot of running windows and processes.
+    The result of each job, a WindowRestoreStatus which is either done or failed, is delivered through its future.
+    """
+
+    def __init__(self,
+                 place_windows: Callable[[List[MoveJob]], List[WindowRestoreStatus]],
+                 retry_policy: RetryPolicy):
+        """
+        :param place_windows: place the windows of the jobs, return the restoring statuses in the same order.
+                              It is always called in the worker thread.
+        :param retry_policy: how long to wait before retrying a pending job, and the default timeout of a job
+        """
+        self._place_windows = place_windows
+        self._retry_policy = retry_policy
+
+        self._condition = threading.Condition()
+        # (next_attempt_at, sequence, job)
+        self._jobs = []
+        self._sequence = itertools.count()
+        self._shutdown = False
+        self._cancelled = False
+        self._worker = threading.Thread(target=self._work, name='xsm-move-worker', daemon=True)
+        self._worker.start()
+
+    def submit(self, saved_window: XSessionConfigObject, pid: int = None, timeout: float = None) -> Future:
+        """
+        :param saved_window: the saved window to be placed
+        :param pid: the pid of the process which the window belongs to, if known
+        :param timeout: give up placing the window after timeout seconds, the deadline of the retry policy by default
+        """
+        if timeout is None:
+            timeout = self._retry_policy.deadline
+        job = MoveJob(saved_window, pid, time() + timeout)
+        with self._condition:
+            if self._cancelled:
+                _cancel(job)
+                return job.future
+            if self._shutdown:
+                raise RuntimeError('Cannot submit a window after the move queue is shut down')
+            self._push(job)
+            self._condition.notify()
+        return job.future
+
+    def shutdown(self, wait=True):
+        """
+        Stop accepting new jobs. The worker exits after all jobs are finished.
+        """
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify()
+        if wait:
+            self._worker.join()
+
+    def cancel(self):
+        """
+        Stop accepting new jobs, and cancel the futures of the jobs not finished yet.
+        """
+        with self._condition:
+            self._shutdown = True
+            self._cancelled = True
+            for _, _, job in self._jobs:
+                _cancel(job)
+            self._jobs.clear()
+            self._condition.notify()
+
+    def _push(self, job: MoveJob):
+        heapq.heappush(self._jobs, (job.next_attempt_at, next(self._sequence), job))
+
+    def _take_due_jobs(self) -> List[MoveJob]:
+        with self._condition:
+            while True:
+                if len(self._jobs) == 0:
+                    if self._shutdown:
+                        return []
+                    self._condition.wait()
+                    continue
+
+                wait_time = self._jobs[0][0] - time()
+                if wait_time <= 0:
+                    break
+                self._condition.wait(wait_time)
+
+            now = time()
+            due_jobs = []
+            while len(self._jobs) > 0 and self._jobs[0][0] <= now:
+                due_jobs.append(heapq.heappop(self._jobs)[2])
+            return due_jobs
+
+    def _work(self):
+        while True:
+            due_jobs = self._take_due_jobs()
+            if len(due_jobs) == 0:
+                return
+
+            try:
+                statuses = self._place_windows(due_jobs)
+            except Exception:
+                logger.exception('Failed to place windows')
+                statuses = [None] * len(due_jobs)
+
+            now = time()
+            with self._condition:
+                for job, status in zip(due_jobs, statuses):
+                    if status is not None and status.is_finished():
+                        job.future.set_result(status)
+                        continue
+
+                    if now >= job.deadline:
+                        if status is None:
+                            job.future.set_exception(TimeoutError('Timed out placing %s'
+                                                                  % job.saved_window.window_id))
+                            continue
+                        status.transit(WindowRestoreState.FAILED,
+                                       'Timed out at %s%s' % (status.state.value,
+                                                              ' (%s)' % status.reason if status.reason else ''))
+                        job.future.set_result(status)
+                        continue
+
+                    if self._cancelled:
+                        _cancel(job)
+                        continue
+
+                    job.next_attempt_at = min(now + self._retry_policy.get_delay(job.retry_times), job.deadline)
+                    job.retry_times += 1
+                    self._push(job)
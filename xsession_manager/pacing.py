@@ -0,0 +1,78 @@
+import logging
+import os
+from time import sleep, time
+from typing import Callable
+
+from .settings.constants import LaunchPacing
+from .utils.lazy_import import lazy_import
+from .utils.metrics import count_calls
+
+psutil = lazy_import('psutil')
+
+logger = logging.getLogger(__name__)
+
+
+class LaunchPacer:
+    """
+    Wait between launching apps, shorter on an idle system and longer on a loaded one.
+
+    The interval given for each app is scaled by how loaded the system is compared with the targets in LaunchPacing,
+    taking the highest of the load average, the I/O wait and the launches which have not mapped a window yet,
+    then bounded by min_interval and max_interval.
+    """
+
+    def __init__(self,
+                 min_interval: float = None,
+                 max_interval: float = None,
+                 count_launches_in_flight: Callable[[], int] = None):
+        """
+        :param count_launches_in_flight: return the number of apps launched which have not mapped a window yet
+        """
+        self.min_interval = LaunchPacing.MIN_INTERVAL if min_interval is None else min_interval
+        self.max_interval = LaunchPacing.MAX_INTERVAL if max_interval is None else max_interval
+        self.count_launches_in_flight = count_launches_in_flight
+        self._cpu_count = os.cpu_count() or 1
+        # The first call returns meaningless values, see psutil.cpu_times_percent()
+        psutil.cpu_times_percent()
+        self._iowait_percent = 0.0
+
+    def _get_load_per_cpu(self) -> float:
+        try:
+            return os.getloadavg()[0] / self._cpu_count
+        except OSError:
+            return 0.0
+
+    def _get_iowait_percent(self) -> float:
+        # iowait is only available on Linux, and it is measured since the last call
+        count_calls('psutil')
+        return getattr(psutil.cpu_times_percent(), 'iowait', 0.0)
+
+    def get_load_factor(self) -> float:
+        """
+        :return: 1.0 if the system is loaded as the targets, less if it is more idle
+        """
+        launches_in_flight = self.count_launches_in_flight() if self.count_launches_in_flight else 0
+        return max(self._get_load_per_cpu() / LaunchPacing.TARGET_LOAD_PER_CPU,
+                   self._iowait_percent / LaunchPacing.TARGET_IOWAIT_PERCENT,
+                   launches_in_flight / LaunchPacing.TARGET_LAUNCHES_IN_FLIGHT)
+
+    def get_interval(self, interval: float) -> float:
+        return min(max(interval * self.get_load_factor(), self.min_interval), self.max_interval)
+
+    def wait(self, interval: float):
+        """
+        Wait before launching the next app.
+
+        The loads are checked again while waiting, so that the wait is cut short once the apps in flight show up.
+
+        :param interval: the interval at the target loads
+        """
+        started_at = time()
+        self._iowait_percent = self._get_iowait_percent()
+        while True:
+            paced_interval = self.get_interval(interval)
+            remaining = paced_interval - (time() - started_at)
+            if remaining <= 0:
+                break
+            sleep(min(remaining, LaunchPacing.POLL_INTERVAL))
+        logger.debug('Waited %.2fs before launching the next app', time() - started_at)
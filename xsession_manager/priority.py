@@ -0,0 +1,170 @@
+import logging
+import os
+import resource
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Set
+
+from .settings.constants import PriorityStaging
+from .settings.xsession_config import XSessionConfigObject
+from .utils.lazy_import import lazy_import
+
+psutil = lazy_import('psutil')
+
+logger = logging.getLogger(__name__)
+
+
+def can_lower_niceness_to(niceness: int) -> bool:
+    """
+    Whether the niceness of a process can be lowered back to the given one, which needs CAP_SYS_NICE
+    unless RLIMIT_NICE allows it.
+    """
+    if os.geteuid() == 0:
+        return True
+    soft_limit, _ = resource.getrlimit(resource.RLIMIT_NICE)
+    if soft_limit == resource.RLIM_INFINITY:
+        return True
+    # The niceness can be lowered to 20 - the soft limit
+    return 20 - soft_limit <= niceness
+
+
+def when_all_done(futures: List[Future], callback: Callable[[], None]):
+    """
+    Call back once all futures are done, in the thread completing the last one.
+    """
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def on_done(_):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0] != 0:
+                return
+        callback()
+
+    if len(futures) == 0:
+        callback()
+    for future in futures:
+        future.add_done_callback(on_done)
+
+
+class PriorityStager:
+    """
+    Launch the apps the user needs first at normal priority, and the others at lower CPU and I/O priority,
+    so that the former become usable sooner under contention.
+
+    An app of low priority is spawned at low priority, see get_spawn_priority(), so that the processes it forks
+    while starting up get it as well. Apps launched via their .desktop files or D-Bus activation are started by
+    GLib or by the bus instead, they are lowered once their pids are known.
+
+    An app of low priority is returned to normal priority once its windows are placed,
+    and all of them are once the apps of high priority are done.
+    """
+
+    def __init__(self, high_priority_apps: List[XSessionConfigObject]):
+        own_process = psutil.Process()
+        self.normal_niceness = own_process.nice()
+        self.normal_ionice = own_process.ionice()
+        self.low_niceness = min(self.normal_niceness + PriorityStaging.NICENESS_INCREMENT, 19)
+        # The niceness can not be lowered back without privileges, lower the I/O priority only then
+        self.can_restore_niceness = can_lower_niceness_to(self.normal_niceness)
+        if not self.can_restore_niceness:
+            logger.debug('RLIMIT_NICE does not allow restoring the niceness, lower the I/O priority of apps only')
+
+        self._high_priority_app_ids: Set[int] = {id(app) for app in high_priority_apps}
+        # The apps of high priority which are not done yet
+        self._pending_app_ids: Set[int] = set(self._high_priority_app_ids)
+        # The pids of apps whose priorities are lowered
+        self._lowered_pids: Set[int] = set()
+        self._high_priority_done = len(self._pending_app_ids) == 0
+        self._lock = threading.RLock()
+
+    def is_high_priority(self, app: XSessionConfigObject) -> bool:
+        return id(app) in self._high_priority_app_ids
+
+    def get_spawn_priority(self, app: XSessionConfigObject) -> Dict[str, Any]:
+        """
+        :return: the priority to spawn the app at, the keyword arguments of subprocess_utils.launch_app(),
+                 empty for normal priority
+        """
+        with self._lock:
+            if self.is_high_priority(app) or self._high_priority_done:
+                return {}
+        return {'niceness_increment': self.low_niceness - self.normal_niceness if self.can_restore_niceness else 0,
+                'idle_io': True}
+
+    def launched(self, app: XSessionConfigObject, move_futures: List[Future], spawned_at_low_priority: bool=False):
+        """
+        :param move_futures: the futures placing the windows of the app
+        :param spawned_at_low_priority: spawned at the priority of get_spawn_priority(), otherwise its priority is
+                                        lowered now
+        """
+        if self.is_high_priority(app):
+            when_all_done(move_futures, lambda: self.done(app))
+        elif spawned_at_low_priority:
+            with self._lock:
+                self._lowered_pids.add(app.pid)
+                high_priority_done = self._high_priority_done
+            if high_priority_done:
+                # Missed by restore_all()
+                self._restore(app.pid)
+            else:
+                when_all_done(move_futures, lambda: self._restore(app.pid))
+        elif app.pid and self._lower(app.pid):
+            when_all_done(move_futures, lambda: self._restore(app.pid))
+
+    def done(self, app: XSessionConfigObject):
+        """
+        The app has been restored, or it is not going to be.
+        """
+        with self._lock:
+            self._pending_app_ids.discard(id(app))
+            if self._high_priority_done or len(self._pending_app_ids) > 0:
+                return
+            self._high_priority_done = True
+        logger.debug('The apps of high priority are restored, return the others to normal priority')
+        self.restore_all()
+
+    def _lower(self, pid: int) -> bool:
+        with self._lock:
+            if self._high_priority_done:
+                return False
+            try:
+                process = psutil.Process(pid)
+                if self.can_restore_niceness:
+                    process.nice(self.low_niceness)
+                process.ionice(psutil.IOPRIO_CLASS_IDLE)
+            except psutil.Error:
+                return False
+            self._lowered_pids.add(pid)
+            return True
+
+    def _restore(self, pid: int):
+        with self._lock:
+            if pid not in self._lowered_pids:
+                return
+            self._lowered_pids.remove(pid)
+        try:
+            process = psutil.Process(pid)
+            # Including the processes forked while the app started up, which inherited the low priority
+            processes = [process] + process.children(recursive=True)
+        except psutil.Error:
+            return
+        for process in processes:
+            try:
+                # The app may have changed its priority by itself
+                if self.can_restore_niceness and process.nice() == self.low_niceness:
+                    process.nice(self.normal_niceness)
+                if process.ionice().ioclass == psutil.IOPRIO_CLASS_IDLE:
+                    if self.normal_ionice.ioclass in (psutil.IOPRIO_CLASS_NONE, psutil.IOPRIO_CLASS_IDLE):
+                        process.ionice(self.normal_ionice.ioclass)
+                    else:
+                        process.ionice(self.normal_ionice.ioclass, self.normal_ionice.value)
+            except psutil.Error:
+                pass
+
+    def restore_all(self):
+        with self._lock:
+            lowered_pids = list(self._lowered_pids)
+        for pid in lowered_pids:
+            self._restore(pid)
@@ -0,0 +1,195 @@
+import json
+import logging
+import os
+import socket
+import threading
+from pathlib import Path
+from time import time
+from typing import Any, Callable, Dict, List
+
+from .settings.constants import Locations
+
+logger = logging.getLogger(__name__)
+
+# Messages are JSON objects, one per line:
+# client -> job: {"command": "status"} or {"command": "cancel"}
+# job -> client: {"status": {...}}
+
+STATUS = 'status'
+CANCEL = 'cancel'
+
+
+class JobState:
+    LAUNCHING = 'launching apps'
+    PLACING = 'placing windows'
+    CANCELLING = 'cancelling'
+    CANCELLED = 'cancelled'
+    DONE = 'done'
+
+
+def _send(stream, message: Dict[str, Any]):
+    stream.write(json.dumps(message).encode('utf-8') + b'\n')
+    stream.flush()
+
+
+class RestoreJob:
+    """
+    A restore running in this process, named after its session, which answers how far along it is and can be
+    cancelled over a unix socket in Locations.RESTORE_JOBS, see request_jobs().
+
+    The socket is served by a thread of its own, so that a restore can be asked about while it is busy,
+    including one run by the daemon.
+    """
+
+    def __init__(self,
+                 session_name: str,
+                 get_progress: Callable[[], Dict[str, Any]],
+                 on_cancel: Callable[[], None],
+                 jobs_dir: Path=Locations.RESTORE_JOBS):
+        """
+        :param get_progress: return the progress of the restore, such as the number of apps launched
+        :param on_cancel: called once the job is cancelled, in the thread serving the socket
+        :param jobs_dir: where to listen, not listening if None
+        """
+        self.session_name = session_name
+        self.pid = os.getpid()
+        self.name = '%s-%d' % (session_name, self.pid)
+        self.started_at = time()
+        self.state = JobState.LAUNCHING
+        self.socket_path = Path(jobs_dir, '%s.sock' % self.name) if jobs_dir is not None else None
+        self._get_progress = get_progress
+        self._on_cancel = on_cancel
+        self._cancelled = threading.Event()
+        self._server: socket.socket = None
+
+    def __enter__(self) -> 'RestoreJob':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def start(self):
+        if self.socket_path is None:
+            return
+        self.socket_path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        if self.socket_path.exists():
+            self.socket_path.unlink()
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(str(self.socket_path))
+        os.chmod(self.socket_path, 0o600)
+        self._server.listen()
+        threading.Thread(target=self._serve, args=(self._server,), name='xsm-restore-job', daemon=True).start()
+
+    def close(self):
+        if self._server is None:
+            return
+        try:
+            # Wake up accept()
+            self._server.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._server.close()
+        self._server = None
+        try:
+            self.socket_path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def is_cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def transit(self, state: str):
+        """
+        Move on to the next state, a cancelled job stays cancelling until it is done.
+        """
+        if self._cancelled.is_set():
+            state = JobState.CANCELLED if state == JobState.DONE else JobState.CANCELLING
+        self.state = state
+
+    def cancel(self):
+        if self._cancelled.is_set():
+            return
+        self._cancelled.set()
+        self.state = JobState.CANCELLING
+        logger.info('Cancelling restoring `%s`', self.session_name)
+        self._on_cancel()
+
+    def get_status(self) -> Dict[str, Any]:
+        status = {'name': self.name,
+                  'session_name': self.session_name,
+                  'pid': self.pid,
+                  'state': self.state,
+                  'elapsed': round(time() - self.started_at, 3)}
+        status.update(self._get_progress())
+        return status
+
+    def _serve(self, server: socket.socket):
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                # Closed
+                return
+            try:
+                with conn, conn.makefile('rwb') as stream:
+                    line = stream.readline()
+                    if not line:
+                        continue
+                    request = json.loads(line)
+                    if request.get('command') == CANCEL:
+                        self.cancel()
+                    _send(stream, {'status': self.get_status()})
+            except Exception:
+                logger.exception('Failed to answer a request to restoring `%s`', self.session_name)
+
+
+def request_jobs(command: str=STATUS, name: str=None, jobs_dir: Path=Locations.RESTORE_JOBS) -> List[Dict[str, Any]]:
+    """
+    Send a command to the running restore jobs.
+
+    :param name: the job name or the session name of the jobs, all jobs if None
+    :return: the statuses of the jobs after the command
+    """
+    if not Path(jobs_dir).is_dir():
+        return []
+    statuses = []
+    for socket_path in sorted(Path(jobs_dir).glob('*.sock')):
+        job_name = socket_path.name[:-len('.sock')]
+        if name is not None and name != job_name and name != job_name.rpartition('-')[0]:
+            continue
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(5)
+            sock.connect(str(socket_path))
+            with sock.makefile('rwb') as stream:
+                _send(stream, {'command': command})
+                line = stream.readline()
+            if line:
+                statuses.append(json.loads(line)['status'])
+        except (ConnectionRefusedError, FileNotFoundError):
+            # Left by a restore which was killed
+            try:
+                socket_path.unlink()
+            except FileNotFoundError:
+                pass
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning('Failed to request %s: %s', job_name, e)
+        finally:
+            sock.close()
+    return statuses
+
+
+def print_statuses(statuses: List[Dict[str, Any]]):
+    if len(statuses) == 0:
+        print('No session is being restored.')
+        return
+    for status in statuses:
+        print('%s (pid %d): %s for %.1fs' % (status['name'], status['pid'], status['state'], status['elapsed']))
+        print('    apps: %d launched, %d skipped, %d failed, %d to go of %d'
+              % (status['apps_launched'], status['apps_skipped'], status['apps_failed'], status['apps_pending'],
+                 status['apps_total']))
+        print('    windows: %d placed, %d failed of %d' % (status['windows_placed'], status['windows_failed'],
+                                                          status['windows_total']))
+        if status.get('current_app'):
+            print('    restoring: %s' % status['current_app'])
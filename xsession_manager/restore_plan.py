@@ -0,0 +1,81 @@
+import threading
+from typing import Dict, List, Set
+
+from .settings.xsession_config import XSessionConfigObject
+
+
+class LaunchPlan:
+    """
+    Which apps to launch for each workspace, used to restore the workspace the user is looking at first.
+
+    An app with windows on several workspaces is launched for the first of them needed.
+    The apps of each workspace keep the order given.
+    """
+
+    def __init__(self,
+                 apps: List[XSessionConfigObject],
+                 saved_windows_of_apps: Dict[int, List[XSessionConfigObject]],
+                 current_workspace: int):
+        """
+        :param apps: the apps to launch, in the order of launching
+        :param saved_windows_of_apps: the saved windows of each app, keyed by the xid of the app
+        :param current_workspace: the number of the workspace the user is looking at
+        """
+        self.current_workspace = current_workspace
+        self._apps_by_workspace: Dict[int, List[XSessionConfigObject]] = {}
+        for app in apps:
+            saved_windows = saved_windows_of_apps.get(app.window_id_the_int_type) or [app]
+            for desktop_number in sorted({int(w.desktop_number) for w in saved_windows}):
+                self._apps_by_workspace.setdefault(desktop_number, []).append(app)
+
+        self._taken_app_ids: Set[int] = set()
+        # The workspaces switched to by the user, which may be called from other threads
+        self._requested_workspaces: List[int] = []
+        self._lock = threading.Lock()
+
+    def request_workspace(self, workspace: int):
+        """
+        Launch the apps of a workspace as soon as possible, such as the user switches to it.
+        """
+        with self._lock:
+            self.current_workspace = workspace
+            self._requested_workspaces.append(workspace)
+
+    def take_requested_workspace(self) -> int:
+        """
+        :return: the first workspace requested which still has apps to launch, or None
+        """
+        with self._lock:
+            while len(self._requested_workspaces) > 0:
+                workspace = self._requested_workspaces.pop(0)
+                if workspace in self._apps_by_workspace:
+                    return workspace
+            return None
+
+    def next_workspace(self) -> int:
+        """
+        :return: the nearest workspace to the current one which still has apps to launch, or None
+        """
+        with self._lock:
+            if len(self._apps_by_workspace) == 0:
+                return None
+            return min(self._apps_by_workspace,
+                       key=lambda workspace: (abs(workspace - self.current_workspace), workspace))
+
+    def take_apps(self, workspace: int) -> List[XSessionConfigObject]:
+        """
+        :return: the apps of a workspace which have not been taken yet
+        """
+        with self._lock:
+            apps = [app for app in self._apps_by_workspace.pop(workspace, [])
+                    if id(app) not in self._taken_app_ids]
+            self._taken_app_ids.update(id(app) for app in apps)
+            # Some workspaces may have no app left
+            for _workspace in list(self._apps_by_workspace):
+                if all(id(app) in self._taken_app_ids for app in self._apps_by_workspace[_workspace]):
+                    del self._apps_by_workspace[_workspace]
+            return apps
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return len(self._apps_by_workspace) == 0
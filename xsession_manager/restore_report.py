@@ -0,0 +1,242 @@
+import json
+import math
+import os
+import threading
+from pathlib import Path
+from time import time
+from typing import Dict, Iterable, List, Optional
+
+from .restore_state import WindowRestoreState, WindowRestoreStatus
+from .settings.constants import RestoreReports
+
+
+class Outcome:
+    RESTORED = 'restored'
+    # Some windows were not placed
+    INCOMPLETE = 'incomplete'
+    ALREADY_RUNNING = 'already running'
+    # Not launched due to memory, see AdmissionController
+    REJECTED = 'rejected'
+    FAILED = 'failed'
+    # Not launched since the restore was cancelled
+    CANCELLED = 'cancelled'
+
+
+# The events of restoring an app, in the order they happen
+STARTED = 'started'
+RESOLVED = 'resolved'
+SPAWNED = 'spawned'
+FIRST_WINDOW = 'first window'
+MOVED = 'moved'
+GEOMETRY_APPLIED = 'geometry applied'
+STATE_APPLIED = 'state applied'
+EVENTS = (STARTED, RESOLVED, SPAWNED, FIRST_WINDOW, MOVED, GEOMETRY_APPLIED, STATE_APPLIED)
+
+# The window events of an app happen when all of its windows get there
+_WINDOW_EVENTS = {MOVED: WindowRestoreState.MOVED,
+                  GEOMETRY_APPLIED: WindowRestoreState.GEOMETRY_APPLIED,
+                  STATE_APPLIED: WindowRestoreState.STATE_APPLIED}
+
+# The latencies summarized by --restore-report: (name, from event, to event)
+LATENCIES = (('resolve', STARTED, RESOLVED),
+             ('spawn', RESOLVED, SPAWNED),
+             ('first window', SPAWNED, FIRST_WINDOW),
+             ('moved', SPAWNED, MOVED),
+             ('geometry applied', SPAWNED, GEOMETRY_APPLIED),
+             ('state applied', SPAWNED, STATE_APPLIED))
+
+
+class AppTimeline:
+    """
+    When each event of restoring an app happened, in seconds since the restore started.
+
+    started is when it was taken up, after waiting for memory if needed. resolved is when the way to launch it, such
+    as its command line or its .desktop file, was found, spawned is when it was launched.
+    """
+
+    def __init__(self, app_name: str, cmd: List[str], restore_started_at: float):
+        self.app_name = app_name
+        self.cmd = cmd
+        self.pid: int = None
+        self.windows = 0
+        self.events: Dict[str, float] = {}
+        self.outcome: str = None
+        self.reason: str = None
+        self._restore_started_at = restore_started_at
+
+    def mark(self, event: str, at: float = None):
+        self.events[event] = (time() if at is None else at) - self._restore_started_at
+
+    def fail(self, outcome: str, reason: str):
+        self.outcome = outcome
+        self.reason = reason
+
+    def add_windows(self, statuses: List[WindowRestoreStatus]):
+        """
+        Fill the window events and the outcome in by the restoring progress of the windows of the app.
+        """
+        self.windows = len(statuses)
+        if len(statuses) == 0:
+            return
+        matched_at = [status.matched_at for status in statuses if status.matched_at is not None]
+        if matched_at:
+            self.mark(FIRST_WINDOW, min(matched_at))
+        for event, state in _WINDOW_EVENTS.items():
+            reached_at = [status.reached_at.get(state) for status in statuses]
+            if all(at is not None for at in reached_at):
+                self.mark(event, max(reached_at))
+        if self.outcome is not None:
+            return
+        failed = [status for status in statuses if status.state == WindowRestoreState.FAILED]
+        if failed:
+            self.fail(Outcome.INCOMPLETE, '%d of %d window(s) not placed: %s'
+                      % (len(failed), len(statuses), failed[0].reason))
+        else:
+            self.outcome = Outcome.RESTORED
+
+    def to_dict(self) -> dict:
+        return {'app_name': self.app_name,
+                'cmd': self.cmd,
+                'pid': self.pid,
+                'windows': self.windows,
+                'outcome': self.outcome,
+                'reason': self.reason,
+                'events': {event: round(self.events[event], 3) for event in EVENTS if event in self.events}}
+
+
+class RestoreReport:
+    """
+    The timeline of each app in one restore of a session, appended to a JSON lines file per session.
+    """
+
+    def __init__(self, session_name: str):
+        self.session_name = session_name
+        self.started_at = time()
+        self.ended_at: float = None
+        self.apps: List[AppTimeline] = []
+        self._lock = threading.Lock()
+
+    def add_app(self, app_name: str, cmd: List[str]) -> AppTimeline:
+        timeline = AppTimeline(app_name, list(cmd), self.started_at)
+        with self._lock:
+            self.apps.append(timeline)
+        return timeline
+
+    def to_dict(self) -> dict:
+        return {'session_name': self.session_name,
+                'started_at': self.started_at,
+                'duration': None if self.ended_at is None else round(self.ended_at - self.started_at, 3),
+                'apps': [timeline.to_dict() for timeline in self.apps]}
+
+    def write(self, base_location: Path, max_reports: int = RestoreReports.MAX_REPORTS):
+        """
+        Append this report to the reports of the session, and drop the oldest ones beyond max_reports.
+        """
+        self.ended_at = time()
+        path = Path(base_location, '%s.jsonl' % self.session_name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        lines = []
+        if path.exists():
+            with open(path, 'r') as file:
+                lines = [line for line in file.read().splitlines() if line.strip()]
+        lines.append(json.dumps(self.to_dict()))
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'w') as file:
+            file.write('\n'.join(lines[-max_reports:]) + '\n')
+        os.replace(tmp_path, path)
+
+
+def load_reports(base_location: Path, session_name: str) -> List[dict]:
+    """
+    Load the recent reports of a session, oldest first. Broken lines are skipped.
+    """
+    path = Path(base_location, '%s.jsonl' % session_name)
+    reports = []
+    try:
+        with open(path, 'r') as file:
+            for line in file:
+                try:
+                    reports.append(json.loads(line))
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return reports
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """
+    The nearest-rank percentile, None if there is no value.
+    """
+    if len(values) == 0:
+        return None
+    values = sorted(values)
+    return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+
+def summarize(reports: Iterable[dict]) -> Dict[str, List[float]]:
+    """
+    :return: the latencies of all apps in the reports, keyed by the names in LATENCIES, plus the durations of
+             the restores keyed by 'restore'
+    """
+    latencies: Dict[str, List[float]] = {name: [] for name, _, _ in LATENCIES}
+    latencies['restore'] = []
+    for report in reports:
+        if report.get('duration') is not None:
+            latencies['restore'].append(report['duration'])
+        for app in report.get('apps', []):
+            events = app.get('events', {})
+            for name, from_event, to_event in LATENCIES:
+                if from_event in events and to_event in events:
+                    latencies[name].append(events[to_event] - events[from_event])
+    return latencies
+
+
+def print_summary(base_location: Path, session_name: str):
+    reports = load_reports(base_location, session_name)
+    if len(reports) == 0:
+        print('No restore of `%s` recorded in [%s].' % (session_name, base_location))
+        return
+    print('%d recent restore(s) of `%s`:' % (len(reports), session_name))
+    print('%-17s %7s %9s %9s %9s' % ('Latency', 'Count', 'p50', 'p95', 'Max'))
+    for name, values in summarize(reports).items():
+        if len(values) == 0:
+            print('%-17s %7d %9s %9s %9s' % (name, 0, '-', '-', '-'))
+            continue
+        print('%-17s %7d %8.3fs %8.3fs %8.3fs' % (name, len(values), percentile(values, 50), percentile(values, 95),
+                                                  max(values)))
+
+    outcomes: Dict[str, int] = {}
+    reasons: Dict[str, int] = {}
+    for report in reports:
+        for app in report.get('apps', []):
+            outcomes[app.get('outcome')] = outcomes.get(app.get('outcome'), 0) + 1
+            if app.get('reason'):
+                key = '%s: %s' % (app.get('app_name'), app['reason'])
+                reasons[key] = reasons.get(key, 0) + 1
+    apps: Dict[str, Dict[str, List[float]]] = {}
+    for report in reports:
+        for app in report.get('apps', []):
+            latencies = summarize([{'apps': [app]}])
+            app_latencies = apps.setdefault(app.get('app_name'), {'first window': [], 'state applied': []})
+            for name in app_latencies:
+                app_latencies[name].extend(latencies[name])
+    apps = {app_name: app_latencies for app_name, app_latencies in apps.items() if app_latencies['first window']}
+    if apps:
+        print()
+        app_width = max(len('App'), max(len(app_name) for app_name in apps))
+        print('%s %16s %16s' % ('App'.ljust(app_width), 'First window p95', 'Placed p95'))
+        # The slowest first
+        for app_name, app_latencies in sorted(apps.items(),
+                                              key=lambda item: percentile(item[1]['first window'], 95),
+                                              reverse=True):
+            placed = percentile(app_latencies['state applied'], 95)
+            print('%s %15.3fs %16s' % (app_name.ljust(app_width), percentile(app_latencies['first window'], 95),
+                                       '-' if placed is None else '%.3fs' % placed))
+
+    print()
+    print('Outcomes: %s' % ', '.join('%s %d' % (outcome, count) for outcome, count in outcomes.items()))
+    if reasons:
+        print('Failures:')
+        for reason, count in sorted(reasons.items(), key=lambda item: item[1], reverse=True):
+            print('    %dx %s' % (count, reason))
@@ -0,0 +1,151 @@
+import logging
+from enum import Enum
+from time import time
+from typing import Dict, List, Tuple
+
+from .settings.xsession_config import XSessionConfigObject
+from .utils.base import Base
+
+logger = logging.getLogger(__name__)
+
+
+class WindowRestoreState(Enum):
+    """
+    The states of restoring a saved window, in the order of transitions:
+
+    pending -> matched -> moved -> geometry applied -> state applied -> done
+
+    A window which can not be restored ends up with failed.
+    """
+
+    PENDING = 'pending'
+    MATCHED = 'matched'
+    MOVED = 'moved'
+    GEOMETRY_APPLIED = 'geometry applied'
+    STATE_APPLIED = 'state applied'
+    DONE = 'done'
+    FAILED = 'failed'
+
+
+class WindowRestoreStatus(Base):
+    """
+    The restoring progress of a saved window.
+    """
+
+    saved_window: XSessionConfigObject
+    state: WindowRestoreState
+    # The running window matched with the saved window, in hexadecimal
+    window_id: str
+    window_id_the_int_type: int
+    # Why this window is not restored yet, or why it is failed
+    reason: str
+    updated_at: float
+    # When the running window was matched first, that is when it was found mapped
+    matched_at: float
+    # When each state was reached first
+    reached_at: Dict[WindowRestoreState, float]
+
+    def __init__(self, saved_window: XSessionConfigObject):
+        self.saved_window = saved_window
+        self.window_id = None
+        self.window_id_the_int_type = None
+        self.reason = None
+        self.matched_at = None
+        self.reached_at = {}
+        self.transit(WindowRestoreState.PENDING)
+
+    def transit(self, state: WindowRestoreState, reason: str=None):
+        self.state = state
+        self.reason = reason
+        self.updated_at = time()
+        self.reached_at.setdefault(state, self.updated_at)
+
+    def match(self, running_window: XSessionConfigObject):
+        self.window_id = running_window.window_id
+        self.window_id_the_int_type = running_window.window_id_the_int_type
+        self.transit(WindowRestoreState.MATCHED)
+        if self.matched_at is None:
+            self.matched_at = self.updated_at
+
+    def unmatch(self, reason: str):
+        self.window_id = None
+        self.window_id_the_int_type = None
+        self.transit(WindowRestoreState.PENDING, reason)
+
+    def is_finished(self) -> bool:
+        return self.state in (WindowRestoreState.DONE, WindowRestoreState.FAILED)
+
+
+class WindowRestoreStates(Dict[int, WindowRestoreStatus]):
+    """
+    The restoring progress of saved windows, keyed by the xid of saved windows.
+    """
+
+    def get_or_create(self, saved_window: XSessionConfigObject) -> WindowRestoreStatus:
+        xid = saved_window.window_id_the_int_type
+        status = self.get(xid)
+        if status is None:
+            status = WindowRestoreStatus(saved_window)
+            self[xid] = status
+        else:
+            # The session may be reloaded, keep the latest one
+            status.saved_window = saved_window
+        return status
+
+    def claimed_window_ids(self) -> set:
+        return {status.window_id for status in self.values() if status.window_id is not None}
+
+    def fail_unfinished(self, reason: str=None):
+        """
+        :param reason: why they are failed, the reasons they are not restored yet by default
+        """
+        for status in self.values():
+            if not status.is_finished():
+                status.transit(WindowRestoreState.FAILED,
+                               reason or status.reason or 'Stopped at %s' % status.state.value)
+
+    def in_state(self, *states: WindowRestoreState) -> List[WindowRestoreStatus]:
+        return [status for status in self.values() if status.state in states]
+
+    def log_states(self):
+        for xid, status in self.items():
+            logger.debug('%s(%s): %s%s',
+                         status.saved_window.app_name,
+                         hex(xid),
+                         status.state.value,
+                         ' (%s)' % status.reason if status.reason else '')
+
+
+class GeometryCache:
+    """
+    The geometries last applied to windows, keyed by xid.
+
+    Used to avoid re-issuing the same geometry request while the window manager is still processing it.
+    """
+
+    def __init__(self, pending_timeout: float, max_times: int):
+        """
+        :param pending_timeout: how long in seconds a geometry request is treated as being processed
+        :param max_times: the max times to issue the same geometry request to a window
+        """
+        self.pending_timeout = pending_timeout
+        self.max_times = max_times
+        # xid -> (geometry, last applied at, times)
+        self._applied: Dict[int, Tuple[Tuple[int, int, int, int], float, int]] = {}
+
+    def record(self, xid: int, geometry: Tuple[int, int, int, int]):
+        times = self.get_times(xid, geometry)
+        self._applied[xid] = (geometry, time(), times + 1)
+
+    def get_times(self, xid: int, geometry: Tuple[int, int, int, int]) -> int:
+        applied = self._applied.get(xid)
+        if applied is None or applied[0] != geometry:
+            return 0
+        return applied[2]
+
+    def is_pending(self, xid: int, geometry: Tuple[int, int, int, int]) -> bool:
+        applied = self._applied.get(xid)
+        return applied is not None and applied[0] == geometry and time() - applied[1] < self.pending_timeout
+
+    def is_exhausted(self, xid: int, geometry: Tuple[int, int, int, int]) -> bool:
+        return self.get_times(xid, geometry) >= self.max_times
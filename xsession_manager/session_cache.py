@@ -0,0 +1,47 @@
+import json
+import os
+import threading
+from pathlib import Path
+from types import SimpleNamespace as Namespace
+from typing import Dict, Tuple
+
+from .settings.xsession_config import XSessionConfig
+
+
+def load_session_file(session_path: Path) -> XSessionConfig:
+    with open(session_path, 'r') as file:
+        return json.load(file, object_hook=lambda d: Namespace(**d))
+
+
+class SessionCache:
+    """
+    Parsed session files, which are parsed again only if they are modified.
+
+    The sessions returned are shared, callers must not modify them.
+    """
+
+    def __init__(self):
+        # session path -> ((mtime in ns, size), parsed session)
+        self._sessions: Dict[str, Tuple[Tuple[int, int], XSessionConfig]] = {}
+        self._lock = threading.Lock()
+
+    def load(self, session_path: Path) -> XSessionConfig:
+        """
+        :raise FileNotFoundError: if the session file does not exist
+        """
+        stat_result = os.stat(session_path)
+        version = (stat_result.st_mtime_ns, stat_result.st_size)
+        key = str(session_path)
+        with self._lock:
+            cached = self._sessions.get(key)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+
+        session = load_session_file(session_path)
+        with self._lock:
+            self._sessions[key] = (version, session)
+        return session
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
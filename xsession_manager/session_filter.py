@@ -1,23 +1,111 @@
-from typing import List
+import fnmatch
+import re
+from typing import List, Pattern, Set
 
 from .settings.xsession_config import XSessionConfigObject
-from .utils.number_utils import is_int, is_hexadecimal
 
-
-def filter_session(session: XSessionConfigObject, includes):
-    for include in includes:
-        ii, value = is_int(include)
-        if ii and value == session.pid:
+# Match the field only, such as app:firefox
+APP_PREFIX = 'app:'
+TITLE_PREFIX = 'title:'
+CMD_PREFIX = 'cmd:'
+
+_GLOB_CHARS = re.compile(r'[*?\[]')
+_HEXADECIMAL = re.compile(r'^(0[xX])?[0-9a-fA-F]+$')
+
+
+def _to_regex(pattern: str) -> str:
+    """
+    /<regex>/ is a regular expression, a pattern with *, ? or [ is a glob matching the whole value,
+    otherwise it is a substring.
+
+    :raise ValueError: if the regular expression is invalid
+    """
+    if len(pattern) > 2 and pattern.startswith('/') and pattern.endswith('/'):
+        regex = pattern[1:-1]
+        try:
+            # As it is combined by _compile(), where global flags like (?i) are not allowed
+            re.compile('(?:%s)' % regex)
+        except re.error as e:
+            raise ValueError('Invalid regular expression %s: %s' % (pattern, e))
+        return regex
+    if _GLOB_CHARS.search(pattern):
+        return r'\A' + fnmatch.translate(pattern)
+    return re.escape(pattern)
+
+
+def _compile(regexes: List[str]) -> Pattern:
+    """
+    :raise ValueError: if the regular expressions can not be combined, such as they define the same group name
+    """
+    if len(regexes) == 0:
+        return None
+    try:
+        return re.compile('|'.join('(?:%s)' % regex for regex in regexes), re.IGNORECASE)
+    except re.error as e:
+        raise ValueError('The regular expressions can not be used together: %s' % e)
+
+
+class SessionMatcher:
+    """
+    Patterns compiled once, which match a window:
+    - <pid>, matching the pid of the window as well as its app name or title
+    - <window_id> in hexadecimal, matching the window id as well as its app name or title
+    - app:<pattern>, title:<pattern> or cmd:<pattern>, matching the app name, the title or the command line only
+    - <pattern>, matching the app name or the title
+
+    A pattern is a substring, a glob like `fire*`, or a regular expression like `/^(gedit|code)$/`,
+    all case-insensitive.
+    """
+
+    def __init__(self, patterns: List[str]):
+        """
+        :raise ValueError: if a regular expression is invalid
+        """
+        self.pids: Set[int] = set()
+        self.window_ids: Set[str] = set()
+        app_regexes = []
+        title_regexes = []
+        cmd_regexes = []
+        for pattern in patterns or []:
+            if pattern.startswith(APP_PREFIX):
+                app_regexes.append(_to_regex(pattern[len(APP_PREFIX):]))
+            elif pattern.startswith(TITLE_PREFIX):
+                title_regexes.append(_to_regex(pattern[len(TITLE_PREFIX):]))
+            elif pattern.startswith(CMD_PREFIX):
+                cmd_regexes.append(_to_regex(pattern[len(CMD_PREFIX):]))
+            else:
+                # Not digits of other scripts, which int() accepts as well
+                if pattern.isascii() and pattern.isdigit():
+                    self.pids.add(int(pattern))
+                if _HEXADECIMAL.match(pattern):
+                    # Compared as strings, like 0x03e00004
+                    self.window_ids.add(pattern)
+                regex = _to_regex(pattern)
+                app_regexes.append(regex)
+                title_regexes.append(regex)
+        self._app_matcher = _compile(app_regexes)
+        self._title_matcher = _compile(title_regexes)
+        self._cmd_matcher = _compile(cmd_regexes)
+
+    def matches(self, session: XSessionConfigObject) -> bool:
+        if session.pid in self.pids or session.window_id in self.window_ids:
             return True
-
-        ih, _ = is_hexadecimal(include)
-        # Use string type values to compare
-        if ih and include == session.window_id:
+        if self._app_matcher is not None and self._app_matcher.search(session.app_name or ''):
             return True
-
-        if include.lower() in session.app_name.lower() \
-                or include.lower() in session.window_title.lower():
+        if self._title_matcher is not None and self._title_matcher.search(session.window_title or ''):
             return True
+        if self._cmd_matcher is not None:
+            cmd = getattr(session, 'cmd', None)
+            if cmd and self._cmd_matcher.search(' '.join(cmd)):
+                return True
+        return False
+
+
+def filter_session(session: XSessionConfigObject, includes) -> bool:
+    """
+    Compile the patterns for every call, use SessionMatcher to match many windows.
+    """
+    return SessionMatcher(includes).matches(session)
 
 
 class SessionFilter:
@@ -33,11 +121,12 @@ class ExcludeSessionFilter(SessionFilter):
 
     def __init__(self, excludes):
         self.excludes = excludes
+        self._matcher = SessionMatcher(excludes)
 
     def __call__(self, sessions: List[XSessionConfigObject]):
         if self.excludes is None or len(self.excludes) == 0:
             return sessions
-        return [session for session in sessions if not filter_session(session, self.excludes)]
+        return [session for session in sessions if not self._matcher.matches(session)]
 
 
 class IncludeSessionFilter(SessionFilter):
@@ -46,8 +135,9 @@ class IncludeSessionFilter(SessionFilter):
 
     def __init__(self, includes):
         self.includes = includes
+        self._matcher = SessionMatcher(includes)
 
     def __call__(self, sessions: List[XSessionConfigObject]):
         if self.includes is None or len(self.includes) == 0:
             return sessions
-        return [session for session in sessions if filter_session(session, self.includes)]
+        return [session for session in sessions if self._matcher.matches(session)]
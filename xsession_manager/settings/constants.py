@@ -1,6 +1,11 @@
+import os
+import tempfile
 from enum import Enum
 from os.path import expanduser
 from pathlib import Path
+from subprocess import CalledProcessError
+
+from ..utils.retry import RetryPolicy, retry_on_exceptions, retry_on_result
 
 
 class Prompts:
@@ -22,6 +27,21 @@ class Locations:
     # Save the current x session to xsession-default
     LOCATION_OF_DEFAULT_SESSION = Path(BASE_LOCATION_OF_SESSIONS, 'xsession-default')
 
+    # Only accessible by the current user
+    RUNTIME_DIR = Path(os.environ['XDG_RUNTIME_DIR'], 'xsession-manager') if os.environ.get('XDG_RUNTIME_DIR') \
+        else Path(tempfile.gettempdir(), 'xsession-manager-%d' % os.getuid())
+
+    DAEMON_SOCKET = Path(RUNTIME_DIR, 'daemon.sock')
+
+    # The sockets of the restores running, see restore_job.RestoreJob
+    RESTORE_JOBS = Path(RUNTIME_DIR, 'jobs')
+
+    # How long each app took to start up in previous restores
+    APP_PROFILES = Path(USER_HOME, '.config', 'xsession-manager', 'app-profiles.json')
+
+    # The timelines of recent restores, one JSON lines file per session
+    RESTORE_REPORTS = Path(USER_HOME, '.config', 'xsession-manager', 'restore-reports')
+
 
 class GSettings(Enum):
 
@@ -33,3 +53,180 @@ class GSettings(Enum):
         self.key = key
 
 
+class RetryPolicies:
+    """
+    All retries and waits, tune the latency here.
+    """
+
+    # Handle the error of 'X Error of failed request:  BadWindow (invalid Window parameter)',
+    # which is raised if a window is closed while wmctrl is querying it.
+    WMCTRL = RetryPolicy(max_attempts=3,
+                         initial_delay=0.1,
+                         multiplier=2,
+                         should_retry=retry_on_exceptions(CalledProcessError))
+
+    # A window which is just mapped may have no geometry yet
+    GET_GEOMETRY = RetryPolicy(max_attempts=3,
+                               initial_delay=0.05,
+                               multiplier=2,
+                               should_retry=retry_on_result(lambda geometry: geometry is None))
+
+    # Wait for the window manager to move windows to their workspaces, no guarantee though
+    WAIT_FOR_MOVING = RetryPolicy(deadline=0.5,
+                                  initial_delay=0.02,
+                                  multiplier=2,
+                                  should_retry=retry_on_result(lambda moved: not moved))
+
+    # Wait for the window manager to apply geometries, no guarantee though
+    WAIT_FOR_GEOMETRIES = RetryPolicy(deadline=0.5,
+                                      initial_delay=0.02,
+                                      multiplier=2,
+                                      should_retry=retry_on_result(lambda applied: not applied))
+    # A geometry request which has been issued in this time is treated as being processed by the window manager,
+    # it will not be issued again.
+    GEOMETRY_PENDING_TIMEOUT = 2
+    # The window manager may adjust the requested geometry, such as keeping a window within the screen.
+    # Stop issuing the same geometry request after these times.
+    GEOMETRY_MAX_TIMES = 2
+
+    # Wait for windows to be closed, the deadline is set by the caller
+    WAIT_FOR_CLOSING = RetryPolicy(deadline=10,
+                                   initial_delay=0.02,
+                                   multiplier=1.5,
+                                   max_delay=0.25,
+                                   should_retry=retry_on_result(lambda closed: not closed))
+
+    # Retry placing a window until it is mapped. The deadline of each window is set by the caller.
+    MOVE_WINDOW = RetryPolicy(deadline=20,
+                              initial_delay=0.25,
+                              multiplier=2,
+                              max_delay=4,
+                              jitter=0.2)
+
+
+class Autosave:
+    """
+    In seconds unless otherwise stated.
+    """
+
+    # Save once windows have not been changed for this long, such as after a window is dragged
+    DEBOUNCE = 2
+    # But do not postpone saving longer than this while windows keep changing
+    MAX_DELAY = 30
+    # The max fraction of one CPU spent on saving. If saving took 50ms of CPU time, do not save again within 5 seconds.
+    CPU_BUDGET = 0.01
+
+
+class Daemon:
+    """
+    In seconds unless otherwise stated.
+    """
+
+    # How often to wait for the apps launched which have exited, which linger as zombies until then
+    REAP_INTERVAL = 30
+
+
+class WorkspaceFirstRestore:
+    """
+    In seconds unless otherwise stated.
+    """
+
+    # Restore the next workspace once the windows launched are placed and the CPU usage is below IDLE_CPU_PERCENT
+    # for this long
+    IDLE_TIME = 1
+    IDLE_CPU_PERCENT = 50
+    # But do not defer a workspace longer than this on a busy system
+    MAX_DEFERRAL = 30
+    # How often to check whether the user switches to another workspace or the system is idle
+    POLL_INTERVAL = 0.2
+
+
+class MemoryAdmission:
+    """
+    In seconds unless otherwise stated.
+    """
+
+    # Keep this fraction of the total memory available, for the desktop and the apps already running
+    RESERVE_FRACTION = 0.1
+    # Hold launching while tasks are stalled on memory more than this percent of the time in the last 10 seconds,
+    # see "some avg10" in /proc/pressure/memory
+    PRESSURE_THRESHOLD = 10.0
+    # Give up launching an app if there is still not enough memory after this long
+    MAX_WAIT = 60
+    POLL_INTERVAL = 0.5
+    # An app is expected to take its memory within this long after being launched
+    SETTLE_TIME = 30
+
+
+class StartupProfiles:
+    """
+    Pace launching and placing windows according to how long each app took to start up in previous restores.
+    In seconds unless otherwise stated.
+    """
+
+    # The number of recent restores kept for each app
+    MAX_SAMPLES = 10
+    # Launch the next app once this fraction of the time the app launched takes to map its first window has passed,
+    # but never wait longer than -ri/--restoring-interval at normal loads, see LaunchPacing
+    LAUNCH_INTERVAL_FRACTION = 0.5
+    MIN_LAUNCH_INTERVAL = 0.1
+    # Wait for the windows of an app to be placed for this many times of the longest time it took recently,
+    # plus MOVE_TIMEOUT_MARGIN. An app timed out last time gets more time then.
+    MOVE_TIMEOUT_FACTOR = 2
+    MOVE_TIMEOUT_MARGIN = 5
+    MIN_MOVE_TIMEOUT = 5
+    MAX_MOVE_TIMEOUT = 120
+
+
+class RestoreReports:
+
+    # The number of recent restores kept for each session, summarized by --restore-report
+    MAX_REPORTS = 20
+
+
+class DBusActivation:
+
+    # How long to wait for each D-Bus call, in milliseconds, since the apps are activated one by one. An app which
+    # does not answer in time is spawned instead, which a GApplication app hands over to the instance being started.
+    TIMEOUT = 3000
+    # The options of GApplication apps which may be in their command lines, which D-Bus activation passes on its own
+    IGNORED_OPTIONS = ('--gapplication-service',)
+
+
+class Prefetch:
+    """
+    Read the files of apps into the page cache before launching them, enabled by -rp/--prefetch.
+    """
+
+    # The number of apps whose files are read ahead at the same time
+    MAX_WORKERS = 4
+    # In seconds
+    LDD_TIMEOUT = 5
+
+
+class LaunchPacing:
+    """
+    Adapt the interval between launching apps to the load of the system. In seconds unless otherwise stated.
+    """
+
+    # The bounds of the interval, which can be set by -rmin/--min-restoring-interval and -rmax/--max-restoring-interval
+    MIN_INTERVAL = 0.1
+    MAX_INTERVAL = 5
+    # The interval given is used as is at these loads, it is scaled by the highest ratio of the loads to them.
+    # 1-minute load average per CPU
+    TARGET_LOAD_PER_CPU = 1.0
+    # The percent of CPU time waiting for I/O since the last launch
+    TARGET_IOWAIT_PERCENT = 20
+    # The number of apps launched which have not mapped a window yet
+    TARGET_LAUNCHES_IN_FLIGHT = 4
+    # How often to check the loads while waiting
+    POLL_INTERVAL = 0.1
+
+
+class PriorityStaging:
+    """
+    Launch the apps not needed first at lower priority, enabled by -rs/--stage-priorities.
+    """
+
+    # Added to the niceness of the apps of low priority, whose I/O scheduling class is set to idle as well
+    NICENESS_INCREMENT = 10
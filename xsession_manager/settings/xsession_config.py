@@ -8,6 +8,8 @@ class XSessionConfig(Base):
     session_create_time: str
     backup_time: str
     restore_times: list = []
+    # In bytes, used to scale the memory_percent of apps to the machine restoring this session
+    total_memory: int
     x_session_config_objects: list
 
 
@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+
+from .. import admission
+from ..admission import Admission, AdmissionController, read_memory_pressure
+from ..settings.xsession_config import XSessionConfigObject
+
+GIB = 1024 * 1024 * 1024
+
+
+class FakePsutil:
+    Error = Exception
+
+    def __init__(self, total: int, available: int):
+        self.total = total
+        self.available = available
+        self.rss = {}
+
+    def virtual_memory(self):
+        return SimpleNamespace(total=self.total, available=self.available)
+
+    def Process(self, pid):
+        return SimpleNamespace(memory_info=lambda: SimpleNamespace(rss=self.rss.get(pid, 0)))
+
+
+def create_app(app_name: str, memory_percent: float, pid: int = None) -> XSessionConfigObject:
+    app = XSessionConfigObject()
+    app.app_name = app_name
+    app.memory_percent = memory_percent
+    app.pid = pid
+    return app
+
+
+def test_read_memory_pressure(tmp_path):
+    pressure_file = tmp_path / 'memory'
+    pressure_file.write_text('some avg10=12.50 avg60=3.00 avg300=1.00 total=100\n'
+                             'full avg10=1.00 avg60=0.00 avg300=0.00 total=10\n')
+    assert read_memory_pressure(str(pressure_file)) == 12.5
+    # Not supported by the kernel
+    assert read_memory_pressure(str(tmp_path / 'missing')) is None
+
+
+def test_admit_apps_by_the_available_memory(monkeypatch):
+    fake_psutil = FakePsutil(total=16 * GIB, available=5 * GIB)
+    monkeypatch.setattr(admission, 'psutil', fake_psutil)
+    monkeypatch.setattr(admission, 'read_memory_pressure', lambda: None)
+    # Saved on a machine with 8 GiB memory
+    controller = AdmissionController(saved_total_memory=8 * GIB, reserve_fraction=0.1, max_wait=0)
+
+    # 2 GiB
+    browser = create_app('browser', 25.0, pid=100)
+    assert controller.estimate_footprint(browser) == 2 * GIB
+    assert controller.admit(browser) == Admission.ADMITTED
+    controller.launched(browser)
+
+    # 5 GiB available, 1.6 GiB reserved, 2 GiB pending for the browser
+    ide = create_app('ide', 25.0)
+    assert controller.admit(ide) == Admission.NOT_ENOUGH_MEMORY
+
+    # The browser has taken its memory
+    fake_psutil.available = 4 * GIB
+    fake_psutil.rss[100] = 2 * GIB
+    assert controller.admit(ide) == Admission.ADMITTED
+
+    # Larger than this machine even with nothing else running
+    vm = create_app('vm', 200.0)
+    assert controller.admit(vm) == Admission.NEVER_FITS
+    assert [(app.app_name, a) for app, a, _ in controller.rejected_apps] == \
+           [('ide', Admission.NOT_ENOUGH_MEMORY), ('vm', Admission.NEVER_FITS)]
+
+
+def test_hold_while_under_memory_pressure(monkeypatch):
+    monkeypatch.setattr(admission, 'psutil', FakePsutil(total=16 * GIB, available=12 * GIB))
+    pressures = [30.0, 20.0, 1.0]
+    monkeypatch.setattr(admission, 'read_memory_pressure', lambda: pressures.pop(0))
+    monkeypatch.setattr(admission, 'sleep', lambda seconds: None)
+    controller = AdmissionController(pressure_threshold=10.0, max_wait=60)
+
+    assert controller.admit(create_app('editor', 1.0)) == Admission.ADMITTED
+    assert pressures == []
@@ -0,0 +1,45 @@
+from ..app_profiles import AppProfile, AppProfileStore, StartupSample
+from ..settings.constants import StartupProfiles
+
+
+def test_launch_interval_and_move_timeout():
+    # No history
+    assert AppProfile().get_launch_interval(0.5) == 0.5
+    assert AppProfile().get_move_timeout(20) == 20
+
+    fast_app = AppProfile([StartupSample(0.2, 0.5), StartupSample(0.4, 1.0), StartupSample(0.3, 0.8)])
+    # Half of the median time to map its first window
+    assert fast_app.get_launch_interval(0.5) == 0.15
+    assert fast_app.get_move_timeout(20) == 1.0 * StartupProfiles.MOVE_TIMEOUT_FACTOR \
+           + StartupProfiles.MOVE_TIMEOUT_MARGIN
+
+    slow_app = AppProfile([StartupSample(8, 15), StartupSample(None, 30, timed_out=True)])
+    # Never hold the next app longer than the restoring interval
+    assert slow_app.get_launch_interval(0.5) == 0.5
+    # Not given up early
+    assert slow_app.get_move_timeout(20) == 30 * StartupProfiles.MOVE_TIMEOUT_FACTOR \
+           + StartupProfiles.MOVE_TIMEOUT_MARGIN
+
+
+def test_keep_recent_samples_only():
+    profile = AppProfile(max_samples=3)
+    for placed in range(5):
+        profile.add(StartupSample(None, placed))
+    assert [sample.placed for sample in profile.samples] == [2, 3, 4]
+
+
+def test_save_and_load(tmp_path):
+    path = tmp_path / 'profiles' / 'app-profiles.json'
+    store = AppProfileStore.load(path)
+    assert store.profiles == {}
+
+    store.record('gedit', StartupSample(0.3, 1.2))
+    store.record('gedit', StartupSample(None, 20, timed_out=True))
+    store.save()
+
+    samples = AppProfileStore.load(path).get('gedit').samples
+    assert [(s.first_window, s.placed, s.timed_out) for s in samples] == [(0.3, 1.2, False), (None, 20, True)]
+
+    # Start over
+    path.write_text('{')
+    assert AppProfileStore.load(path).profiles == {}
@@ -0,0 +1,88 @@
+from time import time
+from typing import List
+
+from ..autosave import AutoSaver
+from ..session_filter import ExcludeSessionFilter
+from ..settings.xsession_config import XSessionConfig, XSessionConfigObject
+
+
+def create_window(xid: int, app_name: str, desktop_number: int = 0) -> XSessionConfigObject:
+    window = XSessionConfigObject()
+    window.window_id = hex(xid)
+    window.window_id_the_int_type = xid
+    window.desktop_number = desktop_number
+    window.pid = xid
+    window.app_name = app_name
+    window.window_title = app_name
+    window.cmd = [app_name]
+    return window
+
+
+class FakeXSessionManager:
+
+    def __init__(self):
+        self.windows: List[XSessionConfigObject] = []
+        self.changed_window_ids = []
+        self.writes = []
+
+    def get_session_details(self, remove_duplicates_by_pid, previous_windows, changed_window_ids):
+        self.changed_window_ids.append(changed_window_ids)
+        x_session_config = XSessionConfig()
+        x_session_config.x_session_config_objects = list(self.windows)
+        return x_session_config
+
+    def write_session_config(self, session_name, x_session_config, backup):
+        self.writes.append(([w.app_name for w in x_session_config.x_session_config_objects], backup))
+
+
+def test_save_only_if_the_session_is_changed():
+    xsm = FakeXSessionManager()
+    auto_saver = AutoSaver(xsm, 'test', session_filters=[ExcludeSessionFilter(['terminal'])])
+    auto_saver._schedule = lambda delay: None
+
+    # Keep the saved session if there is no window
+    auto_saver.save()
+    assert xsm.writes == []
+
+    xsm.windows = [create_window(1, 'gedit'), create_window(2, 'terminal')]
+    auto_saver._on_window_changed(1)
+    auto_saver._on_window_changed(2)
+    auto_saver.save()
+    assert xsm.changed_window_ids[-1] == {1, 2}
+    # Only backup the old session before the first save
+    assert xsm.writes == [(['gedit'], True)]
+
+    # The title is not restored
+    xsm.windows[0].window_title = 'Another title'
+    auto_saver.save()
+    assert xsm.changed_window_ids[-1] == set()
+    assert len(xsm.writes) == 1
+
+    xsm.windows[0].desktop_number = 1
+    auto_saver.save()
+    assert xsm.writes[-1] == (['gedit'], False)
+
+
+def test_debounce_and_cpu_budget():
+    xsm = FakeXSessionManager()
+    auto_saver = AutoSaver(xsm, 'test', debounce=2, max_delay=30, cpu_budget=0.01)
+    delays = []
+    auto_saver._schedule = delays.append
+    auto_saver._first_changed_at = auto_saver._last_changed_at = time()
+
+    # Windows are still changing
+    auto_saver._on_timeout()
+    assert 1.9 < delays[-1] <= 2
+    assert len(xsm.changed_window_ids) == 0
+
+    # But do not wait too long
+    auto_saver._first_changed_at = time() - 30
+    auto_saver._on_timeout()
+    assert len(xsm.changed_window_ids) == 1
+
+    # Saved just now
+    auto_saver._first_changed_at = auto_saver._last_changed_at = time() - 2
+    auto_saver._next_save_at = time() + 5
+    auto_saver._on_timeout()
+    assert 4.9 < delays[-1] <= 5
+    assert len(xsm.changed_window_ids) == 1
@@ -0,0 +1,57 @@
+"""
+Use the benchmark fixture of pytest-benchmark if it is installed, otherwise a minimal one with the same interface,
+which reports the timings at the end.
+"""
+import statistics
+from time import perf_counter
+from typing import Callable, Dict, List
+
+import pytest
+
+try:
+    import pytest_benchmark
+except ImportError:
+    pytest_benchmark = None
+
+_results: Dict[str, List[float]] = {}
+
+
+class _Benchmark:
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __call__(self, target: Callable, *args, **kwargs):
+        return self.pedantic(target, args=args, kwargs=kwargs, rounds=5)
+
+    def pedantic(self, target: Callable, args=(), kwargs=None, setup: Callable = None, rounds: int = 1,
+                 iterations: int = 1, warmup_rounds: int = 0):
+        result = None
+        for round_number in range(warmup_rounds + rounds):
+            if setup is not None:
+                args, kwargs = setup()
+            started_at = perf_counter()
+            for _ in range(iterations):
+                result = target(*args, **(kwargs or {}))
+            if round_number >= warmup_rounds:
+                _results.setdefault(self.name, []).append((perf_counter() - started_at) / iterations)
+        return result
+
+
+if pytest_benchmark is None:
+    @pytest.fixture
+    def benchmark(request):
+        return _Benchmark(request.node.name)
+
+    def pytest_terminal_summary(terminalreporter):
+        if len(_results) == 0:
+            return
+        terminalreporter.section('benchmark')
+        name_width = max(len(name) for name in _results)
+        for name, durations in _results.items():
+            terminalreporter.write_line('%s  median %9.4fs  min %9.4fs  max %9.4fs  rounds %d'
+                                        % (name.ljust(name_width),
+                                           statistics.median(durations),
+                                           min(durations),
+                                           max(durations),
+                                           len(durations)))
@@ -0,0 +1,71 @@
+"""
+Time saving, restoring, moving and closing windows on an in-memory desktop, see tests/fake_desktop.py.
+
+Usage:
+    python -m pytest xsession_manager/tests/benchmarks/desktop_benchmark.py
+
+Not collected by the normal test run. The app startup and window manager delays are zero, so the timings are
+the overhead of xsm itself.
+"""
+import pytest
+
+from ...xsession_manager import XSessionManager
+from ..fake_desktop import FakeDesktop, create_xsession_manager
+
+WINDOWS = [10, 100, 1000]
+# Some apps have several windows
+WINDOWS_PER_PROCESS = 3
+ROUNDS = 3
+# Time xsm only, without writing restore reports or listening for --status
+NOT_RECORDED = dict(restore_reports_path=None, restore_jobs_path=None)
+
+
+def create_desktop(windows: int) -> FakeDesktop:
+    return FakeDesktop.populate(windows, max(windows // WINDOWS_PER_PROCESS, 1))
+
+
+@pytest.mark.parametrize('windows', WINDOWS)
+def test_save(benchmark, tmp_path, windows):
+    xsm = create_xsession_manager(create_desktop(windows), tmp_path, **NOT_RECORDED)
+    benchmark.pedantic(xsm.save_session, args=('benchmark',), rounds=ROUNDS)
+
+
+@pytest.mark.parametrize('windows', WINDOWS)
+def test_restore(benchmark, tmp_path, windows):
+    desktop = create_desktop(windows)
+    create_xsession_manager(desktop, tmp_path, **NOT_RECORDED).save_session('benchmark')
+
+    def setup():
+        desktop.close_all()
+        return (create_xsession_manager(desktop, tmp_path, **NOT_RECORDED), 'benchmark'), {}
+
+    def restore(xsm: XSessionManager, session_name: str):
+        xsm.restore_session(session_name, restoring_interval=0, fork=False, check_memory=False,
+                            min_restoring_interval=0)
+
+    benchmark.pedantic(restore, setup=setup, rounds=ROUNDS)
+    assert len(desktop.windows) == windows
+
+
+@pytest.mark.parametrize('windows', WINDOWS)
+def test_move(benchmark, tmp_path, windows):
+    desktop = create_desktop(windows)
+    create_xsession_manager(desktop, tmp_path, **NOT_RECORDED).save_session('benchmark')
+
+    def setup():
+        desktop.scatter()
+        return (create_xsession_manager(desktop, tmp_path, **NOT_RECORDED), 'benchmark'), {}
+
+    benchmark.pedantic(lambda xsm, session_name: xsm.move_window(session_name), setup=setup, rounds=ROUNDS)
+
+
+@pytest.mark.parametrize('windows', WINDOWS)
+def test_close(benchmark, tmp_path, windows):
+    def setup():
+        xsm = create_xsession_manager(create_desktop(windows), tmp_path, **NOT_RECORDED)
+        return (xsm,), {}
+
+    def close(xsm: XSessionManager):
+        xsm.close_windows(including_apps_with_multiple_windows=True)
+
+    benchmark.pedantic(close, setup=setup, rounds=ROUNDS)
@@ -0,0 +1,92 @@
+"""
+Compare the cold-cache launch time of apps with and without prefetching their files.
+
+Usage:
+    python -m xsession_manager.tests.benchmarks.prefetch_benchmark -s xsession-default
+    python -m xsession_manager.tests.benchmarks.prefetch_benchmark "gimp --version" "libreoffice --version"
+
+The apps are launched one after another with the restoring interval in between, like restoring a session, and each
+round waits until all of them exit. Their executables and shared libraries are dropped from the page cache before each
+round, except the pages used by running processes, such as libc. The apps of a session are run with --version,
+which loads the same libraries as starting them normally but opens no window.
+"""
+import argparse
+import shlex
+import statistics
+import subprocess
+from time import sleep, time
+from typing import List
+
+from ...session_cache import load_session_file
+from ...settings.constants import Locations, Prefetch
+from ...utils.prefetch import Prefetcher, evict
+
+
+def get_session_commands(session_name: str) -> List[List[str]]:
+    session = load_session_file(Locations.BASE_LOCATION_OF_SESSIONS / session_name)
+    programs = {tuple(w.cmd[:1]) for w in session.x_session_config_objects if len(w.cmd) > 0}
+    return [[program[0], '--version'] for program in sorted(programs)]
+
+
+def evict_files(prefetcher: Prefetcher, commands: List[List[str]]):
+    for cmd in commands:
+        for path in prefetcher.get_files(cmd):
+            evict(path)
+
+
+def launch(commands: List[List[str]], restoring_interval: float, prefetch: bool) -> float:
+    """
+    :return: the seconds from the first launch until all apps exit
+    """
+    started_at = time()
+    prefetcher = None
+    if prefetch:
+        prefetcher = Prefetcher(Prefetch.MAX_WORKERS, Prefetch.LDD_TIMEOUT)
+        for cmd in commands:
+            prefetcher.prefetch(cmd)
+    processes = []
+    for cmd in commands:
+        try:
+            processes.append(subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        except OSError as e:
+            print('Failed to launch %s: %s' % (cmd, e))
+        sleep(restoring_interval)
+    for process in processes:
+        process.wait()
+    if prefetcher:
+        prefetcher.shutdown(wait=True)
+    return time() - started_at
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark prefetching the files of apps before launching them')
+    parser.add_argument('commands', nargs='*', help='The command lines to launch, quoted')
+    parser.add_argument('-s', '--session', help='Launch the apps of a saved session with --version')
+    parser.add_argument('-n', '--rounds', type=int, default=5)
+    parser.add_argument('-ri', '--restoring-interval', type=float, default=0.5)
+    args = parser.parse_args()
+
+    commands = [shlex.split(command) for command in args.commands]
+    if args.session:
+        commands.extend(get_session_commands(args.session))
+    if len(commands) == 0:
+        parser.error('no command to launch')
+
+    # Only used to resolve the files of the commands
+    files_resolver = Prefetcher(1, Prefetch.LDD_TIMEOUT)
+    results = {False: [], True: []}
+    for _ in range(args.rounds):
+        # Interleave both modes, so that they are affected by the background load equally
+        for prefetch in (False, True):
+            evict_files(files_resolver, commands)
+            results[prefetch].append(launch(commands, args.restoring_interval, prefetch))
+    files_resolver.shutdown()
+
+    for prefetch, durations in results.items():
+        print('%-18s median %.3fs, min %.3fs, max %.3fs'
+              % ('With prefetch:' if prefetch else 'Without prefetch:',
+                 statistics.median(durations), min(durations), max(durations)))
+
+
+if __name__ == '__main__':
+    main()
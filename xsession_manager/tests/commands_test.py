@@ -0,0 +1,61 @@
+from ..commands import RestoreWarmUp
+from ..utils import prefetch
+from .fake_desktop import FakeDesktop, create_xsession_manager
+
+
+def test_warm_up_restore(tmp_path):
+    desktop = FakeDesktop.populate(windows=4, processes=2)
+    create_xsession_manager(desktop, tmp_path).save_session('test')
+
+    resources = RestoreWarmUp('test', prefetch=True, base_location_of_sessions=tmp_path / 'sessions').start().get_resources()
+    session = resources['session_cache'].load(tmp_path / 'sessions' / 'test')
+    assert len(session.x_session_config_objects) == 4
+    assert resources['process_snapshot_provider']() is resources['process_snapshot_provider']()
+    assert resources['prefetched_cmds'] == {('/usr/bin/app0', '--fake'), ('/usr/bin/app1', '--fake')}
+    assert 'desktop_app_info' not in resources
+
+
+def test_restore_without_prefetching_again(tmp_path, monkeypatch):
+    desktop = FakeDesktop.populate(windows=4, processes=2)
+    create_xsession_manager(desktop, tmp_path).save_session('test')
+    desktop.close_all()
+    prefetched = []
+    monkeypatch.setattr(prefetch.Prefetcher, 'prefetch', lambda self, cmd: prefetched.append(cmd))
+
+    create_xsession_manager(desktop, tmp_path, prefetched_cmds={('/usr/bin/app0', '--fake')}).restore_session(
+        'test', restoring_interval=0, fork=False, check_memory=False, min_restoring_interval=0, prefetch=True)
+    assert prefetched == [['/usr/bin/app1', '--fake']]
+    assert len(desktop.launched) == 2
+
+
+def test_restore_with_launch_targets_resolved_ahead(tmp_path, monkeypatch):
+    applications_dir = tmp_path / 'data' / 'applications'
+    applications_dir.mkdir(parents=True)
+    (applications_dir / 'org.example.App0.desktop').write_text(
+        '[Desktop Entry]\nType=Application\nName=App0\nExec=/usr/bin/app0 %U\nDBusActivatable=true\n')
+    (applications_dir / 'app1.desktop').write_text('[Desktop Entry]\nType=Application\nName=App1\nExec=app1\n')
+    monkeypatch.setenv('XDG_DATA_HOME', str(tmp_path / 'data'))
+    monkeypatch.setenv('XDG_DATA_DIRS', str(tmp_path / 'none'))
+
+    desktop = FakeDesktop.populate(windows=4, processes=2)
+    create_xsession_manager(desktop, tmp_path).save_session('test')
+    desktop.close_all()
+    resources = RestoreWarmUp('test', base_location_of_sessions=tmp_path / 'sessions').start().get_resources()
+    assert resources['launch_targets']['/usr/bin/app0'].dbus_app_id == 'org.example.App0'
+
+    dbus_app_ids = {}
+
+    def activate_app(cmd, get_dbus_app_id):
+        # GLib is not needed to look them up
+        dbus_app_ids[cmd[0]] = get_dbus_app_id(cmd[0])
+        return None
+
+    desktop.activate_app = activate_app
+    create_xsession_manager(desktop, tmp_path, **resources).restore_session(
+        'test', restoring_interval=0, fork=False, check_memory=False, min_restoring_interval=0)
+    assert dbus_app_ids == {'/usr/bin/app0': 'org.example.App0', '/usr/bin/app1': None}
+    assert len(desktop.launched) == 2
+
+
+def test_warm_up_restore_without_session(tmp_path):
+    assert RestoreWarmUp('missing', base_location_of_sessions=tmp_path / 'sessions').start().get_resources() == {}
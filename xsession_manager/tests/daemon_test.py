@@ -0,0 +1,128 @@
+import io
+import json
+import os
+import queue
+import threading
+from time import sleep, time
+
+from ..daemon import DaemonClient, XSessionManagerDaemon
+from ..session_cache import SessionCache
+
+
+class FakeMainLoop:
+    """
+    Run the functions which the daemon calls by the main loop in the main thread, like GLib.idle_add().
+    """
+
+    def __init__(self):
+        self.calls = queue.Queue()
+
+    def call_soon(self, function):
+        self.calls.put(function)
+
+    def run_once(self):
+        function = self.calls.get(timeout=5)
+        assert function() is False
+
+
+def request_in_thread(client: DaemonClient, command: str, options, output: io.StringIO,
+                      exit_codes: list) -> threading.Thread:
+    thread = threading.Thread(target=lambda: exit_codes.append(client.request(command, options, output=output)))
+    thread.start()
+    return thread
+
+
+def test_run_commands_by_the_daemon(tmp_path):
+    requests = []
+
+    def command_runner(command, options, verbose, vv, fork, **resources):
+        # GTK and Wnck may only be used by the main loop
+        assert threading.current_thread() is threading.main_thread()
+        requests.append((command, options, fork))
+        print('Running %s' % command)
+        if command == 'close':
+            raise RuntimeError('Failed to close')
+
+    main_loop = FakeMainLoop()
+    daemon = XSessionManagerDaemon(tmp_path / 'daemon.sock', command_runner=command_runner,
+                                   call_soon=main_loop.call_soon)
+    daemon.listen()
+    daemon._worker.start()
+    output = io.StringIO()
+    client = DaemonClient(tmp_path / 'daemon.sock')
+    exit_codes = []
+    try:
+        for command, options in [('save', {'session_name': 'test'}), ('close', {'close_all': []})]:
+            client_thread = request_in_thread(client, command, options, output, exit_codes)
+            daemon.accept_connection()
+            main_loop.run_once()
+            client_thread.join(5)
+    finally:
+        daemon.close()
+
+    # The daemon must not fork
+    assert requests == [('save', {'session_name': 'test'}, False),
+                        ('close', {'close_all': []}, False)]
+    assert exit_codes == [0, 1]
+    assert 'Running save' in output.getvalue()
+    assert 'RuntimeError: Failed to close' in output.getvalue()
+    assert not (tmp_path / 'daemon.sock').exists()
+
+
+def test_queue_requests_until_the_main_loop_runs_them(tmp_path):
+    requests = []
+
+    def command_runner(command, options, verbose, vv, fork, **resources):
+        requests.append(command)
+
+    main_loop = FakeMainLoop()
+    daemon = XSessionManagerDaemon(tmp_path / 'daemon.sock', command_runner=command_runner,
+                                   call_soon=main_loop.call_soon)
+    daemon.listen()
+    daemon._worker.start()
+    client = DaemonClient(tmp_path / 'daemon.sock')
+    exit_codes = []
+    try:
+        client_threads = [request_in_thread(client, command, {}, io.StringIO(), exit_codes)
+                          for command in ('restore', 'save')]
+        # Returns at once, the requests wait for the main loop
+        daemon.accept_connection()
+        daemon.accept_connection()
+        assert daemon.busy
+        assert requests == []
+
+        main_loop.run_once()
+        main_loop.run_once()
+        for client_thread in client_threads:
+            client_thread.join(5)
+        # Done once the worker has closed the connection after sending the exit code
+        deadline = time() + 5
+        while daemon.busy:
+            assert time() < deadline
+            sleep(0.01)
+    finally:
+        daemon.close()
+    assert sorted(requests) == ['restore', 'save']
+    assert exit_codes == [0, 0]
+
+
+def test_return_none_if_the_daemon_is_not_running(tmp_path):
+    client = DaemonClient(tmp_path / 'daemon.sock')
+    assert not client.is_running()
+    assert client.request('save', {'session_name': 'test'}) is None
+
+
+def test_parse_sessions_again_only_if_modified(tmp_path):
+    session_path = tmp_path / 'session'
+    session_path.write_text(json.dumps({'session_name': 'first'}))
+
+    session_cache = SessionCache()
+    session = session_cache.load(session_path)
+    assert session.session_name == 'first'
+    assert session_cache.load(session_path) is session
+
+    session_path.write_text(json.dumps({'session_name': 'second'}))
+    stat_result = os.stat(session_path)
+    # Make sure the mtime changes even if the file system has a coarse timestamp granularity
+    os.utime(session_path, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns + 10 ** 9))
+    assert session_cache.load(session_path).session_name == 'second'
@@ -0,0 +1,109 @@
+import os
+import shutil
+import subprocess
+import threading
+from typing import List, Tuple
+
+import pytest
+
+pytest.importorskip('gi')
+if shutil.which('dbus-daemon') is None:
+    pytest.skip('dbus-daemon is not installed', allow_module_level=True)
+
+from gi.repository import Gio, GLib
+
+from ..utils.dbus_activation import activate, get_object_path
+
+APP_ID = 'org.example.App'
+
+BUS_CONFIG = '''<!DOCTYPE busconfig PUBLIC "-//freedesktop//DTD D-Bus Bus Configuration 1.0//EN"
+ "http://www.freedesktop.org/standards/dbus/1.0/busconfig.dtd">
+<busconfig>
+  <type>session</type>
+  <listen>unix:dir=%s</listen>
+  <policy context="default">
+    <allow send_destination="*"/>
+    <allow own="*"/>
+  </policy>
+</busconfig>
+'''
+
+APPLICATION_XML = '''<node>
+  <interface name="org.freedesktop.Application">
+    <method name="Activate">
+      <arg type="a{sv}" name="platform_data" direction="in"/>
+    </method>
+    <method name="Open">
+      <arg type="as" name="uris" direction="in"/>
+      <arg type="a{sv}" name="platform_data" direction="in"/>
+    </method>
+  </interface>
+</node>
+'''
+
+
+def connect(address: str) -> Gio.DBusConnection:
+    return Gio.DBusConnection.new_for_address_sync(address,
+                                                   Gio.DBusConnectionFlags.AUTHENTICATION_CLIENT
+                                                   | Gio.DBusConnectionFlags.MESSAGE_BUS_CONNECTION,
+                                                   None, None)
+
+
+@pytest.fixture
+def bus_address(tmp_path) -> str:
+    """
+    A private session bus.
+    """
+    config_path = tmp_path / 'bus.conf'
+    config_path.write_text(BUS_CONFIG % tmp_path)
+    bus = subprocess.Popen(['dbus-daemon', '--nofork', '--print-address', '--config-file=%s' % config_path],
+                           stdout=subprocess.PIPE, universal_newlines=True)
+    try:
+        yield bus.stdout.readline().strip()
+    finally:
+        bus.terminate()
+        bus.wait()
+
+
+@pytest.fixture
+def app_calls(bus_address) -> List[Tuple[str, tuple]]:
+    """
+    A GApplication-like app on the private bus, which records the methods called.
+    """
+    calls = []
+    connection = connect(bus_address)
+
+    def on_method_call(connection, sender, object_path, interface_name, method_name, parameters, invocation):
+        calls.append((method_name, parameters.unpack()))
+        invocation.return_value(None)
+
+    interface_info = Gio.DBusNodeInfo.new_for_xml(APPLICATION_XML).interfaces[0]
+    connection.register_object(get_object_path(APP_ID), interface_info, on_method_call, None, None)
+    connection.call_sync('org.freedesktop.DBus', '/org/freedesktop/DBus', 'org.freedesktop.DBus', 'RequestName',
+                         GLib.Variant('(su)', (APP_ID, 0)), GLib.VariantType.new('(u)'), Gio.DBusCallFlags.NONE,
+                         -1, None)
+    main_loop = GLib.MainLoop()
+    thread = threading.Thread(target=main_loop.run, daemon=True)
+    thread.start()
+    try:
+        yield calls
+    finally:
+        main_loop.quit()
+        thread.join()
+        connection.close_sync(None)
+
+
+def test_get_object_path():
+    assert get_object_path('org.gnome.gedit') == '/org/gnome/gedit'
+    assert get_object_path('org.example.my-app') == '/org/example/my_app'
+
+
+def test_activate(bus_address, app_calls):
+    connection = connect(bus_address)
+    assert activate(APP_ID, connection=connection) == os.getpid()
+    assert activate(APP_ID, ['file:///tmp/a.txt'], connection=connection) == os.getpid()
+    assert app_calls == [('Activate', ({},)), ('Open', (['file:///tmp/a.txt'], {}))]
+
+
+def test_fail_to_activate_an_app_not_on_the_bus(bus_address):
+    assert activate('org.example.Missing', connection=connect(bus_address)) is None
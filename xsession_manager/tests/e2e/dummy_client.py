@@ -0,0 +1,43 @@
+"""
+A dummy app for the end-to-end harness, which opens windows and exits once all of them are closed.
+
+Usage:
+    python3 dummy_client.py --name app0 --windows 3
+
+It is run as a script, so that xsm relaunches it by the command line saved, without this package on the path.
+"""
+import argparse
+
+import gi
+from gi.repository import GLib
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Open dummy windows')
+    parser.add_argument('--name', required=True, help='The app name, which is also the WM_CLASS of its windows')
+    parser.add_argument('--windows', type=int, default=1)
+    args = parser.parse_args()
+
+    # Before Gtk is initialized, which sets WM_CLASS from it
+    GLib.set_prgname(args.name)
+    gi.require_version('Gtk', '3.0')
+    from gi.repository import Gtk
+
+    windows = []
+
+    def on_destroy(window):
+        windows.remove(window)
+        if len(windows) == 0:
+            Gtk.main_quit()
+
+    for i in range(args.windows):
+        window = Gtk.Window(title='%s - window %d' % (args.name, i))
+        window.set_default_size(320, 240)
+        window.connect('destroy', on_destroy)
+        window.show()
+        windows.append(window)
+    Gtk.main()
+
+
+if __name__ == '__main__':
+    main()
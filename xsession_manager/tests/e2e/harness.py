@@ -0,0 +1,353 @@
+"""
+Run xsm end to end against a headless X server, and record the wall time, the X requests and the subprocesses
+of each phase: save (-s), move back (-ma), close (-c) and restore (-r).
+
+Usage:
+    python -m xsession_manager.tests.e2e.harness --windows 100 --apps 30 --workspaces 4
+
+Requires Xvfb, wmctrl, an EWMH window manager (openbox by default, see --window-manager) and PyGObject with
+Gtk 3 and Wnck 3. The X requests are counted by xtrace if it is installed, which slows the phases down,
+so compare the wall times of runs with the same --no-xtrace.
+
+The dummy apps, see dummy_client.py, are spread over the workspaces before saving, and scattered to other
+workspaces before moving them back. xsm is run with a temporary HOME and XDG_RUNTIME_DIR, so that neither the
+sessions saved nor the daemon of the user are touched. The logs are kept in the work directory printed.
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from time import sleep, time
+from typing import Dict, Iterator, List, Tuple
+
+from .xsm_probe import STATS_DIR_ENV
+
+PACKAGE_ROOT = Path(__file__).resolve().parents[3]
+DUMMY_CLIENT = Path(__file__).resolve().parent / 'dummy_client.py'
+
+SESSION_NAME = 'e2e'
+WINDOW_MANAGERS = ['openbox', 'icewm', 'fluxbox']
+POLL_INTERVAL = 0.1
+
+# A request sent by a client in the output of xtrace, like `000:<:0005: 20: Request(20): GetProperty ...`
+X_REQUEST_PATTERN = re.compile(r'^\d+:<:[0-9a-f]+:\s*\d+: (?:[\w-]+-)?Request\([\d,]+\): (\S+)')
+
+
+class PhaseResult:
+
+    def __init__(self, name: str, wall_time: float, subprocesses: Dict[str, int], x_requests: Dict[str, int]):
+        """
+        :param x_requests: the number of each X request, None if not traced
+        """
+        self.name = name
+        self.wall_time = wall_time
+        self.subprocesses = subprocesses
+        self.x_requests = x_requests
+        # The windows not on the workspaces saved after this phase
+        self.misplaced_windows = 0
+
+    def to_dict(self) -> dict:
+        return {'name': self.name,
+                'wall_time': self.wall_time,
+                'subprocesses': self.subprocesses,
+                'x_requests': self.x_requests,
+                'misplaced_windows': self.misplaced_windows}
+
+
+def count_x_requests(lines: Iterator[str]) -> Dict[str, int]:
+    """
+    :param lines: the output of xtrace
+    """
+    requests = Counter()
+    for line in lines:
+        match = X_REQUEST_PATTERN.match(line)
+        if match:
+            requests[match.group(1)] += 1
+    return dict(requests)
+
+
+def merge_probe_stats(stats: List[dict]) -> Dict[str, int]:
+    subprocesses = Counter()
+    for s in stats:
+        subprocesses.update(s['subprocesses'])
+    return dict(subprocesses)
+
+
+def wait_until(predicate, timeout: float, message: str):
+    deadline = time() + timeout
+    while not predicate():
+        if time() > deadline:
+            raise TimeoutError(message)
+        sleep(POLL_INTERVAL)
+
+
+def terminate(process: subprocess.Popen):
+    if process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def get_free_display_number(start: int) -> int:
+    number = start
+    while Path('/tmp/.X11-unix/X%d' % number).exists() or Path('/tmp/.X%d-lock' % number).exists():
+        number += 1
+    return number
+
+
+@contextmanager
+def start_x_server(screen: str, log) -> Iterator[str]:
+    """
+    :return: the display of Xvfb, like :1
+    """
+    read_fd, write_fd = os.pipe()
+    process = subprocess.Popen(['Xvfb', '-displayfd', str(write_fd), '-screen', '0', screen, '-nolisten', 'tcp'],
+                               pass_fds=(write_fd,), stdout=log, stderr=log)
+    os.close(write_fd)
+    # Xvfb writes the display number once it is ready to accept connections
+    with os.fdopen(read_fd) as f:
+        display_number = f.readline().strip()
+    try:
+        if display_number == '':
+            raise RuntimeError('Xvfb failed to start')
+        yield ':' + display_number
+    finally:
+        terminate(process)
+
+
+@contextmanager
+def start_window_manager(window_manager: str, workspaces: int, env: Dict[str, str], log) -> Iterator[None]:
+    process = subprocess.Popen([window_manager], env=env, stdout=log, stderr=log)
+    try:
+        wait_until(lambda: subprocess.run(['wmctrl', '-m'], env=env, stdout=subprocess.DEVNULL,
+                                          stderr=subprocess.DEVNULL).returncode == 0,
+                   10, '%s failed to start' % window_manager)
+        subprocess.run(['wmctrl', '-n', str(workspaces)], env=env, check=True)
+        yield
+    finally:
+        terminate(process)
+
+
+@contextmanager
+def start_xtrace(display: str, trace_path: Path, env: Dict[str, str], log) -> Iterator[str]:
+    """
+    Proxy the display through xtrace, which writes the requests to trace_path.
+
+    :return: the display to connect to instead
+    """
+    proxy_display = ':%d' % get_free_display_number(int(display[1:]) + 1)
+    process = subprocess.Popen(['xtrace', '--keeprunning', '-d', display, '-D', proxy_display, '-o', str(trace_path)],
+                               env=env, stdout=log, stderr=log)
+    try:
+        wait_until(lambda: Path('/tmp/.X11-unix/X%s' % proxy_display[1:]).exists(), 10, 'xtrace failed to start')
+        yield proxy_display
+    finally:
+        terminate(process)
+
+
+def get_windows(env: Dict[str, str]) -> Dict[str, Tuple[str, int]]:
+    """
+    :return: the title of each window -> (its xid, its workspace)
+    """
+    output = subprocess.check_output(['wmctrl', '-l'], env=env, text=True)
+    windows = {}
+    for line in output.splitlines():
+        fields = line.split(None, 3)
+        if len(fields) == 4:
+            windows[fields[3]] = (fields[0], int(fields[1]))
+    return windows
+
+
+def move_windows(moves: Dict[str, int], env: Dict[str, str]):
+    """
+    :param moves: the xid of each window -> the workspace to move it to
+    """
+    for xid, workspace in moves.items():
+        subprocess.run(['wmctrl', '-i', '-r', xid, '-t', str(workspace)], env=env, check=True)
+    wait_until(lambda: all(get_windows_by_xid(env).get(xid) == workspace for xid, workspace in moves.items()),
+               30, 'Failed to move the windows')
+
+
+def get_windows_by_xid(env: Dict[str, str]) -> Dict[str, int]:
+    return {xid: workspace for xid, workspace in get_windows(env).values()}
+
+
+def spawn_apps(windows: int, apps: int, env: Dict[str, str], log) -> List[subprocess.Popen]:
+    windows_of_apps = [0] * apps
+    for i in range(windows):
+        windows_of_apps[i % apps] += 1
+    return [subprocess.Popen([sys.executable, str(DUMMY_CLIENT), '--name', 'app%d' % i, '--windows', str(n)],
+                             env=env, stdout=log, stderr=log)
+            for i, n in enumerate(windows_of_apps)]
+
+
+def count_misplaced_windows(layout: Dict[str, int], env: Dict[str, str]) -> int:
+    """
+    :param layout: the title of each window -> the workspace it should be on
+    """
+    windows = get_windows(env)
+    return sum(1 for title, workspace in layout.items()
+               if title not in windows or windows[title][1] != workspace)
+
+
+def run_phase(name: str, xsm_args: List[str], env: Dict[str, str], work_dir: Path, trace: bool,
+              timeout: float) -> PhaseResult:
+    stats_dir = work_dir / ('%s-stats' % name)
+    stats_dir.mkdir()
+    phase_env = dict(env)
+    phase_env[STATS_DIR_ENV] = str(stats_dir)
+    x_trace_log = work_dir / ('%s-xtrace.log' % name)
+
+    def get_probe_stats() -> List[dict]:
+        return [json.loads(path.read_text()) for path in stats_dir.glob('*.json')]
+
+    def all_probes_exited() -> bool:
+        # The first process, and every process forked
+        stats = get_probe_stats()
+        return len(stats) == 1 + sum(s['forks'] for s in stats)
+
+    with open(work_dir / ('%s.log' % name), 'w') as log:
+        tracing = start_xtrace(env['DISPLAY'], x_trace_log, env, log) if trace else _no_xtrace(env['DISPLAY'])
+        with tracing as display:
+            phase_env['DISPLAY'] = display
+            started_at = time()
+            # Answer the prompt of xsm
+            subprocess.run([sys.executable, '-m', 'xsession_manager.tests.e2e.xsm_probe'] + xsm_args,
+                           input='y\n', env=phase_env, stdout=log, stderr=log, text=True, timeout=timeout)
+            # A restore goes on in a process forked and detached
+            wait_until(all_probes_exited, timeout, 'xsm %s did not finish in time' % ' '.join(xsm_args))
+            wall_time = time() - started_at
+
+    x_requests = None
+    if trace:
+        with open(x_trace_log, errors='replace') as f:
+            x_requests = count_x_requests(f)
+    return PhaseResult(name, wall_time, merge_probe_stats(get_probe_stats()), x_requests)
+
+
+@contextmanager
+def _no_xtrace(display: str) -> Iterator[str]:
+    yield display
+
+
+def run(args: argparse.Namespace, work_dir: Path) -> List[PhaseResult]:
+    home = work_dir / 'home'
+    runtime_dir = work_dir / 'runtime'
+    home.mkdir()
+    runtime_dir.mkdir(mode=0o700)
+    trace = not args.no_xtrace and shutil.which('xtrace') is not None
+    if not args.no_xtrace and not trace:
+        print('xtrace is not found, the X requests are not counted')
+
+    results = []
+    with open(work_dir / 'x.log', 'w') as x_log, start_x_server(args.screen, x_log) as display:
+        env = dict(os.environ,
+                   DISPLAY=display,
+                   HOME=str(home),
+                   XDG_RUNTIME_DIR=str(runtime_dir),
+                   PYTHONPATH=str(PACKAGE_ROOT),
+                   GDK_BACKEND='x11',
+                   NO_AT_BRIDGE='1')
+        env.pop('WAYLAND_DISPLAY', None)
+        with start_window_manager(args.window_manager, args.workspaces, env, x_log):
+            with open(work_dir / 'apps.log', 'w') as apps_log:
+                apps = spawn_apps(args.windows, args.apps, env, apps_log)
+                wait_until(lambda: len(get_windows(env)) >= args.windows, args.timeout,
+                           'The dummy apps failed to open their windows, see %s' % apps_log.name)
+                windows = get_windows(env)
+                # Spread the windows over the workspaces
+                layout = {title: i % args.workspaces for i, title in enumerate(sorted(windows))}
+                move_windows({windows[title][0]: workspace for title, workspace in layout.items()}, env)
+
+                def run_and_check(name: str, xsm_args: List[str]):
+                    result = run_phase(name, xsm_args, env, work_dir, trace, args.timeout)
+                    result.misplaced_windows = count_misplaced_windows(layout, env)
+                    results.append(result)
+
+                run_and_check('save', ['-s', SESSION_NAME])
+                move_windows({xid: (workspace + 1) % args.workspaces
+                              for xid, workspace in get_windows(env).values()}, env)
+                run_and_check('move', ['-ma', SESSION_NAME])
+                run_and_check('close', ['-c', '-im'])
+                for app in apps:
+                    app.wait(args.timeout)
+                run_and_check('restore', ['-r', SESSION_NAME] + args.restore_args)
+
+                # Close the apps restored, which are not children of this process
+                run_phase('cleanup', ['-c', '-im'], env, work_dir, False, args.timeout)
+    return results
+
+
+def print_results(results: List[PhaseResult]):
+    print('%-8s %10s %11s %13s %9s' % ('phase', 'wall time', 'X requests', 'subprocesses', 'misplaced'))
+    for result in results:
+        print('%-8s %9.3fs %11s %13d %9d'
+              % (result.name,
+                 result.wall_time,
+                 'n/a' if result.x_requests is None else sum(result.x_requests.values()),
+                 sum(result.subprocesses.values()),
+                 result.misplaced_windows))
+        top_subprocesses = Counter(result.subprocesses).most_common(3)
+        if top_subprocesses:
+            print('%8s subprocesses: %s' % ('', ', '.join('%s %d' % s for s in top_subprocesses)))
+        if result.x_requests:
+            top_requests = Counter(result.x_requests).most_common(5)
+            print('%8s X requests: %s' % ('', ', '.join('%s %d' % r for r in top_requests)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run xsm end to end against Xvfb')
+    parser.add_argument('-n', '--windows', type=int, default=20, help='The number of dummy windows')
+    parser.add_argument('-a', '--apps', type=int, default=8, help='The number of dummy apps the windows belong to')
+    parser.add_argument('-w', '--workspaces', type=int, default=4)
+    parser.add_argument('--screen', default='1920x1080x24', help='The screen of Xvfb, WIDTHxHEIGHTxDEPTH')
+    parser.add_argument('--window-manager', default=None,
+                        help='An EWMH window manager, the first one found of %s by default'
+                             % ', '.join(WINDOW_MANAGERS))
+    parser.add_argument('--restore-args', nargs=argparse.REMAINDER, default=[],
+                        help='More arguments of xsm -r, like -ri 0.1, must be the last option')
+    parser.add_argument('--no-xtrace', action='store_true', help='Do not count the X requests')
+    parser.add_argument('--timeout', type=float, default=120, help='The timeout of each phase, in seconds')
+    parser.add_argument('--work-dir', type=Path, help='Where to keep the logs, a temporary directory by default')
+    parser.add_argument('-o', '--output', type=Path, help='Write the results to a JSON file as well')
+    args = parser.parse_args()
+
+    if args.apps < 1 or args.windows < args.apps:
+        parser.error('--windows must be at least --apps, which must be at least 1')
+    if args.window_manager is None:
+        args.window_manager = next((wm for wm in WINDOW_MANAGERS if shutil.which(wm)), WINDOW_MANAGERS[0])
+    missing = [program for program in ('Xvfb', 'wmctrl', args.window_manager) if shutil.which(program) is None]
+    if missing:
+        parser.error('not found: %s' % ', '.join(missing))
+
+    if args.work_dir:
+        args.work_dir.mkdir(parents=True)
+        work_dir = args.work_dir
+    else:
+        work_dir = Path(tempfile.mkdtemp(prefix='xsm-e2e-'))
+    print('The logs are in %s' % work_dir)
+
+    results = run(args, work_dir)
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'windows': args.windows,
+                       'apps': args.apps,
+                       'workspaces': args.workspaces,
+                       'window_manager': args.window_manager,
+                       'phases': [result.to_dict() for result in results]},
+                      f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
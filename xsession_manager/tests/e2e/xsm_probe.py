@@ -0,0 +1,90 @@
+"""
+Run xsm like the xsm command does, and count the subprocesses it spawns, for the end-to-end harness.
+
+Usage:
+    XSM_PROBE_STATS_DIR=/tmp/stats python -m xsession_manager.tests.e2e.xsm_probe -s test
+
+Each process, including the ones xsm forks, writes its counts to <pid>.json in $XSM_PROBE_STATS_DIR when it exits.
+The counts include how many times it forked, so that the harness knows how many files to wait for.
+Subprocesses spawned by GLib, like apps launched by their .desktop files, are not counted.
+"""
+import atexit
+import json
+import os
+import shlex
+import sys
+from collections import Counter
+from pathlib import Path
+from typing import List
+
+STATS_DIR_ENV = 'XSM_PROBE_STATS_DIR'
+
+SHELLS = ('sh', 'bash', 'dash')
+
+_subprocesses = Counter()
+_forks = [0]
+
+
+def get_program(argv: List) -> str:
+    """
+    :return: the name of the program run by the command line, looking through `sh -c`
+    """
+    argv = [os.fsdecode(arg) for arg in argv]
+    if len(argv) == 0:
+        return ''
+    program = os.path.basename(argv[0])
+    if program in SHELLS and len(argv) > 2 and argv[1] == '-c':
+        words = shlex.split(argv[2])
+        if len(words) > 0:
+            program = os.path.basename(words[0])
+    return program
+
+
+def _audit(event: str, args: tuple):
+    if event == 'subprocess.Popen':
+        # (executable, args, cwd, env)
+        _subprocesses[get_program(args[1])] += 1
+    elif event in ('os.posix_spawn', 'os.exec'):
+        # (path, argv, env)
+        _subprocesses[get_program(args[1])] += 1
+
+
+def _after_fork_in_child():
+    _subprocesses.clear()
+    _forks[0] = 0
+
+
+def _after_fork_in_parent():
+    _forks[0] += 1
+
+
+def _write_stats(stats_dir: str):
+    path = Path(stats_dir, '%d.json' % os.getpid())
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump({'pid': os.getpid(), 'forks': _forks[0], 'subprocesses': dict(_subprocesses)}, f)
+    os.replace(tmp_path, path)
+
+
+def main():
+    stats_dir = os.environ[STATS_DIR_ENV]
+    sys.addaudithook(_audit)
+    os.register_at_fork(after_in_child=_after_fork_in_child, after_in_parent=_after_fork_in_parent)
+    # Run in every process exiting normally, including the ones forked
+    atexit.register(_write_stats, stats_dir)
+
+    from ...arguments_handler import ArgumentsHandler
+    from ...arguments_parser import ArgumentsParser
+    from ...utils import log
+
+    # Unlike main.run(), do not check the login user, os.getlogin() fails without a controlling terminal
+    sys.argv = ['xsm'] + sys.argv[1:]
+    args = ArgumentsParser().parse_arguments()
+    arguments_handler = ArgumentsHandler(args)
+    log.configure(args.verbose, args.vv, args.log_file)
+    arguments_handler.check_and_preset_args()
+    arguments_handler.handle_arguments()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,19 @@
+from .e2e.harness import count_x_requests, merge_probe_stats
+from .e2e.xsm_probe import get_program
+
+
+def test_count_x_requests():
+    lines = ['000:<:0001: 12: Request(98): QueryExtension name=\'RANDR\'\n',
+             '000:>:0001:32: Reply to QueryExtension: present=true(0x01)\n',
+             '000:<:0002: 24: Request(20): GetProperty delete=false(0x00) window=0x00000539\n',
+             '001:<:0003: 24: Request(20): GetProperty delete=false(0x00) window=0x00000539\n',
+             '000:<:0004:  8: RANDR-Request(140,5): RRGetScreenResources window=0x00000539\n']
+    assert count_x_requests(lines) == {'QueryExtension': 1, 'GetProperty': 2, 'RRGetScreenResources': 1}
+
+
+def test_count_subprocesses():
+    assert get_program(['/bin/sh', '-c', 'wmctrl -lpG']) == 'wmctrl'
+    assert get_program([b'/usr/bin/wmctrl', b'-ic', b'0x03e00004']) == 'wmctrl'
+    assert merge_probe_stats([{'pid': 1, 'forks': 1, 'subprocesses': {'wmctrl': 2}},
+                              {'pid': 2, 'forks': 0, 'subprocesses': {'wmctrl': 1, 'app0': 1}}]) \
+        == {'wmctrl': 3, 'app0': 1}
@@ -0,0 +1,351 @@
+import heapq
+import threading
+from contextlib import contextmanager
+from itertools import count
+from pathlib import Path
+from time import time
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+
+from ..utils.desktop_backend import DesktopBackend, ProcessDetails
+from ..utils.process_snapshot import ProcessSnapshot
+from ..xsession_manager import XSessionManager
+
+DEFAULT_GEOMETRY = (0, 0, 800, 600)
+
+
+class FakeWindow:
+
+    def __init__(self, xid: int, pid: int, desktop_number: int, title: str, app_name: str,
+                 geometry: Tuple[int, int, int, int] = DEFAULT_GEOMETRY):
+        self.xid = xid
+        self.pid = pid
+        self.desktop_number = desktop_number
+        self.title = title
+        self.app_name = app_name
+        self.geometry = geometry
+        self.is_sticky = False
+        self.is_above = False
+
+
+class FakeProcess:
+
+    def __init__(self, pid: int, ppid: int, cmdline: List[str], memory_percent: float = 0.1):
+        self.pid = pid
+        self.ppid = ppid
+        self.cmdline = cmdline
+        self.create_time = time()
+        self.memory_percent = memory_percent
+
+
+class AppTemplate:
+    """
+    What an app does once it is launched: the windows it maps on the active workspace, after its startup delay.
+    """
+
+    def __init__(self, app_name: str, cmd: List[str], window_titles: List[str], startup_delay: float):
+        self.app_name = app_name
+        self.cmd = cmd
+        self.window_titles = window_titles
+        self.startup_delay = startup_delay
+
+
+class FakeDesktop(DesktopBackend):
+    """
+    An in-memory desktop which simulates windows, processes, launching apps and the window manager.
+
+    The window manager handles requests, like moving a window to another workspace, after a delay. Like Wnck, events
+    are handled and signals are emitted only while querying the desktop. It is thread-safe.
+    """
+
+    def __init__(self,
+                 workspace_count: int = 4,
+                 startup_delay: float = 0.0,
+                 move_delay: float = 0.0,
+                 close_delay: float = 0.0):
+        """
+        :param startup_delay: how long an app takes to map its windows after being launched, in seconds
+        :param move_delay: how long the window manager takes to move or resize a window, in seconds
+        :param close_delay: how long an app takes to close a window, in seconds
+        """
+        self.workspace_count = workspace_count
+        self.active_workspace = 0
+        self.startup_delay = startup_delay
+        self.move_delay = move_delay
+        self.close_delay = close_delay
+
+        self.windows: Dict[int, FakeWindow] = {}
+        self.processes: Dict[int, FakeProcess] = {}
+        # The command lines launched, in order
+        self.launched: List[List[str]] = []
+        self._templates: Dict[Tuple[str, ...], AppTemplate] = {}
+        self._next_xid = count(0x04000001)
+        self._next_pid = count(10000)
+        # (due at, sequence, event)
+        self._events: List[Tuple[float, int, Callable[[], None]]] = []
+        self._event_sequence = count()
+        # handler id -> (signal, callback)
+        self._handlers: Dict[int, Tuple[str, Callable[[int], None]]] = {}
+        self._next_handler_id = count(1)
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def populate(windows: int, processes: int, **kwargs) -> 'FakeDesktop':
+        """
+        Create a desktop with apps running, whose windows are spread over the processes and the workspaces.
+        """
+        desktop = FakeDesktop(**kwargs)
+        windows_of_apps = [0] * processes
+        for i in range(windows):
+            windows_of_apps[i % processes] += 1
+        window_number = 0
+        for app_number, windows_of_app in enumerate(windows_of_apps):
+            desktop_numbers = [(window_number + i) % desktop.workspace_count for i in range(windows_of_app)]
+            desktop.add_app('app%d' % app_number, desktop_numbers)
+            window_number += windows_of_app
+        return desktop
+
+    def add_app(self, app_name: str, desktop_numbers: List[int], startup_delay: float = None) -> FakeProcess:
+        """
+        Make an app launchable, and start it with one window on each of the workspaces given.
+        """
+        cmd = ['/usr/bin/%s' % app_name, '--fake']
+        titles = ['%s - window %d' % (app_name, i) for i in range(len(desktop_numbers))]
+        with self._lock:
+            self._templates[tuple(cmd)] = AppTemplate(app_name, cmd, titles,
+                                                      self.startup_delay if startup_delay is None else startup_delay)
+            process = self._add_process(cmd)
+            for title, desktop_number in zip(titles, desktop_numbers):
+                geometry = (desktop_number * 10, len(self.windows) % 100, 640, 480)
+                self._map_window(process.pid, desktop_number, title, app_name, geometry)
+            return process
+
+    def scatter(self):
+        """
+        Move every window to another workspace, as if the user did.
+        """
+        with self._lock:
+            for window in self.windows.values():
+                window.desktop_number = (window.desktop_number + 1) % self.workspace_count
+
+    def close_all(self):
+        """
+        Close all windows and processes at once, as if the user logged out.
+        """
+        with self._lock:
+            self.windows.clear()
+            self.processes.clear()
+            self._events.clear()
+
+    def switch_workspace(self, workspace: int):
+        with self._lock:
+            self.active_workspace = workspace
+            self._schedule(0, lambda: self._emit('active-workspace-changed', workspace))
+
+    def _add_process(self, cmd: List[str]) -> FakeProcess:
+        process = FakeProcess(next(self._next_pid), 1, list(cmd))
+        self.processes[process.pid] = process
+        return process
+
+    def _map_window(self, pid: int, desktop_number: int, title: str, app_name: str,
+                    geometry: Tuple[int, int, int, int] = DEFAULT_GEOMETRY) -> FakeWindow:
+        window = FakeWindow(next(self._next_xid), pid, desktop_number, title, app_name, geometry)
+        self.windows[window.xid] = window
+        return window
+
+    def _schedule(self, delay: float, event: Callable[[], None]):
+        if delay <= 0:
+            event()
+            return
+        heapq.heappush(self._events, (time() + delay, next(self._event_sequence), event))
+
+    def _handle_events(self):
+        with self._lock:
+            now = time()
+            while len(self._events) > 0 and self._events[0][0] <= now:
+                _, _, event = heapq.heappop(self._events)
+                event()
+
+    def _emit(self, signal: str, value: int):
+        for _signal, callback in list(self._handlers.values()):
+            if _signal == signal:
+                callback(value)
+
+    def _get_window(self, xid: int) -> FakeWindow:
+        self._handle_events()
+        return self.windows.get(xid)
+
+    # Windows
+
+    def get_running_windows(self) -> list:
+        self._handle_events()
+        with self._lock:
+            return [['0x%08x' % w.xid, str(w.desktop_number), str(w.pid),
+                     str(w.geometry[0]), str(w.geometry[1]), str(w.geometry[2]), str(w.geometry[3]),
+                     'fake-host', w.title]
+                    for w in self.windows.values()]
+
+    def refresh_screen(self):
+        self._handle_events()
+
+    def get_app_name(self, xid: int, refresh: bool=True) -> str:
+        window = self._get_window(xid)
+        return window.app_name if window else ''
+
+    def is_above(self, xid: int) -> bool:
+        window = self._get_window(xid)
+        return window.is_above if window else False
+
+    def is_sticky(self, xid: int, refresh: bool=True) -> bool:
+        window = self._get_window(xid)
+        return window.is_sticky if window else False
+
+    def make_above(self, xid: int, refresh: bool=True):
+        window = self._get_window(xid)
+        if window:
+            window.is_above = True
+
+    def stick(self, xid: int, refresh: bool=True):
+        window = self._get_window(xid)
+        if window:
+            window.is_sticky = True
+
+    def get_geometry(self, xid: int, refresh: bool=True) -> Tuple[int, int, int, int]:
+        window = self._get_window(xid)
+        return window.geometry if window else None
+
+    def get_geometries(self, xids: Iterable[int]) -> Dict[int, Tuple[int, int, int, int]]:
+        self._handle_events()
+        with self._lock:
+            return {xid: self.windows[xid].geometry for xid in xids if xid in self.windows}
+
+    def set_geometries(self, geometries: Dict[int, Tuple[int, int, int, int]]):
+        def set_geometry(window: FakeWindow, geometry: Tuple[int, int, int, int]):
+            window.geometry = geometry
+
+        with self._lock:
+            for xid, geometry in geometries.items():
+                window = self.windows.get(xid)
+                if window:
+                    self._schedule(self.move_delay, lambda w=window, g=geometry: set_geometry(w, g))
+
+    def move_windows_to(self, moves: List[Tuple[int, int]]):
+        def move_window_to(window: FakeWindow, desktop_number: int):
+            window.desktop_number = desktop_number
+
+        with self._lock:
+            for xid, desktop_number in moves:
+                window = self.windows.get(xid)
+                if window and desktop_number < self.workspace_count:
+                    self._schedule(self.move_delay, lambda w=window, d=desktop_number: move_window_to(w, d))
+
+    def are_in_workspaces(self, moves: List[Tuple[int, int]]) -> bool:
+        self._handle_events()
+        with self._lock:
+            return all(self.windows[xid].desktop_number == desktop_number
+                       for xid, desktop_number in moves if xid in self.windows)
+
+    def get_existing_window_ids(self, xids: Iterable[int], refresh: bool=True) -> Set[int]:
+        self._handle_events()
+        with self._lock:
+            return {xid for xid in xids if xid in self.windows}
+
+    def close_window_gracefully_async(self, xid: int, refresh: bool=True):
+        def close_window():
+            window = self.windows.pop(xid, None)
+            if window is None:
+                return
+            # An app exits once its last window is closed
+            if all(w.pid != window.pid for w in self.windows.values()):
+                self.processes.pop(window.pid, None)
+            self._emit('window-closed', xid)
+
+        with self._lock:
+            if xid in self.windows:
+                self._schedule(self.close_delay, close_window)
+
+    def connect_window_closed(self, callback: Callable[[int], None]) -> int:
+        return self._connect('window-closed', callback)
+
+    def connect_active_workspace_changed(self, callback: Callable[[int], None]) -> int:
+        return self._connect('active-workspace-changed', callback)
+
+    def _connect(self, signal: str, callback: Callable[[int], None]) -> int:
+        with self._lock:
+            handler_id = next(self._next_handler_id)
+            self._handlers[handler_id] = (signal, callback)
+            return handler_id
+
+    def disconnect(self, handler_id: int):
+        with self._lock:
+            self._handlers.pop(handler_id, None)
+
+    def get_active_workspace_number(self, refresh: bool=True) -> int:
+        self._handle_events()
+        return self.active_workspace
+
+    @contextmanager
+    def create_enough_workspaces(self, max_desktop_number: int):
+        with self._lock:
+            self.workspace_count = max(self.workspace_count, max_desktop_number)
+        yield
+
+    # Processes
+
+    def take_process_snapshot(self) -> ProcessSnapshot:
+        self._handle_events()
+        snapshot = ProcessSnapshot()
+        with self._lock:
+            for process in self.processes.values():
+                snapshot.add(process.pid, process.ppid, process.cmdline)
+        return snapshot
+
+    def get_process_details(self, pid: int) -> ProcessDetails:
+        with self._lock:
+            process = self.processes.get(pid)
+            if process is None:
+                return None
+            return ProcessDetails('user', list(process.cmdline), process.create_time, 0.0, process.memory_percent)
+
+    def get_total_memory(self) -> int:
+        return 16 * 1024 * 1024 * 1024
+
+    def get_cpu_percent(self) -> float:
+        return 0.0
+
+    def reap_children(self) -> int:
+        return 0
+
+    def activate_app(self, cmd: List[str], get_dbus_app_id) -> int:
+        # No app is D-Bus activatable
+        return None
+
+    def launch_app(self, cmd: List[str], niceness_increment: int=0, idle_io: bool=False) -> FakeProcess:
+        with self._lock:
+            template = self._templates.get(tuple(cmd))
+            if template is None:
+                raise FileNotFoundError(cmd[0])
+            self.launched.append(list(cmd))
+            process = self._add_process(cmd)
+
+            def map_windows():
+                for title in template.window_titles:
+                    self._map_window(process.pid, self.active_workspace, title, template.app_name)
+            self._schedule(template.startup_delay, map_windows)
+            return process
+
+
+def create_xsession_manager(desktop: FakeDesktop, tmp_path: Path, **kwargs) -> XSessionManager:
+    """
+    Create an XSessionManager working with a fake desktop, which keeps the sessions, the restore reports and
+    the sockets of restores under tmp_path, and does not learn the startup profiles of apps.
+
+    :param kwargs: the arguments of XSessionManager overridden, such as restore_reports_path=None or the resources
+    """
+    arguments = dict(base_location_of_sessions=tmp_path / 'sessions',
+                     base_location_of_backup_sessions=tmp_path / 'backups',
+                     desktop=desktop,
+                     app_profiles_path=None,
+                     restore_reports_path=tmp_path / 'reports',
+                     restore_jobs_path=tmp_path / 'jobs')
+    arguments.update(kwargs)
+    return XSessionManager(**arguments)
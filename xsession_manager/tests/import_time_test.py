@@ -0,0 +1,60 @@
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict
+
+import pytest
+
+# Heavy modules which must only be imported by the code paths using them
+HEAVY_MODULES = ['gi', 'psutil', 'pycurl', 'tkinter']
+
+# The cumulative import time of the command line in microseconds. It is generous on purpose, to catch regressions
+# like importing a heavy module at the module level, rather than small changes.
+IMPORT_TIME_BUDGET = 300000
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+
+def get_import_times(module: str) -> Dict[str, int]:
+    """
+    Import a module in a new interpreter via `python -X importtime`.
+
+    :return: the cumulative import time in microseconds of every imported module, keyed by module name
+    """
+    completed_process = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import %s' % module],
+                                       cwd=str(PROJECT_ROOT),
+                                       stdout=subprocess.DEVNULL,
+                                       stderr=subprocess.PIPE,
+                                       universal_newlines=True,
+                                       check=True)
+    import_times = {}
+    for line in completed_process.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        import_times[name.strip()] = int(cumulative)
+    return import_times
+
+
+@pytest.mark.parametrize('module', ['xsession_manager',
+                                    'xsession_manager.main',
+                                    'xsession_manager.arguments_handler',
+                                    'xsession_manager.xsession_manager'])
+def test_heavy_modules_are_not_imported(module):
+    import_times = get_import_times(module)
+    imported_heavy_modules = [name for name in import_times
+                              if name.split('.')[0] in HEAVY_MODULES]
+    assert imported_heavy_modules == []
+
+
+def test_import_time_of_command_line():
+    import_times = get_import_times('xsession_manager.main')
+    assert import_times['xsession_manager.main'] < IMPORT_TIME_BUDGET
+
+
+if __name__ == '__main__':
+    # Print the slowest modules imported by the command line
+    _import_times = get_import_times(sys.argv[1] if len(sys.argv) > 1 else 'xsession_manager.main')
+    for _name, _cumulative in sorted(_import_times.items(), key=lambda item: item[1], reverse=True)[:20]:
+        print('%10d us  %s' % (_cumulative, _name))
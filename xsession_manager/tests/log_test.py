@@ -0,0 +1,49 @@
+import json
+import logging
+
+from ..utils import log
+from ..utils.log import JsonLinesFormatter, LazyJson, TRACE
+
+
+class CountingPayload:
+
+    def __init__(self):
+        self.serialized = 0
+
+    @property
+    def __dict__(self):
+        self.serialized += 1
+        return {'app_name': 'firefox'}
+
+
+def test_lazy_json_is_not_serialized_if_the_level_is_disabled():
+    payload = CountingPayload()
+    logger = logging.getLogger('xsession_manager.tests.log_test')
+    with log.verbosity(verbose=False, vv=False):
+        logger.log(TRACE, 'Session: %s', LazyJson(payload))
+        assert payload.serialized == 0
+    assert str(LazyJson(payload)) == '{"app_name": "firefox"}'
+
+
+def test_json_lines(tmp_path):
+    log_file = tmp_path / 'xsm.log'
+    handler = logging.FileHandler(str(log_file))
+    handler.setFormatter(JsonLinesFormatter())
+    logger = logging.getLogger('xsession_manager.tests.log_test.json_lines')
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+    try:
+        logger.debug('Launched %s', 'firefox')
+        try:
+            raise RuntimeError('Failed to close')
+        except RuntimeError:
+            logger.exception('Failed to run %s', 'close')
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+
+    entries = [json.loads(line) for line in log_file.read_text().splitlines()]
+    assert [(e['level'], e['message']) for e in entries] == [('DEBUG', 'Launched firefox'),
+                                                             ('ERROR', 'Failed to run close')]
+    assert entries[0]['logger'] == 'xsession_manager.tests.log_test.json_lines'
+    assert 'RuntimeError: Failed to close' in entries[1]['exception']
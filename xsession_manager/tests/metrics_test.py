@@ -0,0 +1,41 @@
+from ..utils.metrics import Metrics
+from .fake_desktop import FakeDesktop, create_xsession_manager
+
+
+def test_add_to_the_metrics_in_the_textfile(tmp_path):
+    path = tmp_path / 'xsm.prom'
+    for duration in (0.3, 4):
+        metrics = Metrics()
+        metrics.inc('xsm_operations_total', operation='restore')
+        metrics.inc('xsm_restored_apps_total', 2, outcome='already running')
+        metrics.observe('xsm_operation_duration_seconds', duration, operation='restore')
+        metrics.set('xsm_last_operation_timestamp_seconds', 1000 + duration, operation='restore')
+        metrics.write_textfile(path)
+
+    text = path.read_text()
+    assert '# TYPE xsm_operation_duration_seconds histogram' in text
+    assert 'xsm_operations_total{operation="restore"} 2' in text
+    assert 'xsm_restored_apps_total{outcome="already running"} 4' in text
+    assert 'xsm_operation_duration_seconds_bucket{operation="restore",le="0.5"} 1' in text
+    assert 'xsm_operation_duration_seconds_bucket{operation="restore",le="+Inf"} 2' in text
+    assert 'xsm_operation_duration_seconds_sum{operation="restore"} 4.3' in text
+    assert 'xsm_last_operation_timestamp_seconds{operation="restore"} 1004' in text
+    # Written atomically, no temporary file is left
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['xsm.prom', 'xsm.prom.lock']
+
+
+def test_metrics_of_save_and_restore(tmp_path):
+    path = tmp_path / 'xsm.prom'
+    desktop = FakeDesktop.populate(windows=6, processes=3)
+
+    create_xsession_manager(desktop, tmp_path, metrics_path=path).save_session('test')
+    desktop.close_all()
+    create_xsession_manager(desktop, tmp_path, metrics_path=path).restore_session(
+        'test', restoring_interval=0, fork=False, check_memory=False, min_restoring_interval=0)
+
+    metrics = Metrics.parse(path.read_text())
+    assert metrics.get('xsm_operations_total', operation='save') == 1
+    assert metrics.get('xsm_operations_total', operation='restore') == 1
+    assert metrics.get('xsm_windows_saved_total') == 6
+    assert metrics.get('xsm_restored_apps_total', outcome='restored') == 3
+    assert 'xsm_window_placement_seconds_count 3' in path.read_text()
@@ -0,0 +1,40 @@
+from .. import pacing
+from ..pacing import LaunchPacer
+
+
+def create_pacer(load_per_cpu: float, iowait_percent: float, launches_in_flight: int) -> LaunchPacer:
+    launch_pacer = LaunchPacer(min_interval=0.1, max_interval=5, count_launches_in_flight=lambda: launches_in_flight)
+    launch_pacer._get_load_per_cpu = lambda: load_per_cpu
+    launch_pacer._get_iowait_percent = lambda: iowait_percent
+    launch_pacer._iowait_percent = iowait_percent
+    return launch_pacer
+
+
+def test_adapt_the_interval_to_the_load():
+    # Idle
+    assert create_pacer(0.0, 0.0, 0).get_interval(0.5) == 0.1
+    assert create_pacer(0.5, 2.0, 1).get_interval(0.5) == 0.25
+    # Loaded as the targets
+    assert create_pacer(1.0, 0.0, 0).get_interval(0.5) == 0.5
+    # Waiting for I/O
+    assert create_pacer(0.2, 60.0, 0).get_interval(0.5) == 1.5
+    # Too many apps have not mapped their windows yet
+    assert create_pacer(0.2, 0.0, 8).get_interval(0.5) == 1.0
+    # Overloaded
+    assert create_pacer(40.0, 0.0, 0).get_interval(0.5) == 5
+
+
+def test_wait_less_once_the_apps_in_flight_show_up(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(pacing, 'time', lambda: now[0])
+
+    def sleep(seconds):
+        now[0] += seconds
+    monkeypatch.setattr(pacing, 'sleep', sleep)
+
+    launch_pacer = create_pacer(0.0, 0.0, 0)
+    # 8 apps in flight in the first 2 checks, then all of them have mapped their windows
+    launches_in_flight = iter([8, 8])
+    launch_pacer.count_launches_in_flight = lambda: next(launches_in_flight, 0)
+    launch_pacer.wait(0.5)
+    assert 0.15 < now[0] < 0.25
@@ -0,0 +1,49 @@
+import os
+from types import SimpleNamespace
+
+from ..utils import prefetch
+from ..utils.prefetch import Prefetcher, get_interpreter, get_shared_libraries
+
+LDD_OUTPUT = '''	linux-vdso.so.1 (0x00007ffd5a3f2000)
+	libz.so.1 => /lib/x86_64-linux-gnu/libz.so.1 (0x00007f3b2c4a1000)
+	libc.so.6 => /lib/x86_64-linux-gnu/libc.so.6 (0x00007f3b2c200000)
+	libmissing.so.1 => not found
+	/lib64/ld-linux-x86-64.so.2 (0x00007f3b2c4e0000)
+'''
+
+
+def test_get_shared_libraries(monkeypatch):
+    monkeypatch.setattr(prefetch.subprocess, 'run', lambda *args, **kwargs: SimpleNamespace(stdout=LDD_OUTPUT))
+    assert get_shared_libraries('/usr/bin/app', timeout=1) == ['/lib/x86_64-linux-gnu/libz.so.1',
+                                                               '/lib/x86_64-linux-gnu/libc.so.6',
+                                                               '/lib64/ld-linux-x86-64.so.2']
+
+
+def test_get_interpreter(tmp_path):
+    script = tmp_path / 'app'
+    script.write_text('#!/usr/bin/env sh\necho app\n')
+    assert get_interpreter(str(script)) == os.path.realpath(prefetch.shutil.which('sh'))
+
+    binary = tmp_path / 'binary'
+    binary.write_bytes(b'\x7fELF')
+    assert get_interpreter(str(binary)) is None
+
+
+def test_prefetch_each_file_once(tmp_path, monkeypatch):
+    library = tmp_path / 'libapp.so'
+    library.write_bytes(b'\0' * 4096)
+    document = tmp_path / 'document.txt'
+    document.write_text('text')
+    executable = tmp_path / 'app'
+    executable.write_bytes(b'\x7fELF')
+    monkeypatch.setattr(prefetch, 'get_shared_libraries', lambda program, timeout: [str(library)])
+
+    prefetcher = Prefetcher(max_workers=2, ldd_timeout=1)
+    assert prefetcher.get_files([str(executable), '--new-window', str(document)]) \
+           == [str(executable), str(library), str(document)]
+    assert prefetcher.prefetch([str(executable)]).result() == 2
+    # The library has been prefetched
+    assert prefetcher.prefetch([str(executable), str(document)]).result() == 1
+    assert prefetcher.prefetch([]).result() == 0
+    assert prefetcher.prefetched_cmds == {(str(executable),), (str(executable), str(document)), ()}
+    prefetcher.shutdown(wait=True)
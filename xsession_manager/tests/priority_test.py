@@ -0,0 +1,129 @@
+from concurrent.futures import Future
+from types import SimpleNamespace
+from typing import Dict
+
+from .. import priority
+from ..utils import subprocess_utils
+from ..priority import PriorityStager
+from ..settings.xsession_config import XSessionConfigObject
+
+IOPRIO_CLASS_NONE = 0
+IOPRIO_CLASS_IDLE = 3
+
+
+class FakeProcess:
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.niceness = 0
+        self.ioclass = IOPRIO_CLASS_NONE
+
+    def nice(self, value=None):
+        if value is None:
+            return self.niceness
+        self.niceness = value
+
+    def ionice(self, ioclass=None, value=None):
+        if ioclass is None:
+            return SimpleNamespace(ioclass=self.ioclass, value=0)
+        self.ioclass = ioclass
+
+    def children(self, recursive=False):
+        return []
+
+
+class FakePsutil:
+    Error = Exception
+    IOPRIO_CLASS_NONE = IOPRIO_CLASS_NONE
+    IOPRIO_CLASS_IDLE = IOPRIO_CLASS_IDLE
+
+    def __init__(self):
+        self.processes: Dict[int, FakeProcess] = {}
+
+    def Process(self, pid=0):
+        return self.processes.setdefault(pid, FakeProcess(pid))
+
+    def priority(self, pid):
+        process = self.Process(pid)
+        return process.niceness, process.ioclass
+
+
+def create_app(app_name: str, pid: int) -> XSessionConfigObject:
+    app = XSessionConfigObject()
+    app.app_name = app_name
+    app.pid = pid
+    return app
+
+
+def test_stage_priorities(monkeypatch):
+    fake_psutil = FakePsutil()
+    monkeypatch.setattr(priority, 'psutil', fake_psutil)
+    monkeypatch.setattr(priority, 'can_lower_niceness_to', lambda niceness: True)
+    editor = create_app('editor', 1)
+    terminal = create_app('terminal', 2)
+    player = create_app('player', 3)
+    mail = create_app('mail', 4)
+    stager = PriorityStager([editor, terminal])
+
+    editor_window_placed = Future()
+    stager.launched(editor, [editor_window_placed])
+    player_window_placed = Future()
+    stager.launched(player, [player_window_placed])
+    stager.launched(mail, [Future()])
+    assert fake_psutil.priority(1) == (0, IOPRIO_CLASS_NONE)
+    assert fake_psutil.priority(3) == (10, IOPRIO_CLASS_IDLE)
+    assert fake_psutil.priority(4) == (10, IOPRIO_CLASS_IDLE)
+
+    # Return to normal priority once its windows are placed
+    player_window_placed.set_result(None)
+    assert fake_psutil.priority(3) == (0, IOPRIO_CLASS_NONE)
+
+    # The editor is placed, the terminal is not launched
+    editor_window_placed.set_result(None)
+    assert fake_psutil.priority(4) == (10, IOPRIO_CLASS_IDLE)
+    stager.done(terminal)
+    assert fake_psutil.priority(4) == (0, IOPRIO_CLASS_NONE)
+
+    # The apps of high priority are done, the others are launched at normal priority then
+    stager.launched(create_app('browser', 5), [Future()])
+    assert fake_psutil.priority(5) == (0, IOPRIO_CLASS_NONE)
+
+
+def test_lower_io_priority_only_if_niceness_can_not_be_restored(monkeypatch):
+    fake_psutil = FakePsutil()
+    monkeypatch.setattr(priority, 'psutil', fake_psutil)
+    monkeypatch.setattr(priority, 'can_lower_niceness_to', lambda niceness: False)
+    stager = PriorityStager([create_app('editor', 1)])
+
+    player_window_placed = Future()
+    stager.launched(create_app('player', 3), [player_window_placed])
+    assert fake_psutil.priority(3) == (0, IOPRIO_CLASS_IDLE)
+    player_window_placed.set_result(None)
+    assert fake_psutil.priority(3) == (0, IOPRIO_CLASS_NONE)
+
+
+def test_spawn_at_low_priority(monkeypatch):
+    fake_psutil = FakePsutil()
+    monkeypatch.setattr(priority, 'psutil', fake_psutil)
+    monkeypatch.setattr(priority, 'can_lower_niceness_to', lambda niceness: True)
+    editor = create_app('editor', 1)
+    player = create_app('player', 3)
+    stager = PriorityStager([editor])
+    assert stager.get_spawn_priority(editor) == {}
+    assert stager.get_spawn_priority(player) == {'niceness_increment': 10, 'idle_io': True}
+    monkeypatch.setattr(subprocess_utils.shutil, 'which', lambda program: '/usr/bin/%s' % program)
+    assert subprocess_utils.with_lower_priority(['/usr/bin/player'], **stager.get_spawn_priority(player)) \
+        == ['/usr/bin/nice', '-n', '10', '/usr/bin/ionice', '-c', '3', '-t', '/usr/bin/player']
+    assert subprocess_utils.with_lower_priority(['/usr/bin/editor'], **stager.get_spawn_priority(editor)) \
+        == ['/usr/bin/editor']
+
+    # As if it was spawned at low priority
+    fake_psutil.Process(3).nice(10)
+    fake_psutil.Process(3).ionice(IOPRIO_CLASS_IDLE)
+    player_window_placed = Future()
+    stager.launched(player, [player_window_placed], spawned_at_low_priority=True)
+    player_window_placed.set_result(None)
+    assert fake_psutil.priority(3) == (0, IOPRIO_CLASS_NONE)
+
+    stager.done(editor)
+    assert stager.get_spawn_priority(create_app('mail', 4)) == {}
@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+from time import sleep, time
+
+from ..utils.process_snapshot import ProcessSnapshot
+
+
+def test_refresh_incrementally():
+    process_snapshot = ProcessSnapshot.take()
+    cmd = [sys.executable, '-c', 'import time; time.sleep(30)']
+    process = subprocess.Popen(cmd)
+    try:
+        assert process.pid not in process_snapshot.cmdlines
+
+        # The command line may be read before exec(), which is read again by the next refresh
+        deadline = time() + 5
+        while True:
+            process_snapshot.refresh()
+            if process.pid in process_snapshot.find_pids_by_cmd(cmd) or time() > deadline:
+                break
+            sleep(0.05)
+        assert process_snapshot.find_pids_by_cmd(cmd) == [process.pid]
+        assert process.pid in process_snapshot.children(os.getpid())
+    finally:
+        process.kill()
+        process.wait()
+
+    process_snapshot.refresh()
+    assert process.pid not in process_snapshot.cmdlines
+    assert process_snapshot.find_pids_by_cmd(cmd) == []
+    assert process.pid not in process_snapshot.children(os.getpid())
@@ -0,0 +1,52 @@
+import json
+import pstats
+import threading
+
+from ..utils.profiling import Profiler, profile_threads
+from .fake_desktop import FakeDesktop, create_xsession_manager
+
+
+def test_profile_restore(tmp_path, capsys):
+    desktop = FakeDesktop.populate(windows=6, processes=3, startup_delay=0.02)
+    create_xsession_manager(desktop, tmp_path).save_session('test')
+    desktop.close_all()
+
+    profiler = Profiler()
+    create_xsession_manager(desktop, tmp_path, profiler=profiler).restore_session(
+        'test', restoring_interval=0, fork=False, check_memory=False, min_restoring_interval=0)
+    phases = {span.name for span in profiler.spans if span.app_name is None}
+    assert {'load session', 'list windows', 'launch apps', 'wait for windows', 'place windows'} <= phases
+    launched_apps = {span.app_name for span in profiler.spans if span.name == 'launch'}
+    assert launched_apps == {'app0', 'app1', 'app2'}
+    placed = [span for span in profiler.spans if span.name == 'windows placed']
+    assert len(placed) == 3 and all(span.duration >= 0.02 for span in placed)
+
+    capsys.readouterr()
+    profiler.print_summary()
+    summary = capsys.readouterr().out
+    assert 'launch apps' in summary and 'app2' in summary
+
+    profiler.write_chrome_trace(tmp_path / 'trace.json')
+    events = json.loads((tmp_path / 'trace.json').read_text())['traceEvents']
+    assert any(event['name'] == 'launch: app0' and event['ph'] == 'X' for event in events)
+
+
+def test_disabled_profiler_records_nothing():
+    profiler = Profiler(enabled=False)
+    with profiler.span('save'):
+        profiler.add('launch', 0, 1, 'app0')
+    assert profiler.spans == []
+
+
+def test_profile_threads(tmp_path):
+    def work_in_thread():
+        sum(range(1000))
+
+    with profile_threads(tmp_path / 'restore.prof'):
+        thread = threading.Thread(target=work_in_thread)
+        thread.start()
+        thread.join()
+    functions = {function_name for _, _, function_name in pstats.Stats(str(tmp_path / 'restore.prof')).stats}
+    assert 'work_in_thread' in functions
+    # Threads started afterwards are not profiled
+    assert threading.Thread.run.__name__ == 'run'
@@ -0,0 +1,81 @@
+import socket
+import sys
+import threading
+from time import sleep, time
+
+from ..restore_job import CANCEL, JobState, RestoreJob, request_jobs
+from ..restore_report import Outcome, load_reports
+from ..utils import subprocess_utils
+from .fake_desktop import FakeDesktop, create_xsession_manager
+
+
+def wait_until(condition, timeout=5):
+    deadline = time() + timeout
+    while not condition():
+        assert time() < deadline
+        sleep(0.01)
+
+
+def test_status_and_cancel(tmp_path):
+    cancelled = []
+    job = RestoreJob('test', lambda: {'apps_launched': 1}, lambda: cancelled.append(True), tmp_path)
+    with job:
+        statuses = request_jobs(jobs_dir=tmp_path)
+        assert len(statuses) == 1
+        assert statuses[0]['name'] == job.name
+        assert statuses[0]['state'] == JobState.LAUNCHING
+        assert statuses[0]['apps_launched'] == 1
+        assert request_jobs(name='other', jobs_dir=tmp_path) == []
+
+        statuses = request_jobs(CANCEL, 'test', jobs_dir=tmp_path)
+        assert statuses[0]['state'] == JobState.CANCELLING
+        assert job.is_cancelled()
+        assert cancelled == [True]
+    assert request_jobs(jobs_dir=tmp_path) == []
+
+
+def test_remove_sockets_left(tmp_path):
+    socket_path = tmp_path / 'test-1.sock'
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.bind(str(socket_path))
+    assert request_jobs(jobs_dir=tmp_path) == []
+    assert not socket_path.exists()
+
+
+def test_reap_children():
+    process = subprocess_utils.launch_app([sys.executable, '-c', 'pass'])
+    process.wait()
+    subprocess_utils.reap_children()
+    assert process not in subprocess_utils._launched
+
+
+def test_cancel_restore(tmp_path):
+    desktop = FakeDesktop.populate(windows=4, processes=4)
+
+    create_xsession_manager(desktop, tmp_path).save_session('test')
+    desktop.close_all()
+    xsm = create_xsession_manager(desktop, tmp_path)
+    statuses_while_placing = []
+    move_windows_while_restore = xsm._move_windows_while_restore
+
+    def read_status_and_move_windows():
+        statuses_while_placing.extend(request_jobs(jobs_dir=tmp_path / 'jobs'))
+        move_windows_while_restore()
+
+    xsm._move_windows_while_restore = read_status_and_move_windows
+    restore = threading.Thread(target=xsm.restore_session,
+                               args=('test',),
+                               kwargs=dict(restoring_interval=1, fork=False, check_memory=False,
+                                           min_restoring_interval=1, max_restoring_interval=1))
+    restore.start()
+    wait_until(lambda: len(desktop.launched) == 1)
+    statuses = request_jobs(CANCEL, jobs_dir=tmp_path / 'jobs')
+    restore.join(5)
+    assert not restore.is_alive()
+
+    assert len(statuses) == 1
+    assert [status['state'] for status in statuses_while_placing] == [JobState.CANCELLING]
+    assert len(desktop.launched) == 1
+    outcomes = [app['outcome'] for app in load_reports(tmp_path / 'reports', 'test')[0]['apps']]
+    assert outcomes.count(Outcome.CANCELLED) == 3
+    assert list((tmp_path / 'jobs').iterdir()) == []
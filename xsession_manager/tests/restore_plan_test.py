@@ -0,0 +1,44 @@
+from ..restore_plan import LaunchPlan
+from ..settings.xsession_config import XSessionConfigObject
+
+
+def create_window(xid: int, app_name: str, desktop_number: int) -> XSessionConfigObject:
+    window = XSessionConfigObject()
+    window.window_id_the_int_type = xid
+    window.app_name = app_name
+    window.desktop_number = desktop_number
+    return window
+
+
+def test_launch_the_current_workspace_first():
+    gedit = create_window(1, 'gedit', 0)
+    firefox = create_window(2, 'firefox', 2)
+    terminal = create_window(3, 'terminal', 3)
+    # An app with windows on workspaces 1 and 3
+    files = create_window(4, 'files', 3)
+    saved_windows_of_apps = {4: [files, create_window(5, 'files', 1)]}
+    launch_plan = LaunchPlan([gedit, firefox, terminal, files], saved_windows_of_apps, current_workspace=3)
+
+    assert launch_plan.take_apps(3) == [terminal, files]
+    # Workspace 1 has no app left
+    assert launch_plan.next_workspace() == 2
+    assert launch_plan.take_apps(2) == [firefox]
+    assert launch_plan.next_workspace() == 0
+    assert launch_plan.take_apps(0) == [gedit]
+    assert launch_plan.is_empty()
+    assert launch_plan.next_workspace() is None
+
+
+def test_launch_the_workspace_switched_to():
+    apps = [create_window(xid, 'app%d' % xid, xid) for xid in range(4)]
+    launch_plan = LaunchPlan(apps, {}, current_workspace=0)
+    assert launch_plan.take_apps(0) == [apps[0]]
+
+    launch_plan.request_workspace(0)
+    launch_plan.request_workspace(3)
+    # Workspace 0 has been launched
+    assert launch_plan.take_requested_workspace() == 3
+    assert launch_plan.take_requested_workspace() is None
+    assert launch_plan.take_apps(3) == [apps[3]]
+    # The nearest one to the workspace switched to
+    assert launch_plan.next_workspace() == 2
@@ -0,0 +1,42 @@
+from ..restore_report import Outcome, RestoreReport, load_reports, percentile, print_summary, summarize
+
+
+def test_percentile():
+    assert percentile([], 50) is None
+    values = [float(i) for i in range(1, 21)]
+    assert percentile(values, 50) == 10
+    assert percentile(values, 95) == 19
+    assert percentile([3.0], 95) == 3.0
+
+
+def test_keep_recent_reports(tmp_path):
+    for i in range(3):
+        report = RestoreReport('test')
+        timeline = report.add_app('app%d' % i, ['/usr/bin/app%d' % i])
+        timeline.mark('started', report.started_at)
+        timeline.mark('resolved', report.started_at + 0.1)
+        if i == 2:
+            timeline.fail(Outcome.FAILED, 'not found')
+        report.write(tmp_path, max_reports=2)
+
+    reports = load_reports(tmp_path, 'test')
+    assert [report['apps'][0]['app_name'] for report in reports] == ['app1', 'app2']
+    assert reports[1]['apps'][0]['reason'] == 'not found'
+    assert summarize(reports)['resolve'] == [0.1, 0.1]
+
+
+def test_print_summary(tmp_path, capsys):
+    print_summary(tmp_path, 'test')
+    assert 'No restore' in capsys.readouterr().out
+
+    report = RestoreReport('test')
+    timeline = report.add_app('gedit', ['/usr/bin/gedit'])
+    timeline.mark('spawned', report.started_at + 0.5)
+    timeline.mark('first window', report.started_at + 1.5)
+    timeline.outcome = Outcome.RESTORED
+    report.write(tmp_path)
+
+    print_summary(tmp_path, 'test')
+    out = capsys.readouterr().out
+    assert 'first window' in out and '1.000s' in out
+    assert 'restored 1' in out
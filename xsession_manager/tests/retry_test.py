@@ -0,0 +1,53 @@
+import pytest
+
+from ..utils.retry import NeedRetryException, RetryPolicy, retry_on_result
+
+
+def test_retry_until_succeeded():
+    results = iter([NeedRetryException(), NeedRetryException(), 'done'])
+
+    def func():
+        result = next(results)
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    attempts = []
+    retry_policy = RetryPolicy(max_attempts=5, initial_delay=0, on_attempt=attempts.append)
+    assert retry_policy.call(func) == 'done'
+    assert [attempt.number for attempt in attempts] == [1, 2, 3]
+
+
+def test_raise_the_last_exception_if_exhausted():
+    def func():
+        raise NeedRetryException()
+
+    with pytest.raises(NeedRetryException):
+        RetryPolicy(max_attempts=2, initial_delay=0).call(func)
+
+
+def test_return_the_last_result_if_exhausted():
+    retry_policy = RetryPolicy(max_attempts=3,
+                               initial_delay=0,
+                               should_retry=retry_on_result(lambda result: result is None))
+    assert retry_policy.call(lambda: None) is None
+
+
+def test_stop_at_deadline():
+    attempts = []
+    retry_policy = RetryPolicy(deadline=0.1, initial_delay=0.04, on_attempt=attempts.append)
+
+    def func():
+        raise NeedRetryException()
+
+    with pytest.raises(NeedRetryException):
+        retry_policy.call(func)
+    assert 2 <= len(attempts) <= 3
+
+
+def test_get_delay():
+    retry_policy = RetryPolicy(max_attempts=10, initial_delay=0.25, multiplier=2, max_delay=1)
+    assert [retry_policy.get_delay(n) for n in range(4)] == [0.25, 0.5, 1, 1]
+
+    retry_policy = retry_policy.with_options(jitter=0.5)
+    assert all(0.25 <= retry_policy.get_delay(0) <= 0.375 for _ in range(100))
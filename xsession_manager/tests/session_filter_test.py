@@ -0,0 +1,47 @@
+from types import SimpleNamespace as Namespace
+
+import pytest
+
+from ..session_filter import ExcludeSessionFilter, IncludeSessionFilter, SessionMatcher
+
+WINDOWS = [Namespace(window_id='0x03e00004', pid=1234, app_name='Firefox', window_title='Mozilla Firefox',
+                     cmd=['/usr/lib/firefox/firefox', '--new-window']),
+           Namespace(window_id='0x04200007', pid=2345, app_name='gedit', window_title='notes.txt - firefox tips',
+                     cmd=['/usr/bin/gedit', '--gapplication-service']),
+           Namespace(window_id='0x05000001', pid=3456, app_name='Terminal', window_title='~/src',
+                     cmd=['/usr/bin/gnome-terminal-server'])]
+
+
+def match(*patterns):
+    return [window.app_name for window in IncludeSessionFilter(list(patterns))(WINDOWS)]
+
+
+def test_match_like_before():
+    assert match('1234') == ['Firefox']
+    assert match('0x04200007') == ['gedit']
+    assert match('FIREFOX') == ['Firefox', 'gedit']
+    assert match('term', 'gedit') == ['gedit', 'Terminal']
+    assert [window.pid for window in ExcludeSessionFilter(['firefox'])(WINDOWS)] == [3456]
+
+
+def test_match_fields_globs_and_regexes():
+    assert match('app:firefox') == ['Firefox']
+    assert match('title:*.txt*') == ['gedit']
+    assert match('cmd:--gapplication-service') == ['gedit']
+    assert match('fire*') == ['Firefox']
+    assert match('/^(gedit|terminal)$/') == ['gedit', 'Terminal']
+    assert match('cmd:/gnome-terminal/') == ['Terminal']
+    assert match('app:1234') == []
+
+
+def test_invalid_regex():
+    with pytest.raises(ValueError):
+        SessionMatcher(['/(/'])
+    with pytest.raises(ValueError):
+        SessionMatcher(['/(?i)firefox/'])
+    with pytest.raises(ValueError):
+        SessionMatcher(['/(?P<name>a)/', '/(?P<name>b)/'])
+
+
+def test_match_ascii_digits_as_pids():
+    assert SessionMatcher(['\u0661\u0662']).pids == set()
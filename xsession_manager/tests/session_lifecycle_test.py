@@ -0,0 +1,103 @@
+from time import sleep
+
+from ..restore_report import Outcome, load_reports, summarize
+from .fake_desktop import FakeDesktop, create_xsession_manager
+
+
+def get_layout(desktop: FakeDesktop):
+    return sorted((w.title, w.desktop_number, w.geometry) for w in desktop.windows.values())
+
+
+def test_save_close_and_restore(tmp_path):
+    desktop = FakeDesktop.populate(windows=10, processes=4, startup_delay=0.05, move_delay=0.01)
+    layout = get_layout(desktop)
+    create_xsession_manager(desktop, tmp_path).save_session('test')
+
+    windows_still_open = create_xsession_manager(desktop, tmp_path).close_windows(
+        including_apps_with_multiple_windows=True, timeout=1)
+    assert windows_still_open == []
+    assert desktop.windows == {}
+    assert desktop.processes == {}
+
+    xsm = create_xsession_manager(desktop, tmp_path)
+    xsm.restore_session('test', restoring_interval=0, fork=False, check_memory=False, min_restoring_interval=0)
+    assert len(desktop.launched) == 4
+    assert get_layout(desktop) == layout
+    assert xsm.windows_can_not_be_moved == []
+
+    reports = load_reports(tmp_path / 'reports', 'test')
+    assert len(reports) == 1
+    apps = reports[0]['apps']
+    assert len(apps) == 4
+    assert all(app['outcome'] == Outcome.RESTORED for app in apps)
+    assert all(app['pid'] in desktop.processes for app in apps)
+    events = apps[0]['events']
+    assert events['started'] <= events['resolved'] <= events['spawned'] <= events['first window'] \
+        <= events['state applied']
+    assert len(summarize(reports)['first window']) == 4
+
+
+def test_move_windows_back(tmp_path):
+    desktop = FakeDesktop.populate(windows=10, processes=4)
+    layout = get_layout(desktop)
+    create_xsession_manager(desktop, tmp_path).save_session('test')
+
+    desktop.scatter()
+    assert get_layout(desktop) != layout
+    create_xsession_manager(desktop, tmp_path).move_window('test')
+    assert get_layout(desktop) == layout
+
+
+def test_restore_with_every_launch_failed(tmp_path):
+    def launch_app(cmd):
+        raise PermissionError(cmd[0])
+
+    desktop = FakeDesktop.populate(windows=4, processes=2)
+    create_xsession_manager(desktop, tmp_path).save_session('test')
+    desktop.close_all()
+    desktop.launch_app = launch_app
+
+    xsm = create_xsession_manager(desktop, tmp_path)
+    xsm.restore_session('test', restoring_interval=0, fork=False, check_memory=False, min_restoring_interval=0)
+    assert desktop.windows == {}
+    outcomes = [app['outcome'] for app in load_reports(tmp_path / 'reports', 'test')[0]['apps']]
+    assert outcomes == [Outcome.FAILED, Outcome.FAILED]
+
+
+def test_resolve_until_the_launch_which_succeeded(tmp_path):
+    def activate_app(cmd, get_dbus_app_id):
+        # As if D-Bus activation failed after a while, the app is spawned then
+        sleep(0.2)
+        return None
+
+    desktop = FakeDesktop.populate(windows=1, processes=1)
+    create_xsession_manager(desktop, tmp_path).save_session('test')
+    desktop.close_all()
+    desktop.activate_app = activate_app
+
+    create_xsession_manager(desktop, tmp_path).restore_session('test', restoring_interval=0, fork=False,
+                                                               check_memory=False, min_restoring_interval=0)
+    events = load_reports(tmp_path / 'reports', 'test')[0]['apps'][0]['events']
+    assert events['resolved'] - events['started'] >= 0.2
+    assert events['spawned'] - events['resolved'] < 0.2
+
+
+def test_spawn_apps_saved_as_many_instances(tmp_path):
+    activated = []
+
+    def activate_app(cmd, get_dbus_app_id):
+        activated.append(cmd[0])
+        return None
+
+    desktop = FakeDesktop()
+    desktop.add_app('editor', [0])
+    desktop.add_app('editor', [1])
+    desktop.add_app('viewer', [0])
+    create_xsession_manager(desktop, tmp_path).save_session('test')
+    desktop.close_all()
+    desktop.activate_app = activate_app
+
+    create_xsession_manager(desktop, tmp_path).restore_session('test', restoring_interval=0, fork=False,
+                                                               check_memory=False, min_restoring_interval=0)
+    assert activated == ['/usr/bin/viewer']
+    assert len(desktop.launched) == 3
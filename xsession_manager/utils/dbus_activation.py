@@ -0,0 +1,53 @@
+"""
+Launch apps by D-Bus activation, see https://specifications.freedesktop.org/desktop-entry-spec/latest/dbus.html
+"""
+import logging
+from typing import List
+
+from gi.repository import Gio, GLib
+
+from ..settings.constants import DBusActivation
+from .metrics import count_calls
+
+logger = logging.getLogger(__name__)
+
+APPLICATION_INTERFACE = 'org.freedesktop.Application'
+
+
+def get_object_path(app_id: str) -> str:
+    """
+    :return: the object path of an app, such as /org/gnome/gedit for org.gnome.gedit
+    """
+    return '/' + app_id.replace('.', '/').replace('-', '_')
+
+
+def activate(app_id: str, uris: List[str]=None, connection: Gio.DBusConnection=None) -> int:
+    """
+    Ask an app to show a window, or to open the URIs if any. The bus starts the app unless it is running.
+
+    :param app_id: the well-known name of the app on the bus, which is the name of its .desktop file
+                   without .desktop
+    :param connection: the session bus by default
+    :return: the pid of the app, or None if the activation failed
+    """
+    # No startup notification, the windows are found by the pid
+    platform_data = {}
+    try:
+        if connection is None:
+            connection = Gio.bus_get_sync(Gio.BusType.SESSION, None)
+        if uris:
+            method, parameters = 'Open', GLib.Variant('(asa{sv})', (uris, platform_data))
+        else:
+            method, parameters = 'Activate', GLib.Variant('(a{sv})', (platform_data,))
+        count_calls('dbus')
+        connection.call_sync(app_id, get_object_path(app_id), APPLICATION_INTERFACE, method, parameters,
+                             None, Gio.DBusCallFlags.NONE, DBusActivation.TIMEOUT, None)
+        count_calls('dbus')
+        reply = connection.call_sync('org.freedesktop.DBus', '/org/freedesktop/DBus', 'org.freedesktop.DBus',
+                                     'GetConnectionUnixProcessID', GLib.Variant('(s)', (app_id,)),
+                                     GLib.VariantType.new('(u)'), Gio.DBusCallFlags.NONE, DBusActivation.TIMEOUT,
+                                     None)
+    except GLib.Error as e:
+        logger.debug('Failed to activate %s via D-Bus: %s', app_id, e.message)
+        return None
+    return reply.unpack()[0]
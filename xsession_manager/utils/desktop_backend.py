@@ -0,0 +1,172 @@
+import os
+from pathlib import Path
+from typing import Callable, ContextManager, Dict, Iterable, List, Set, Tuple
+
+from ..settings.constants import DBusActivation
+from . import subprocess_utils, wmctl_wrapper
+from .base import Base
+from .lazy_import import lazy_import
+from .metrics import count_calls
+from .process_snapshot import ProcessSnapshot
+
+psutil = lazy_import('psutil')
+dbus_activation = lazy_import('.dbus_activation', __package__)
+wnck_utils = lazy_import('.wnck_utils', __package__)
+
+
+class ProcessDetails(Base):
+    """
+    The details of a process saved along with its windows.
+    """
+
+    username: str
+    cmdline: List[str]
+    # In seconds since the epoch
+    create_time: float
+    cpu_percent: float
+    memory_percent: float
+
+    def __init__(self, username: str, cmdline: List[str], create_time: float, cpu_percent: float,
+                 memory_percent: float):
+        self.username = username
+        self.cmdline = cmdline
+        self.create_time = create_time
+        self.cpu_percent = cpu_percent
+        self.memory_percent = memory_percent
+
+
+class DesktopBackend:
+    """
+    The desktop which XSessionManager saves, restores, moves and closes windows on: the windows via wmctrl and Wnck,
+    the processes via psutil, and launching apps.
+
+    This one works with the real X desktop. Tests and benchmarks replace it with an in-memory desktop,
+    see tests/fake_desktop.py. The methods have the same meaning as the functions they call.
+    """
+
+    # Windows
+
+    def get_running_windows(self) -> list:
+        """
+        :return: the windows in the format of `wmctrl -lpG`, one list of fields per window
+        """
+        return wmctl_wrapper.get_running_windows()
+
+    def refresh_screen(self):
+        wnck_utils.refresh_screen()
+
+    def get_app_name(self, xid: int, refresh: bool=True) -> str:
+        return wnck_utils.get_app_name(xid, refresh)
+
+    def is_above(self, xid: int) -> bool:
+        return wnck_utils.is_above(xid)
+
+    def is_sticky(self, xid: int, refresh: bool=True) -> bool:
+        return wnck_utils.is_sticky(xid, refresh)
+
+    def make_above(self, xid: int, refresh: bool=True):
+        wnck_utils.make_above(xid, refresh=refresh)
+
+    def stick(self, xid: int, refresh: bool=True):
+        wnck_utils.stick(xid, refresh=refresh)
+
+    def get_geometry(self, xid: int, refresh: bool=True) -> Tuple[int, int, int, int]:
+        return wnck_utils.get_geometry(xid, refresh)
+
+    def get_geometries(self, xids: Iterable[int]) -> Dict[int, Tuple[int, int, int, int]]:
+        return wnck_utils.get_geometries(xids)
+
+    def set_geometries(self, geometries: Dict[int, Tuple[int, int, int, int]]):
+        wnck_utils.set_geometries(geometries)
+
+    def move_windows_to(self, moves: List[Tuple[int, int]]):
+        wnck_utils.move_windows_to(moves)
+
+    def are_in_workspaces(self, moves: List[Tuple[int, int]]) -> bool:
+        return wnck_utils.are_in_workspaces(moves)
+
+    def get_existing_window_ids(self, xids: Iterable[int], refresh: bool=True) -> Set[int]:
+        return wnck_utils.get_existing_window_ids(xids, refresh)
+
+    def close_window_gracefully_async(self, xid: int, refresh: bool=True):
+        wnck_utils.close_window_gracefully_async(xid, refresh)
+
+    def connect_window_closed(self, callback: Callable[[int], None]) -> int:
+        return wnck_utils.connect_window_closed(callback)
+
+    def connect_active_workspace_changed(self, callback: Callable[[int], None]) -> int:
+        return wnck_utils.connect_active_workspace_changed(callback)
+
+    def disconnect(self, handler_id: int):
+        wnck_utils.disconnect(handler_id)
+
+    def get_active_workspace_number(self, refresh: bool=True) -> int:
+        return wnck_utils.get_active_workspace_number(refresh)
+
+    def create_enough_workspaces(self, max_desktop_number: int) -> ContextManager:
+        return wnck_utils.create_enough_workspaces(max_desktop_number)
+
+    # Processes
+
+    def take_process_snapshot(self) -> ProcessSnapshot:
+        return ProcessSnapshot.take()
+
+    def get_process_details(self, pid: int) -> ProcessDetails:
+        """
+        :return: None if the process does not exist
+        """
+        count_calls('psutil')
+        try:
+            process = psutil.Process(pid)
+            with process.oneshot():
+                return ProcessDetails(process.username(),
+                                      process.cmdline(),
+                                      process.create_time(),
+                                      process.cpu_percent(),
+                                      process.memory_percent())
+        except psutil.NoSuchProcess:
+            return None
+
+    def get_total_memory(self) -> int:
+        count_calls('psutil')
+        return psutil.virtual_memory().total
+
+    def get_cpu_percent(self) -> float:
+        """
+        :return: the CPU usage since the last call, see psutil.cpu_percent()
+        """
+        count_calls('psutil')
+        return psutil.cpu_percent()
+
+    def launch_app(self, cmd: List[str], niceness_increment: int=0, idle_io: bool=False):
+        """
+        :return: the process launched, whose pid is its pid
+        :raise FileNotFoundError: if the executable is not found
+        """
+        return subprocess_utils.launch_app(cmd, niceness_increment, idle_io)
+
+    def activate_app(self, cmd: List[str], get_dbus_app_id: Callable[[str], str]) -> int:
+        """
+        Launch an app by D-Bus activation if its .desktop file says it is D-Bus activatable. If it is running
+        already, no process is started, otherwise it is started by the bus, which is quicker than spawning it.
+
+        An app is only activated if its command line has nothing else but files to open, which are passed on as URIs.
+
+        :param get_dbus_app_id: return the id on the bus of an executable if its .desktop file says it is
+                                D-Bus activatable, otherwise None, see gio_utils.GDesktopAppInfo.get_dbus_app_id()
+        :return: the pid of the app, or None if it is not D-Bus activatable or the activation failed,
+                 spawn it by launch_app() then
+        """
+        args = [arg for arg in cmd[1:] if arg not in DBusActivation.IGNORED_OPTIONS]
+        if any(not (os.path.isabs(arg) and os.path.exists(arg)) for arg in args):
+            return None
+        app_id = get_dbus_app_id(cmd[0])
+        if app_id is None:
+            return None
+        return dbus_activation.activate(app_id, [Path(arg).as_uri() for arg in args])
+
+    def reap_children(self) -> int:
+        """
+        :return: the number of apps launched which are still running, see subprocess_utils.reap_children()
+        """
+        return subprocess_utils.reap_children()
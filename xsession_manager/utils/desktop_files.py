@@ -0,0 +1,73 @@
+"""
+Read .desktop files without GLib, see https://specifications.freedesktop.org/desktop-entry-spec/latest/
+"""
+import configparser
+import logging
+import os
+import shlex
+from pathlib import Path
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+DESKTOP_ENTRY = 'Desktop Entry'
+
+
+def get_applications_dirs() -> List[Path]:
+    """
+    :return: the directories of .desktop files, the ones earlier take precedence
+    """
+    data_home = os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+    data_dirs = os.environ.get('XDG_DATA_DIRS') or '/usr/local/share/:/usr/share/'
+    return [Path(data_dir, 'applications') for data_dir in [data_home] + data_dirs.split(':') if data_dir]
+
+
+def read_desktop_entry(path: Path) -> Dict[str, str]:
+    """
+    :return: the keys of the Desktop Entry group, or None if the file can not be parsed
+    """
+    parser = configparser.ConfigParser(interpolation=None, strict=False)
+    # The keys are case-sensitive
+    parser.optionxform = str
+    try:
+        parser.read(path, encoding='utf-8')
+    except (configparser.Error, OSError, UnicodeDecodeError) as e:
+        logger.debug('Failed to parse %s: %s', path, e)
+        return None
+    if not parser.has_section(DESKTOP_ENTRY):
+        return None
+    return dict(parser.items(DESKTOP_ENTRY))
+
+
+def get_dbus_app_ids(applications_dirs: List[Path]=None) -> Dict[str, str]:
+    """
+    Find the D-Bus activatable apps like GDesktopAppInfo does, without loading GLib.
+
+    :param applications_dirs: get_applications_dirs() by default
+    :return: the executable names of the D-Bus activatable apps -> their ids on the bus, see
+             gio_utils.GDesktopAppInfo.get_dbus_app_id()
+    """
+    if applications_dirs is None:
+        applications_dirs = get_applications_dirs()
+    desktop_ids = set()
+    dbus_app_ids = {}
+    for applications_dir in applications_dirs:
+        for path in sorted(Path(applications_dir).glob('**/*.desktop')):
+            # applications/kde4/foo.desktop is kde4-foo.desktop
+            desktop_id = str(path.relative_to(applications_dir)).replace(os.path.sep, '-')
+            if desktop_id in desktop_ids:
+                # Overridden by a directory earlier
+                continue
+            desktop_ids.add(desktop_id)
+            entry = read_desktop_entry(path)
+            if entry is None or entry.get('DBusActivatable') != 'true':
+                continue
+            if entry.get('Hidden') == 'true' or entry.get('NoDisplay') == 'true':
+                continue
+            try:
+                args = shlex.split(entry.get('Exec', ''))
+            except ValueError:
+                continue
+            if len(args) > 0:
+                dbus_app_ids.setdefault(os.path.basename(args[0]), desktop_id[:-len('.desktop')])
+    return dbus_app_ids
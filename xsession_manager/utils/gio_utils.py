@@ -1,3 +1,5 @@
+import logging
+import os
 from typing import List, Dict
 import re
 
@@ -5,6 +7,7 @@ import gi
 from gi.overrides.Gio import Settings
 from gi.repository.Gio import DesktopAppInfo
 from gi.repository.Gio import AppLaunchContext
+from gi.repository.Gio import AppInfoMonitor
 gi.require_version('Gdk', '3.0')
 from gi.repository import Gdk
 
@@ -12,6 +15,8 @@ from ..settings import constants
 from . import suppress_output
 from .exceptions import MoreThanOneResultFound
 
+logger = logging.getLogger(__name__)
+
 
 class _DesktopAppInfoObject:
 
@@ -57,11 +62,32 @@ class GDesktopAppInfo:
     def __init__(self):
         # Cache all .desktop files info in this OS
         self._all_desktop_apps_info_cache: List[DesktopAppInfo] = []
+        # The executable names of the D-Bus activatable apps -> their ids on the bus
+        self._dbus_app_ids: Dict[str, str] = {}
         self._cache_appinfo()
 
     def _cache_appinfo(self):
         desktop_apps: List[DesktopAppInfo] = DesktopAppInfo().get_all()
         self._all_desktop_apps_info_cache = [da for da in desktop_apps if da.should_show()]
+        dbus_app_ids = {}
+        for da in self._all_desktop_apps_info_cache:
+            if da.get_boolean('DBusActivatable') and da.get_executable():
+                dbus_app_ids.setdefault(os.path.basename(da.get_executable()), re.sub(r'\.desktop$', '', da.get_id()))
+        self._dbus_app_ids = dbus_app_ids
+
+    def get_dbus_app_id(self, executable: str) -> str:
+        """
+        :param executable: the executable of an app, such as /usr/bin/gedit
+        :return: the id on the bus of the app if its .desktop file says it is D-Bus activatable, such as
+                 org.gnome.gedit, otherwise None
+        """
+        return self._dbus_app_ids.get(os.path.basename(executable))
+
+    def refresh(self):
+        """
+        Rescan .desktop files, call it once they are changed, see connect_app_info_changed().
+        """
+        self._cache_appinfo()
 
     def launch_app_via_desktop_file(self, desktop_file_path, launched_callback) -> bool:
         app_launch_context = self._get_app_launch_context(launched_callback)
@@ -94,7 +120,7 @@ class GDesktopAppInfo:
         if len(desktop_apps) == 1:
             desktop_app_info = DesktopAppInfo().new(desktop_apps[0].app_id)
             if desktop_app_info is None:
-                print('No valid result found according to %s' % app_name)
+                logger.warning('No valid result found according to %s', app_name)
                 return False
             
             app_launch_context = self._get_app_launch_context(launched_callback)
@@ -103,7 +129,7 @@ class GDesktopAppInfo:
                 launched = desktop_app_info.launch(None, app_launch_context)
                 return launched
         elif len(desktop_apps) == 0:
-            print('No result found according to %s' % app_name)
+            logger.info('No result found according to %s', app_name)
             return False
         else:
             commandlines = []
@@ -117,7 +143,7 @@ class GDesktopAppInfo:
             if len(set(commandlines)) == 1:
                 desktop_app_info: DesktopAppInfo = DesktopAppInfo().new(desktop_apps[0].app_id)
                 if desktop_app_info is None:
-                    print('No valid result found according to %s' % app_name)
+                    logger.warning('No valid result found according to %s', app_name)
                     return False
 
                 so = suppress_output.SuppressOutput(True, True)
@@ -146,3 +172,20 @@ class GDesktopAppInfo:
 
         return results
 
+
+_app_info_monitor: AppInfoMonitor = None
+
+
+def connect_app_info_changed(callback) -> int:
+    """
+    Call callback without arguments once .desktop files are installed, removed or modified.
+
+    Note that the signal is only emitted while a GLib main loop is running.
+
+    :return: the handler id
+    """
+    global _app_info_monitor
+    # Keep a reference, the monitor stops emitting signals once it is finalized
+    if _app_info_monitor is None:
+        _app_info_monitor = AppInfoMonitor.get()
+    return _app_info_monitor.connect('changed', lambda monitor: callback())
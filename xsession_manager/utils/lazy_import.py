@@ -0,0 +1,36 @@
+import importlib
+import importlib.util
+import types
+
+
+class _LazyModule(types.ModuleType):
+    """
+    A placeholder of a module, which imports the module on first attribute access.
+    """
+
+    def _load(self) -> types.ModuleType:
+        module = self.__dict__.get('_lazy_loaded_module')
+        if module is None:
+            module = importlib.import_module(self.__name__)
+            self.__dict__['_lazy_loaded_module'] = module
+        return module
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        # Such as replacing a function in tests
+        setattr(self._load(), name, value)
+
+
+def lazy_import(name: str, package: str = None) -> types.ModuleType:
+    """
+    Import a module lazily, which speeds up the startup if the module is heavy but not always used,
+    such as gi and psutil.
+
+    The module is imported on first attribute access, so an ImportError is raised then instead of now.
+
+    :param name: the module name, can be relative like '.wnck_utils' if package is provided
+    :param package: the package to resolve a relative name, usually __package__
+    """
+    return _LazyModule(importlib.util.resolve_name(name, package))
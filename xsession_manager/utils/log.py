@@ -0,0 +1,129 @@
+"""
+Logging of xsession_manager, see configure().
+
+Modules log by `logger = logging.getLogger(__name__)`. What is logged at INFO is what used to be printed, DEBUG is
+printed by -v/--verbose, and TRACE by -vv, which could contain sensitive info. Payloads which are expensive to format,
+like a whole session, are wrapped by LazyJson, so that they are only serialized if their level is enabled.
+
+The output of commands, such as listing sessions, is printed rather than logged.
+"""
+import json
+import logging
+import sys
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator
+
+ROOT_LOGGER_NAME = 'xsession_manager'
+
+TRACE = 5
+logging.addLevelName(TRACE, 'TRACE')
+
+_logger = logging.getLogger(ROOT_LOGGER_NAME)
+_console_handler: logging.Handler = None
+_file_handler: logging.Handler = None
+_lock = threading.Lock()
+
+
+class LazyJson:
+    """
+    Serialize an object to JSON only once it is formatted into a log record.
+    """
+
+    def __init__(self, obj: Any):
+        self.obj = obj
+
+    def __str__(self) -> str:
+        return json.dumps(self.obj, default=lambda o: o.__dict__)
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """
+    Write to the current sys.stdout, which the daemon redirects to the client while running a command.
+    """
+
+    def __init__(self):
+        super().__init__(sys.stdout)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, _):
+        pass
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    Format a record as one JSON object per line, for analyzing a log after the fact.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {'time': record.created,
+                 'level': record.levelname,
+                 'logger': record.name,
+                 'thread': record.threadName,
+                 'message': record.getMessage()}
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+def _get_console_level(verbose: bool, vv: bool) -> int:
+    if vv:
+        return TRACE
+    if verbose:
+        return logging.DEBUG
+    return logging.INFO
+
+
+def _update_logger_level():
+    levels = [handler.level for handler in (_console_handler, _file_handler) if handler is not None]
+    _logger.setLevel(min(levels) if levels else logging.INFO)
+
+
+def configure(verbose: bool=False, vv: bool=False, log_file: Path=None):
+    """
+    Log to stdout at the level of the verbosity, and to log_file as JSON lines at DEBUG, or TRACE if vv,
+    regardless of verbose.
+    """
+    global _console_handler, _file_handler
+    with _lock:
+        if _console_handler is None:
+            _console_handler = _StdoutHandler()
+            _console_handler.setFormatter(logging.Formatter('%(message)s'))
+            _logger.addHandler(_console_handler)
+            # Do not go to the handlers of the root logger of the apps embedding this package
+            _logger.propagate = False
+        _console_handler.setLevel(_get_console_level(verbose, vv))
+
+        if log_file is not None:
+            if _file_handler is not None:
+                _logger.removeHandler(_file_handler)
+                _file_handler.close()
+            _file_handler = logging.FileHandler(str(log_file), encoding='utf-8')
+            _file_handler.setFormatter(JsonLinesFormatter())
+            _file_handler.setLevel(TRACE if vv else logging.DEBUG)
+            _logger.addHandler(_file_handler)
+        _update_logger_level()
+
+
+@contextmanager
+def verbosity(verbose: bool, vv: bool) -> Iterator[None]:
+    """
+    Log to stdout at the level of the verbosity meanwhile, such as while the daemon runs a command of a client.
+    """
+    if _console_handler is None:
+        configure()
+    with _lock:
+        previous_level = _console_handler.level
+        _console_handler.setLevel(_get_console_level(verbose, vv))
+        _update_logger_level()
+    try:
+        yield
+    finally:
+        with _lock:
+            _console_handler.setLevel(previous_level)
+            _update_logger_level()
@@ -0,0 +1,18 @@
+import signal
+
+from gi.repository import GLib
+
+
+def run_main_loop():
+    """
+    Run the GLib main loop until SIGINT or SIGTERM is received.
+    """
+    main_loop = GLib.MainLoop()
+
+    def on_signal() -> bool:
+        main_loop.quit()
+        return False
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        GLib.unix_signal_add(GLib.PRIORITY_HIGH, signum, on_signal)
+    main_loop.run()
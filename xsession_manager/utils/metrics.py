@@ -0,0 +1,231 @@
+"""
+Metrics in the Prometheus text format, written to a file for the textfile collector of node_exporter.
+
+Each run of xsm is a short-lived process, so the counters and histograms of a run are added to the ones already in
+the file when it is written, which makes them cumulative across runs like the ones of a long-running process.
+"""
+import fcntl
+import math
+import os
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+COUNTER = 'counter'
+GAUGE = 'gauge'
+HISTOGRAM = 'histogram'
+
+_DURATION_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+_LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+
+# name -> (type, help, buckets of a histogram)
+METRICS = {
+    'xsm_operations_total': (COUNTER, 'The operations run, by operation.', None),
+    'xsm_operation_failures_total': (COUNTER, 'The operations failed with an error, by operation.', None),
+    'xsm_operation_duration_seconds': (HISTOGRAM, 'How long the operations took, by operation.', _DURATION_BUCKETS),
+    'xsm_last_operation_timestamp_seconds': (GAUGE, 'When the operations were run last time, by operation.', None),
+    'xsm_windows_saved_total': (COUNTER, 'The windows saved.', None),
+    'xsm_restored_apps_total': (COUNTER, 'The apps in the sessions restored, by outcome. Apps restored or '
+                                         'incomplete were launched, apps already running or rejected due to memory '
+                                         'were skipped.', None),
+    'xsm_window_placement_seconds': (HISTOGRAM, 'How long the apps launched took to get all of their windows '
+                                                'placed since they were launched.', _LATENCY_BUCKETS),
+    'xsm_windows_closed_total': (COUNTER, 'The windows closed.', None),
+    'xsm_windows_still_open_total': (COUNTER, 'The windows still open after closing them timed out.', None),
+    'xsm_external_calls_total': (COUNTER, 'The calls to external tools and libraries, by tool.', None),
+}
+
+# Labels are kept sorted, so that a metric is identified by its name and its labels
+_Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+_SAMPLE_LINE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)$')
+_LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+_call_counts = Counter()
+_call_counts_lock = threading.Lock()
+
+
+def count_calls(tool: str, count: int = 1):
+    """
+    Count the calls to an external tool or library, such as wmctrl or psutil, in this process.
+    """
+    with _call_counts_lock:
+        _call_counts[tool] += count
+
+
+def get_call_counts() -> Dict[str, int]:
+    with _call_counts_lock:
+        return dict(_call_counts)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _unescape(value: str) -> str:
+    return re.sub(r'\\(.)', lambda m: '\n' if m.group(1) == 'n' else m.group(1), value)
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if len(labels) == 0:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (name, _escape(value)) for name, value in labels)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Histogram:
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # Cumulative counts of the buckets, the last one is +Inf
+        self.counts: List[float] = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets + (math.inf,)):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+
+    def merge(self, other: 'Histogram'):
+        self.counts = [count + other_count for count, other_count in zip(self.counts, other.counts)]
+        self.sum += other.sum
+
+
+class Metrics:
+    """
+    The metrics recorded by an operation, see METRICS for the ones known.
+    """
+
+    def __init__(self):
+        self._values: Dict[_Key, float] = {}
+        self._histograms: Dict[_Key, Histogram] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, str]) -> _Key:
+        if name not in METRICS:
+            raise ValueError('Unknown metric: %s' % name)
+        return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._values[key] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(METRICS[name][2])
+            histogram.observe(value)
+
+    def get(self, name: str, **labels) -> float:
+        return self._values.get(self._key(name, labels), 0)
+
+    def merge(self, other: 'Metrics'):
+        """
+        Add the counters and histograms of the other metrics to these, and take its gauges.
+        """
+        with self._lock:
+            for key, value in other._values.items():
+                if METRICS[key[0]][0] == COUNTER:
+                    self._values[key] = self._values.get(key, 0) + value
+                else:
+                    self._values[key] = value
+            for key, other_histogram in other._histograms.items():
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = Histogram(other_histogram.buckets)
+                histogram.merge(other_histogram)
+
+    def format(self) -> str:
+        lines = []
+        with self._lock:
+            for name, (metric_type, help_text, buckets) in METRICS.items():
+                values = sorted((key, value) for key, value in self._values.items() if key[0] == name)
+                histograms = sorted((key, histogram) for key, histogram in self._histograms.items()
+                                    if key[0] == name)
+                if len(values) == 0 and len(histograms) == 0:
+                    continue
+                lines.append('# HELP %s %s' % (name, help_text))
+                lines.append('# TYPE %s %s' % (name, metric_type))
+                for (_, labels), value in values:
+                    lines.append('%s%s %s' % (name, _format_labels(labels), _format_value(value)))
+                for (_, labels), histogram in histograms:
+                    for bound, count in zip(histogram.buckets + (math.inf,), histogram.counts):
+                        lines.append('%s_bucket%s %s' % (name, _format_labels(labels + (('le', _format_value(bound)),)),
+                                                         _format_value(count)))
+                    lines.append('%s_sum%s %s' % (name, _format_labels(labels), _format_value(histogram.sum)))
+                    lines.append('%s_count%s %s' % (name, _format_labels(labels), _format_value(histogram.counts[-1])))
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def parse(text: str) -> 'Metrics':
+        """
+        Parse the metrics written by format(), the unknown ones are dropped.
+        """
+        metrics = Metrics()
+        for line in text.splitlines():
+            match = _SAMPLE_LINE.match(line.strip())
+            if match is None:
+                continue
+            name, labels_text, value = match.groups()
+            labels = dict((label, _unescape(label_value)) for label, label_value in _LABEL.findall(labels_text or ''))
+            value = float(value)
+            if name in METRICS and METRICS[name][0] != HISTOGRAM:
+                metrics._values[metrics._key(name, labels)] = value
+                continue
+            base_name, _, suffix = name.rpartition('_')
+            if base_name not in METRICS or METRICS[base_name][0] != HISTOGRAM:
+                continue
+            le = labels.pop('le', None)
+            key = metrics._key(base_name, labels)
+            histogram = metrics._histograms.get(key)
+            if histogram is None:
+                histogram = metrics._histograms[key] = Histogram(METRICS[base_name][2])
+            if suffix == 'bucket' and le is not None:
+                bound = float(le)
+                bounds = histogram.buckets + (math.inf,)
+                if bound in bounds:
+                    histogram.counts[bounds.index(bound)] = value
+            elif suffix == 'sum':
+                histogram.sum = value
+        return metrics
+
+    def write_textfile(self, path: Path):
+        """
+        Add these metrics to the ones in the file, and replace the file atomically, so that node_exporter never
+        reads a partial file. Concurrent writers are serialized by a lock file.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path.with_name(path.name + '.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            metrics = Metrics()
+            try:
+                with open(path, 'r') as file:
+                    metrics = Metrics.parse(file.read())
+            except FileNotFoundError:
+                pass
+            metrics.merge(self)
+            # node_exporter only reads files ending with .prom, the temporary file is ignored
+            tmp_path = path.with_name('.%s.%d.tmp' % (path.name, os.getpid()))
+            with open(tmp_path, 'w') as file:
+                file.write(metrics.format())
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, path)
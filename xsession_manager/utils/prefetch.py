@@ -0,0 +1,173 @@
+import logging
+import os
+import re
+import shutil
+import subprocess
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# libc.so.6 => /lib/x86_64-linux-gnu/libc.so.6 (0x00007f...)
+# /lib64/ld-linux-x86-64.so.2 (0x00007f...)
+_LDD_LINE = re.compile(r'^\s*(?:\S+\s+=>\s+)?(/\S+)\s+\(0x[0-9a-f]+\)$')
+
+
+def resolve_executable(program: str) -> str:
+    """
+    :return: the real path of the program, or None if it is not found
+    """
+    path = program if os.path.sep in program else shutil.which(program)
+    if path is None or not os.path.isfile(path):
+        return None
+    return os.path.realpath(path)
+
+
+def get_interpreter(path: str) -> str:
+    """
+    :return: the interpreter in the shebang line of a script, or None
+    """
+    try:
+        with open(path, 'rb') as f:
+            first_line = f.readline(256)
+    except OSError:
+        return None
+    if not first_line.startswith(b'#!'):
+        return None
+    fields = first_line[2:].decode(errors='ignore').split()
+    if len(fields) == 0:
+        return None
+    # #!/usr/bin/env python3
+    if os.path.basename(fields[0]) == 'env' and len(fields) > 1:
+        return resolve_executable(fields[1])
+    return resolve_executable(fields[0])
+
+
+def get_shared_libraries(executable: str, timeout: float) -> List[str]:
+    """
+    :return: the paths of the shared libraries resolved by ldd, empty if it is not a dynamic executable
+    """
+    try:
+        output = subprocess.run(['ldd', executable],
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL,
+                                timeout=timeout,
+                                universal_newlines=True).stdout
+    except (OSError, subprocess.SubprocessError):
+        return []
+    libraries = []
+    for line in output.splitlines():
+        match = _LDD_LINE.match(line)
+        if match:
+            libraries.append(match.group(1))
+    return libraries
+
+
+def readahead(path: str) -> bool:
+    """
+    Ask the kernel to read a file into the page cache in the background.
+
+    :return: False if the file can not be opened
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return False
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    except (OSError, AttributeError):
+        # posix_fadvise is not available on all platforms
+        pass
+    finally:
+        os.close(fd)
+    return True
+
+
+def evict(path: str) -> bool:
+    """
+    Drop the pages of a file from the page cache, which are not mapped or dirty, to simulate a cold start.
+
+    :return: False if the file can not be opened
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return False
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    except (OSError, AttributeError):
+        pass
+    finally:
+        os.close(fd)
+    return True
+
+
+class Prefetcher:
+    """
+    Read the executables of apps, their shared libraries and the files in their command lines into the page cache
+    from a thread pool, so that the apps load faster once they are launched.
+
+    Each file is read ahead once.
+    """
+
+    def __init__(self, max_workers: int, ldd_timeout: float):
+        self.ldd_timeout = ldd_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='prefetch')
+        self._prefetched_paths: Set[str] = set()
+        # executable -> shared libraries
+        self._libraries: Dict[str, List[str]] = {}
+        # The command lines whose files have all been prefetched
+        self.prefetched_cmds: Set[Tuple[str, ...]] = set()
+        self._lock = threading.Lock()
+
+    def get_files(self, cmd: List[str]) -> List[str]:
+        """
+        :return: the files an app needs to start up: its executable, interpreter, shared libraries
+                 and the existing files in its command line
+        """
+        if not cmd:
+            return []
+        executable = resolve_executable(cmd[0])
+        if executable is None:
+            return []
+        files = [executable]
+        interpreter = get_interpreter(executable)
+        if interpreter:
+            files.append(interpreter)
+        for program in files[:]:
+            with self._lock:
+                libraries = self._libraries.get(program)
+            if libraries is None:
+                libraries = get_shared_libraries(program, self.ldd_timeout)
+                with self._lock:
+                    self._libraries[program] = libraries
+            files.extend(libraries)
+        # Such as the script run by an interpreter, or the document opened
+        files.extend(os.path.realpath(arg) for arg in cmd[1:] if arg.startswith(os.path.sep) and os.path.isfile(arg))
+        return files
+
+    def _prefetch(self, cmd: List[str]) -> int:
+        prefetched_files = 0
+        for path in self.get_files(cmd):
+            with self._lock:
+                if path in self._prefetched_paths:
+                    continue
+                self._prefetched_paths.add(path)
+            if readahead(path):
+                prefetched_files += 1
+        with self._lock:
+            self.prefetched_cmds.add(tuple(cmd))
+        logger.debug('Prefetched %d file(s) for %s', prefetched_files, cmd[0] if cmd else None)
+        return prefetched_files
+
+    def prefetch(self, cmd: List[str]) -> Future:
+        """
+        Prefetch the files of an app in the background.
+
+        :return: a future whose result is the number of files prefetched
+        """
+        return self._executor.submit(self._prefetch, cmd)
+
+    def shutdown(self, wait: bool = False):
+        self._executor.shutdown(wait=wait)
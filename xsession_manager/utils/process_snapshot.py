@@ -0,0 +1,122 @@
+from itertools import groupby
+from time import time
+from typing import Dict, List, Set, Tuple
+
+from .lazy_import import lazy_import
+from .metrics import count_calls
+from .snapd_workaround import Snapd
+
+psutil = lazy_import('psutil')
+
+# A process may not have called exec() yet if it is younger than this, in seconds. Its command line is still the one
+# of its parent, so it is read again by ProcessSnapshot.refresh().
+_EXEC_SETTLE_TIME = 1.0
+
+
+def normalize_cmd(cmd: List[str]) -> List[str]:
+    """
+    Normalize a command line so that two command lines of the same app can be compared.
+
+    Remove consecutive duplicates, the args could be duplicated in some apps, like Chromium-based browsers,
+    such as Microsoft Edge 96.0.1054.43, eg: msedge --enable-crashpad --enable-crashpad.
+    Remove '--gapplication-service' and '--pid=*' as well.
+    """
+    return [c[0] for c in groupby(cmd)
+            if (c[0] != "--gapplication-service" and not c[0].startswith('--pid='))]
+
+
+def cmd_key(cmd: List[str]) -> Tuple:
+    """
+    Return a hashable key of a command line, two command lines are treated as the same app
+    if and only if they have the same key.
+
+    Snap apps are identified by their snap app name only.
+    """
+    normalized_cmd = normalize_cmd(cmd)
+    if len(normalized_cmd) > 0:
+        is_snap_app, snap_app_name = Snapd.is_snap_app(normalized_cmd[0])
+        if is_snap_app:
+            return 'snap', snap_app_name
+    return tuple(normalized_cmd)
+
+
+class ProcessSnapshot:
+    """
+    A snapshot of the process table taken in one pass.
+
+    Used to look up processes by command line or by parent without walking the whole process table again.
+    """
+
+    def __init__(self):
+        self.cmdlines: Dict[int, List[str]] = {}
+        self._ppids: Dict[int, int] = {}
+        self._children: Dict[int, List[int]] = {}
+        self._pids_by_cmd_key: Dict[Tuple, List[int]] = {}
+        # Processes which may not have called exec() when their command lines were read
+        self._unsettled_pids: Set[int] = set()
+
+    @staticmethod
+    def take() -> 'ProcessSnapshot':
+        snapshot = ProcessSnapshot()
+        for p in psutil.process_iter(attrs=['pid', 'ppid', 'cmdline', 'create_time']):
+            count_calls('psutil')
+            # The info could be None, a process could exist a short while
+            cmdline = p.info['cmdline']
+            snapshot.add(p.info['pid'], p.info['ppid'], cmdline if cmdline else [], p.info['create_time'])
+        return snapshot
+
+    def refresh(self):
+        """
+        Update this snapshot incrementally, read the processes started since the last refresh only,
+        and forget the exited ones.
+
+        A pid which is reused between two refreshes is not noticed, so refresh right before using the snapshot.
+        """
+        pids = set(psutil.pids())
+        count_calls('psutil')
+        for pid in self.cmdlines.keys() - pids:
+            self.remove(pid)
+        for pid in (pids - self.cmdlines.keys()) | (self._unsettled_pids & pids):
+            count_calls('psutil')
+            try:
+                info = psutil.Process(pid).as_dict(attrs=['ppid', 'cmdline', 'create_time'])
+            except psutil.Error:
+                # Exited already
+                continue
+            self.remove(pid)
+            cmdline = info['cmdline']
+            self.add(pid, info['ppid'], cmdline if cmdline else [], info['create_time'])
+
+    def add(self, pid: int, ppid: int, cmdline: List[str], create_time: float = None):
+        self.cmdlines[pid] = cmdline
+        self._ppids[pid] = ppid
+        if ppid is not None:
+            self._children.setdefault(ppid, []).append(pid)
+        if len(cmdline) > 0:
+            self._pids_by_cmd_key.setdefault(cmd_key(cmdline), []).append(pid)
+        if create_time is not None and time() - create_time < _EXEC_SETTLE_TIME:
+            self._unsettled_pids.add(pid)
+
+    def remove(self, pid: int):
+        cmdline = self.cmdlines.pop(pid, None)
+        if cmdline is None:
+            return
+        ppid = self._ppids.pop(pid, None)
+        if ppid is not None:
+            self._children[ppid].remove(pid)
+            if len(self._children[ppid]) == 0:
+                del self._children[ppid]
+        if len(cmdline) > 0:
+            key = cmd_key(cmdline)
+            self._pids_by_cmd_key[key].remove(pid)
+            if len(self._pids_by_cmd_key[key]) == 0:
+                del self._pids_by_cmd_key[key]
+        self._unsettled_pids.discard(pid)
+
+    def children(self, pid: int) -> List[int]:
+        return self._children.get(pid, [])
+
+    def find_pids_by_cmd(self, cmd: List[str]) -> List[int]:
+        if len(cmd) <= 0:
+            return []
+        return self._pids_by_cmd_key.get(cmd_key(cmd), [])
@@ -0,0 +1,179 @@
+import cProfile
+import json
+import pstats
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from time import time
+from typing import Dict, Iterator, List
+
+from .base import Base
+
+
+class Span(Base):
+    """
+    A phase of an operation, or of restoring an app if app_name is set.
+    """
+
+    name: str
+    app_name: str
+    # In seconds since the epoch
+    started_at: float
+    ended_at: float
+    thread_id: int
+    thread_name: str
+
+    def __init__(self, name: str, app_name: str, started_at: float, ended_at: float):
+        self.name = name
+        self.app_name = app_name
+        self.started_at = started_at
+        self.ended_at = ended_at
+        thread = threading.current_thread()
+        self.thread_id = thread.ident
+        self.thread_name = thread.name
+
+    @property
+    def duration(self) -> float:
+        return self.ended_at - self.started_at
+
+
+class Profiler:
+    """
+    Record how long the phases of an operation take, in all threads.
+
+    A disabled profiler records nothing, and costs next to nothing, so that the phases are always instrumented.
+    Spans in different threads overlap, their durations do not add up to the wall time.
+    """
+
+    def __init__(self, enabled: bool=True):
+        self.enabled = enabled
+        self.started_at = time()
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, app_name: str=None) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        started_at = time()
+        try:
+            yield
+        finally:
+            self.add(name, started_at, time(), app_name)
+
+    def add(self, name: str, started_at: float, ended_at: float, app_name: str=None):
+        """
+        Record a span measured elsewhere, such as from launching an app to placing its windows.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self.spans.append(Span(name, app_name, started_at, ended_at))
+
+    def print_summary(self):
+        """
+        Print the time taken by each phase, and by each app in each phase of restoring it.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        print('Took %.3fs in total' % (time() - self.started_at))
+
+        phases: Dict[str, List[Span]] = OrderedDict()
+        for span in sorted(spans, key=lambda s: s.started_at):
+            if span.app_name is None:
+                phases.setdefault(span.name, []).append(span)
+        if len(phases) > 0:
+            name_width = max(len('Phase'), max(len(name) for name in phases))
+            print('%s %7s %10s %10s' % ('Phase'.ljust(name_width), 'Count', 'Total', 'Max'))
+            for name, spans_of_phase in phases.items():
+                durations = [span.duration for span in spans_of_phase]
+                print('%s %7d %9.3fs %9.3fs' % (name.ljust(name_width), len(durations), sum(durations),
+                                                max(durations)))
+
+        apps: Dict[str, Dict[str, float]] = OrderedDict()
+        app_phases: List[str] = []
+        for span in sorted(spans, key=lambda s: s.started_at):
+            if span.app_name is None:
+                continue
+            if span.name not in app_phases:
+                app_phases.append(span.name)
+            durations = apps.setdefault(span.app_name, {})
+            durations[span.name] = durations.get(span.name, 0.0) + span.duration
+        if len(apps) > 0:
+            print()
+            app_width = max(len('App'), max(len(app_name) for app_name in apps))
+            print(' '.join(['App'.ljust(app_width)] + [name.rjust(max(len(name), 9)) for name in app_phases]))
+            for app_name, durations in apps.items():
+                print(' '.join([app_name.ljust(app_width)]
+                               + [('%.3fs' % durations[name] if name in durations else '-').rjust(max(len(name), 9))
+                                  for name in app_phases]))
+
+    def write_chrome_trace(self, path: Path):
+        """
+        Write the spans as Chrome trace events, which chrome://tracing and https://ui.perfetto.dev open.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        events = []
+        thread_names = {}
+        for span in spans:
+            thread_names[span.thread_id] = span.thread_name
+            event = {'name': span.name if span.app_name is None else '%s: %s' % (span.name, span.app_name),
+                     'cat': 'app' if span.app_name else 'phase',
+                     'ph': 'X',
+                     # In microseconds
+                     'ts': (span.started_at - self.started_at) * 1e6,
+                     'dur': span.duration * 1e6,
+                     'pid': 1,
+                     'tid': span.thread_id}
+            if span.app_name:
+                event['args'] = {'app': span.app_name}
+            events.append(event)
+        for thread_id, thread_name in thread_names.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': thread_id,
+                           'args': {'name': thread_name}})
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+@contextmanager
+def profile_threads(path: Path) -> Iterator[None]:
+    """
+    Profile the calling thread and the threads started meanwhile by cProfile, and dump the stats to path,
+    which `python -m pstats` opens.
+
+    Each thread is profiled by Thread.run in the thread itself, and its profile is added once it finishes,
+    the threads still running when done, such as the ones of a detached restore, are not included.
+    """
+    profiles: List[cProfile.Profile] = []
+    lock = threading.Lock()
+    run = threading.Thread.run
+
+    def profile_run(thread: threading.Thread):
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12 and later profile one thread at a time
+            run(thread)
+            return
+        try:
+            run(thread)
+        finally:
+            profile.disable()
+            with lock:
+                profiles.append(profile)
+
+    main_profile = cProfile.Profile()
+    threading.Thread.run = profile_run
+    main_profile.enable()
+    try:
+        yield
+    finally:
+        main_profile.disable()
+        threading.Thread.run = run
+        with lock:
+            stats = pstats.Stats(main_profile, *profiles)
+        stats.dump_stats(str(path))
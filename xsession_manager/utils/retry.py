@@ -1,22 +1,145 @@
-from time import sleep
+import random
+from time import sleep, time
+from typing import Any, Callable, Type
+
+from .base import Base
 
 
 class NeedRetryException(BaseException):
     pass
 
 
-class Retry:
+class Attempt(Base):
+    """
+    The outcome of one attempt of calling a function under a RetryPolicy.
+    """
+
+    # Starting with 1
+    number: int
+    started_at: float
+    # In seconds
+    duration: float
+    result: Any
+    exception: BaseException
+
+    def __init__(self, number: int, started_at: float):
+        self.number = number
+        self.started_at = started_at
+        self.duration = 0.0
+        self.result = None
+        self.exception = None
+
+
+def retry_on_exceptions(*exception_types: Type[BaseException]) -> Callable[[Attempt], bool]:
+    def should_retry(attempt: Attempt) -> bool:
+        return attempt.exception is not None and isinstance(attempt.exception, exception_types)
+    return should_retry
+
+
+def retry_on_result(predicate: Callable[[Any], bool]) -> Callable[[Attempt], bool]:
+    def should_retry(attempt: Attempt) -> bool:
+        return attempt.exception is None and predicate(attempt.result)
+    return should_retry
+
 
-    retry_num: int
-    retry_interval: float
+class RetryPolicy:
+    """
+    How many times and how long to retry a function.
 
-    def __init__(self, retry_num=0, retry_interval=0.5):
-        self.retry_num = retry_num
-        self.retry_interval = retry_interval
+    The delay before the n-th retry (n starts with 0) is initial_delay * multiplier ** n, capped by max_delay,
+    plus a random fraction of it in [0, jitter]. Stop retrying once max_attempts is reached or the next attempt
+    would start after deadline seconds since the first attempt.
+    """
 
-    def do_retry(self, func, args=()):
-        for i in range(0, self.retry_num + 1):
+    max_attempts: int
+    initial_delay: float
+    multiplier: float
+    max_delay: float
+    jitter: float
+    deadline: float
+
+    def __init__(self,
+                 max_attempts: int = None,
+                 initial_delay: float = 0.25,
+                 multiplier: float = 1.0,
+                 max_delay: float = None,
+                 jitter: float = 0.0,
+                 deadline: float = None,
+                 should_retry: Callable[[Attempt], bool] = retry_on_exceptions(NeedRetryException),
+                 on_attempt: Callable[[Attempt], None] = None):
+        """
+        :param max_attempts: the max number of attempts including the first one, None means no limit
+        :param deadline: the total time in seconds, None means no limit
+        :param should_retry: decide whether to retry according to the outcome of an attempt,
+                             retry on NeedRetryException by default
+        :param on_attempt: called after each attempt, for logging or timing
+        """
+        if max_attempts is None and deadline is None:
+            raise ValueError('Either max_attempts or deadline is required')
+        self.max_attempts = max_attempts
+        self.initial_delay = initial_delay
+        self.multiplier = multiplier
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.deadline = deadline
+        self.should_retry = should_retry
+        self.on_attempt = on_attempt
+
+    def with_options(self, **options) -> 'RetryPolicy':
+        """
+        Return a copy of this policy with some options replaced.
+        """
+        kwargs = dict(max_attempts=self.max_attempts,
+                      initial_delay=self.initial_delay,
+                      multiplier=self.multiplier,
+                      max_delay=self.max_delay,
+                      jitter=self.jitter,
+                      deadline=self.deadline,
+                      should_retry=self.should_retry,
+                      on_attempt=self.on_attempt)
+        kwargs.update(options)
+        return RetryPolicy(**kwargs)
+
+    def get_delay(self, retry_times: int) -> float:
+        """
+        :param retry_times: how many times have been retried, starting with 0
+        :return: the delay in seconds before the next attempt
+        """
+        delay = self.initial_delay * (self.multiplier ** retry_times)
+        if self.max_delay is not None:
+            delay = min(delay, self.max_delay)
+        if self.jitter:
+            delay += delay * random.uniform(0, self.jitter)
+        return delay
+
+    def call(self, func, *args, **kwargs):
+        """
+        Call func until should_retry says no, or the attempts or the deadline run out.
+
+        If the last attempt raised an exception, re-raise it. Otherwise, return the result of the last attempt.
+        """
+        first_started_at = time()
+        number = 0
+        while True:
+            number += 1
+            attempt = Attempt(number, time())
             try:
-                return func(*args)
-            except NeedRetryException:
-                sleep(self.retry_interval)
+                attempt.result = func(*args, **kwargs)
+            except BaseException as e:
+                attempt.exception = e
+            attempt.duration = time() - attempt.started_at
+            if self.on_attempt:
+                self.on_attempt(attempt)
+
+            if not self.should_retry(attempt):
+                break
+            if self.max_attempts is not None and number >= self.max_attempts:
+                break
+            delay = self.get_delay(number - 1)
+            if self.deadline is not None and time() + delay - first_started_at > self.deadline:
+                break
+            sleep(delay)
+
+        if attempt.exception is not None:
+            raise attempt.exception
+        return attempt.result
@@ -4,12 +4,20 @@
 # https://snapcraft.io/docs/system-snap-directory
 
 import json
+import logging
 import re
 from typing import Dict, List, Tuple
 
-import pycurl
+from . import suppress_output, string_utils
+from .lazy_import import lazy_import
 
-from . import gio_utils, suppress_output, string_utils
+pycurl = lazy_import('pycurl')
+gio_utils = lazy_import('.gio_utils', __package__)
+
+logger = logging.getLogger(__name__)
+
+# Visit https://regex101.com/r/SXUlVX/ to check the explanation of this regular expression pattern
+_SNAP_APP_PATTERN = re.compile(r'([\/]|[\\]{,2})snap([\/]|[\\]{,2})[\w:\-]+([\/]|[\\]{,2})[\d]+')
 
 
 class Snapd:
@@ -23,7 +31,7 @@ class Snapd:
         try:
             r = self.curl.perform_rs()
         except:
-            print("Failed to query the app named '%s' via /run/snapd.socket" % app_name)
+            logger.warning("Failed to query the app named '%s' via /run/snapd.socket", app_name)
             return []
 
         jr = json.loads(r)
@@ -32,7 +40,7 @@ class Snapd:
             result: List[Dict] = jr['result']
             return result
 
-        print(jr['result']['message'])
+        logger.warning('%s', jr['result']['message'])
         return []
 
     def get_app_re(self, app_name: str) -> dict:
@@ -52,18 +60,15 @@ class Snapd:
             elif len(_r_duplicates_removed) == 1:
                 return _r_duplicates_removed[0]
             if len(_r_duplicates_removed) > 1:
-                message = 'Found multiple desktop files (%s) according to "%s", use the first one (%s)'\
-                          % (_r_duplicates_removed, app_name, _r_duplicates_removed[0]['desktop-file'])
-                print(message)
+                logger.info('Found multiple desktop files (%s) according to "%s", use the first one (%s)',
+                            _r_duplicates_removed, app_name, _r_duplicates_removed[0]['desktop-file'])
                 return _r_duplicates_removed[0]
 
         return result[0]
 
     @staticmethod
     def is_snap_app(app_cmd: str) -> Tuple[bool, str]:
-        # Visit https://regex101.com/r/SXUlVX/ to check the explanation of this regular expression pattern
-        c = re.compile(r'([\/]|[\\]{,2})snap([\/]|[\\]{,2})[\w:\-]+([\/]|[\\]{,2})[\d]+')
-        r = c.search(app_cmd)
+        r = _SNAP_APP_PATTERN.search(app_cmd)
         if r:
             match = r.group()
             snap_app_name = re.split(r'[/|\\]+', match)[2]
@@ -88,4 +93,4 @@ class Snapd:
             with so.suppress_output():
                 return gio_utils.GDesktopAppInfo().launch_app_via_desktop_file(df, launched_callback)
 
-        print('Failed to run apps %s as a Snap app' % app_names)
+        logger.warning('Failed to run apps %s as a Snap app', app_names)
@@ -1,4 +1,16 @@
+import errno
+import logging
+import os
+import shutil
 import subprocess
+import threading
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+# The apps launched by this process, which become zombies once they exit until they are waited for
+_launched: List[subprocess.Popen] = []
+_launched_lock = threading.Lock()
 
 
 def run_cmd(commandline: list):
@@ -8,5 +20,56 @@ def run_cmd(commandline: list):
     # subprocess.DEVNULL only support > 3.3
     return subprocess.Popen(commandline, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
-def launch_app(commandline: list):
-    return run_cmd(commandline)
+def with_lower_priority(commandline: list, niceness_increment: int=0, idle_io: bool=False) -> list:
+    """
+    Wrap a command line by nice and ionice, which exec the app in the end, so that the app keeps the pid
+    of the process launched, and the processes it forks while starting up inherit the priority as well.
+    Lowering the priority of the child process before exec by preexec_fn instead could deadlock,
+    since the process forking it has threads.
+
+    :return: the command line as it is if nice or ionice is not found
+    """
+    wrapper = []
+    if niceness_increment > 0:
+        nice = shutil.which('nice')
+        if nice is None:
+            logger.debug('nice is not found, launch %s at normal niceness', commandline[0])
+        else:
+            wrapper.extend([nice, '-n', str(niceness_increment)])
+    if idle_io:
+        ionice = shutil.which('ionice')
+        if ionice is None:
+            logger.debug('ionice is not found, launch %s at normal I/O priority', commandline[0])
+        else:
+            # -t: run the app even if the I/O priority can not be set
+            wrapper.extend([ionice, '-c', '3', '-t'])
+    return wrapper + commandline
+
+
+def launch_app(commandline: list, niceness_increment: int=0, idle_io: bool=False):
+    """
+    :param niceness_increment: added to the niceness of the app, see with_lower_priority()
+    :param idle_io: launch the app in the idle I/O scheduling class
+    :raise FileNotFoundError: if the executable is not found
+    """
+    if niceness_increment > 0 or idle_io:
+        # Otherwise the wrapper fails to exec it instead of raising FileNotFoundError here
+        if shutil.which(commandline[0]) is None:
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), commandline[0])
+        commandline = with_lower_priority(commandline, niceness_increment, idle_io)
+    process = run_cmd(commandline)
+    with _launched_lock:
+        _launched.append(process)
+    return process
+
+
+def reap_children() -> int:
+    """
+    Wait for the apps launched which have exited, such as launchers handing over to a running instance,
+    so that they do not linger as zombies in a long-running process like the daemon.
+
+    :return: the number of apps still running
+    """
+    with _launched_lock:
+        _launched[:] = [process for process in _launched if process.poll() is None]
+        return len(_launched)
@@ -3,14 +3,18 @@
 
 import subprocess
 
+from .metrics import count_calls
+
 
 def get_running_windows_raw() -> list:
+    count_calls('wmctrl')
     output = subprocess.check_output('wmctrl -lpG', shell=True)
     lines = output.splitlines()
     return [line.decode() for line in lines]
 
 
 def get_running_windows() -> list:
+    count_calls('wmctrl')
     output = subprocess.check_output('wmctrl -lpG', shell=True)
     lines = output.splitlines()
     # The remainder of the line contains the window title (possibly with multiple spaces in the title).
@@ -23,18 +27,22 @@ def has_any_running_window() -> bool:
 
 
 def close_window_gracefully_async(window_id: str):
+    count_calls('wmctrl')
     subprocess.Popen(['wmctrl', '-ic', window_id])
 
 
 def close_window_gracefully_sync(window_id: str):
+    count_calls('wmctrl')
     subprocess.check_output(['wmctrl', '-ic', window_id])
 
 
 def move_window_to(window_id: str, desktop_number: str):
+    count_calls('wmctrl')
     subprocess.Popen(['wmctrl', '-ir', window_id, '-t', desktop_number])
 
 
 def is_gnome() -> bool:
+    count_calls('wmctrl')
     output = subprocess.check_output(['wmctrl', '-m'])
     lines = output.splitlines()
     wm_type = lines[0].decode().split(':')[1]
@@ -1,7 +1,8 @@
 # Note: Wnck may not works in Wayland
+import logging
 from contextlib import contextmanager
 from time import time
-from typing import Tuple
+from typing import Callable, Dict, Iterable, List, Set, Tuple
 
 from . import gio_utils
 
@@ -11,14 +12,118 @@ gi.require_version('Wnck', '3.0')
 gi.require_version('Gtk', '3.0')
 from gi.repository import Wnck, Gtk
 
+logger = logging.getLogger(__name__)
 
-def close_window_gracefully_async(window_id: int):
-    window: Wnck.Window = get_window(window_id)
+
+def close_window_gracefully_async(window_id: int, refresh: bool=True):
+    window: Wnck.Window = get_window(window_id, refresh)
     # window may be None if this window has been closed by the user
     if window:
         window.close(time())
 
 
+def connect_window_closed(callback: Callable[[int], None]) -> int:
+    """
+    Call callback with the xid of a window once it is closed.
+
+    Note that the signal is only emitted while handling events, see refresh_screen().
+
+    :return: the handler id, which is used to disconnect
+    """
+    def window_closed_cb(screen: Wnck.Screen, window: Wnck.Window):
+        callback(window.get_xid())
+
+    screen: Wnck.Screen = Wnck.Screen.get_default()
+    return screen.connect('window-closed', window_closed_cb)
+
+
+def connect_window_changes(callback: Callable[[int], None]) -> List[int]:
+    """
+    Call callback with the xid of a window once it is opened, closed, moved to another workspace, moved, resized,
+    or its state like always on top is changed.
+
+    Note that the signals are only emitted while a GLib main loop is running or while handling events,
+    see refresh_screen().
+
+    :return: the handler ids of the screen, which are used to disconnect.
+             The handlers of a window are disconnected once it is closed.
+    """
+    def window_changed_cb(window: Wnck.Window, *args):
+        callback(window.get_xid())
+
+    def watch_window(window: Wnck.Window):
+        for signal in ('workspace-changed', 'geometry-changed', 'state-changed'):
+            window.connect(signal, window_changed_cb)
+
+    def window_opened_cb(screen: Wnck.Screen, window: Wnck.Window):
+        watch_window(window)
+        callback(window.get_xid())
+
+    def window_closed_cb(screen: Wnck.Screen, window: Wnck.Window):
+        callback(window.get_xid())
+
+    screen: Wnck.Screen = refresh_screen()
+    for window in screen.get_windows():
+        watch_window(window)
+    return [screen.connect('window-opened', window_opened_cb),
+            screen.connect('window-closed', window_closed_cb)]
+
+
+def disconnect(handler_id: int):
+    screen: Wnck.Screen = Wnck.Screen.get_default()
+    screen.disconnect(handler_id)
+
+
+def get_existing_window_ids(xids: Iterable[int], refresh: bool=True) -> Set[int]:
+    """
+    :return: the xids of the windows which are still open
+    """
+    if refresh:
+        refresh_screen()
+    return {xid for xid in xids if Wnck.Window.get(xid) is not None}
+
+
+def move_windows_to(moves: List[Tuple[int, int]]):
+    """
+    Move windows to workspaces in one go, Wnck updates its window list only once.
+
+    Windows which are sticky before moving are made sticky again.
+
+    :param moves: a list of (xid, desktop_number)
+    """
+    screen: Wnck.Screen = refresh_screen()
+    for xid, desktop_number in moves:
+        ws = screen.get_workspace(desktop_number)
+        if ws is None:
+            logger.warning('Workspace %d not found!', desktop_number)
+            continue
+        window: Wnck.Window = get_window(xid, refresh=False)
+        if window:
+            _is_sticky = window.is_sticky()
+            window.move_to_workspace(ws)
+            if _is_sticky:
+                window.stick()
+
+
+def are_in_workspaces(moves: List[Tuple[int, int]]) -> bool:
+    """
+    Check whether windows are in their workspaces, Wnck updates its window list only once.
+
+    Windows which are closed or are on all workspaces are treated as in their workspaces.
+
+    :param moves: a list of (xid, desktop_number)
+    """
+    refresh_screen()
+    for xid, desktop_number in moves:
+        window: Wnck.Window = get_window(xid, refresh=False)
+        if not window or window.is_pinned():
+            continue
+        ws: Wnck.Workspace = window.get_workspace()
+        if ws is None or ws.get_number() != desktop_number:
+            return False
+    return True
+
+
 def move_window_to(window_id, desktop_number):
     screen: Wnck.Screen = Wnck.Screen.get_default()
     # In case that cannot get the Wnck.Workspace instance
@@ -27,7 +132,7 @@ def move_window_to(window_id, desktop_number):
     screen.force_update()
     ws = screen.get_workspace(desktop_number)
     if ws is None:
-        print('Workspace %d not found!' % desktop_number)
+        logger.warning('Workspace %d not found!', desktop_number)
     else:
         window: Wnck.Window = get_window(window_id)
         if window:
@@ -49,8 +154,32 @@ def get_workspace_count():
     return screen.get_workspace_count()
 
 
-def get_app_name(xid: int) -> str:
-    window = get_window(xid)
+def get_active_workspace_number(refresh: bool=True) -> int:
+    screen: Wnck.Screen = refresh_screen() if refresh else Wnck.Screen.get_default()
+    workspace: Wnck.Workspace = screen.get_active_workspace()
+    # None if the window manager does not support workspaces
+    return workspace.get_number() if workspace else 0
+
+
+def connect_active_workspace_changed(callback: Callable[[int], None]) -> int:
+    """
+    Call callback with the number of the active workspace once the user switches to it.
+
+    Note that the signal is only emitted while handling events, see refresh_screen().
+
+    :return: the handler id, which is used to disconnect
+    """
+    def active_workspace_changed_cb(screen: Wnck.Screen, previous_workspace: Wnck.Workspace):
+        workspace: Wnck.Workspace = screen.get_active_workspace()
+        if workspace:
+            callback(workspace.get_number())
+
+    screen: Wnck.Screen = Wnck.Screen.get_default()
+    return screen.connect('active-workspace-changed', active_workspace_changed_cb)
+
+
+def get_app_name(xid: int, refresh: bool=True) -> str:
+    window = get_window(xid, refresh)
     if not window:
         return ''
     
@@ -66,12 +195,23 @@ def get_app_name(xid: int) -> str:
     return name
 
 
-def get_window(xid: int) -> Wnck.Window:
+def refresh_screen() -> Wnck.Screen:
+    """
+    Handle pending events and force Wnck to update its window list.
+
+    Call this once before a batch of operations, then pass refresh=False to the functions in the batch.
+    """
     screen: Wnck.Screen = Wnck.Screen.get_default()
-    # In case that cannot get the window according to xid
     while Gtk.events_pending():
         Gtk.main_iteration()
     screen.force_update()
+    return screen
+
+
+def get_window(xid: int, refresh: bool=True) -> Wnck.Window:
+    # In case that cannot get the window according to xid
+    if refresh:
+        refresh_screen()
     window: Wnck.Window = Wnck.Window.get(xid)
     if not window:
         # TODO too many times to be called by others
@@ -85,15 +225,15 @@ def get_window_title(xid: int) -> str:
     return window.get_name()
 
 
-def is_sticky(xid: int) -> bool:
-    window: Wnck.Window = get_window(xid)
+def is_sticky(xid: int, refresh: bool=True) -> bool:
+    window: Wnck.Window = get_window(xid, refresh)
     if not window:
         return False
     return window.is_sticky()
 
 
-def stick(xid: int, if_not_sticky: bool=True):
-    window: Wnck.Window = get_window(xid)
+def stick(xid: int, if_not_sticky: bool=True, refresh: bool=True):
+    window: Wnck.Window = get_window(xid, refresh)
     if if_not_sticky and window:
         _is_sticky = window.is_sticky()
         if not _is_sticky:
@@ -108,8 +248,8 @@ def is_above(xid: int) -> bool:
     return window.is_above()
 
 
-def make_above(xid: int):
-    window: Wnck.Window = get_window(xid)
+def make_above(xid: int, refresh: bool=True):
+    window: Wnck.Window = get_window(xid, refresh)
     if not window:
         return
     window.make_above()
@@ -129,8 +269,8 @@ def count_windows(xid: int) -> int:
     return app.get_n_windows()
 
 
-def get_geometry(xid: int) -> Tuple[int, int, int, int]:
-    window = get_window(xid)
+def get_geometry(xid: int, refresh: bool=True) -> Tuple[int, int, int, int]:
+    window = get_window(xid, refresh)
     if window:
         geometry = window.get_geometry()
         xp = geometry.xp
@@ -142,12 +282,47 @@ def get_geometry(xid: int) -> Tuple[int, int, int, int]:
     return None
 
 
-def set_geometry(xid: int, xp: int, yp: int, widthp: int, heightp: int):
-    window = get_window(xid)
+def get_geometries(xids: Iterable[int]) -> Dict[int, Tuple[int, int, int, int]]:
+    """
+    Get the geometries of windows, Wnck updates its window list only once.
+
+    :return: the geometries keyed by xid, windows not found are not included
+    """
+    refresh_screen()
+    geometries = {}
+    for xid in xids:
+        geometry = get_geometry(xid, refresh=False)
+        if geometry:
+            geometries[xid] = geometry
+    return geometries
+
+
+def set_geometries(geometries: Dict[int, Tuple[int, int, int, int]]):
+    """
+    Set the geometries of windows in one burst, Wnck updates its window list only once.
+
+    Unlike set_geometry(), the current geometries are not compared, which is up to the caller.
+
+    :param geometries: (x, y, width, height) keyed by xid
+    """
+    refresh_screen()
+    geometry_mask: Wnck.WindowMoveResizeMask = (
+            Wnck.WindowMoveResizeMask.X |
+            Wnck.WindowMoveResizeMask.Y |
+            Wnck.WindowMoveResizeMask.WIDTH |
+            Wnck.WindowMoveResizeMask.HEIGHT)
+    for xid, (xp, yp, widthp, heightp) in geometries.items():
+        window = get_window(xid, refresh=False)
+        if window:
+            window.set_geometry(Wnck.WindowGravity.CURRENT, geometry_mask, xp, yp, widthp, heightp)
+
+
+def set_geometry(xid: int, xp: int, yp: int, widthp: int, heightp: int, refresh: bool=True):
+    window = get_window(xid, refresh)
     if window:
         _if_set_geometry = True
 
-        geometry = get_geometry(xid)
+        geometry = get_geometry(xid, refresh=False)
         if geometry:
             x_offset, y_offset, width, height = geometry
             if xp == x_offset and yp == y_offset and width == widthp and height == heightp:
@@ -184,9 +359,8 @@ def create_enough_workspaces(max_desktop_number: int):
                     yield
                 finally:
                     gsettings.enable_dynamic_workspaces()
-            except Exception as e:
-                import traceback
-                print(traceback.format_exc())
+            except Exception:
+                logger.exception('Failed to create enough workspaces')
         else:
             workspaces_number = gsettings.get_workspaces_number()
             if max_desktop_number > workspaces_number:
@@ -2,35 +2,52 @@ import collections
 import copy
 import datetime
 import json
+import logging
 import os
 import threading
-import traceback
 from contextlib import contextmanager
 from itertools import groupby
-from multiprocessing import cpu_count
-from multiprocessing.pool import Pool
+from concurrent.futures import Future, as_completed
 from operator import attrgetter
 from pathlib import Path
-from subprocess import CalledProcessError
 from time import time, sleep
 from types import SimpleNamespace as Namespace
-from typing import List, Dict, Any, Union
+from typing import Callable, Iterator, List, Dict, Any, Set, Union, Tuple
+
+from .admission import Admission, AdmissionController
+from .app_profiles import AppProfileStore, StartupSample
+from .launch_target import LaunchTarget
+from .move_planner import MovePlanner, MovePlan, WindowPlacement
+from .move_queue import MoveQueue, MoveJob
+from .pacing import LaunchPacer
+from .priority import PriorityStager
+from .restore_job import JobState, RestoreJob
+from .restore_plan import LaunchPlan
+from .restore_report import AppTimeline, Outcome, RestoreReport, RESOLVED, SPAWNED, STARTED, STATE_APPLIED
+from .restore_state import WindowRestoreState, WindowRestoreStates, WindowRestoreStatus, GeometryCache
+from .session_cache import SessionCache, load_session_file
+from .session_filter import SessionFilter, SessionMatcher
+from .settings.constants import Locations, Prefetch, RetryPolicies, WorkspaceFirstRestore
+from .settings.xsession_config import XSessionConfig, XSessionConfigObject
+from .utils import snapd_workaround, suppress_output, string_utils
+from .utils.desktop_backend import DesktopBackend
+from .utils.lazy_import import lazy_import
+from .utils.log import LazyJson, TRACE
+from .utils.metrics import Metrics, get_call_counts
+from .utils.prefetch import Prefetcher
+from .utils.profiling import Profiler
+from .utils.process_snapshot import ProcessSnapshot, cmd_key
+from .utils.retry import Attempt, RetryPolicy
 
-import psutil
-import gi
-gi.require_version('Gtk', '3.0')
-from gi.repository import Gtk
+# Heavy modules, only imported when they are used
+gio_utils = lazy_import('.utils.gio_utils', __package__)
 
-from .session_filter import SessionFilter
-from .settings.constants import Locations
-from .settings.xsession_config import XSessionConfig, XSessionConfigObject
-from .utils import wmctl_wrapper, subprocess_utils, retry, gio_utils, wnck_utils, snapd_workaround, suppress_output, \
-    string_utils
+logger = logging.getLogger(__name__)
 
 
 class XSessionManager:
 
-    _moving_windows_pool: Pool
+    _move_queue: MoveQueue
 
     session_filters: List[SessionFilter]
     base_location_of_sessions: str
@@ -41,51 +58,151 @@ class XSessionManager:
                  vv: bool=False,
                  session_filters: List[SessionFilter]=None,
                  base_location_of_sessions: str=Locations.BASE_LOCATION_OF_SESSIONS,
-                 base_location_of_backup_sessions: str=Locations.BASE_LOCATION_OF_BACKUP_SESSIONS):
+                 base_location_of_backup_sessions: str=Locations.BASE_LOCATION_OF_BACKUP_SESSIONS,
+                 desktop_app_info: 'gio_utils.GDesktopAppInfo'=None,
+                 snapd: snapd_workaround.Snapd=None,
+                 session_cache: SessionCache=None,
+                 process_snapshot_provider: Callable[[], ProcessSnapshot]=None,
+                 prefetched_cmds: Set[Tuple[str, ...]]=None,
+                 launch_targets: Dict[str, LaunchTarget]=None,
+                 desktop: DesktopBackend=None,
+                 app_profiles_path: Path=Locations.APP_PROFILES,
+                 restore_reports_path: Path=Locations.RESTORE_REPORTS,
+                 metrics_path: Path=None,
+                 restore_jobs_path: Path=Locations.RESTORE_JOBS,
+                 profiler: Profiler=None):
+        """
+        The optional resources are shared by a long-running process like the daemon, to avoid initializing them
+        for each operation. They are created on demand if not provided.
+
+        :param session_cache: parse session files only once if provided
+        :param process_snapshot_provider: return an up-to-date snapshot of the process table, take a new one by default
+        :param prefetched_cmds: the command lines of apps whose files are in the page cache already,
+                                which are not prefetched again
+        :param launch_targets: how the apps are launched, resolved ahead of restoring and keyed by their executables,
+                               the .desktop files are indexed by GLib only for the apps not resolved
+        :param desktop: the desktop to work with, the real X desktop by default
+        :param app_profiles_path: where the startup profiles of apps are kept, not kept if None
+        :param restore_reports_path: where the timelines of recent restores are kept, not kept if None
+        :param metrics_path: the Prometheus textfile which the metrics are added to after each operation,
+                             not written if None
+        :param restore_jobs_path: where a restore listens for `xsm --status` and `xsm --cancel`, not listening if None
+        :param profiler: record how long the phases take, not recorded if None
+        """
         self.session_filters = session_filters
         self.base_location_of_sessions = base_location_of_sessions
         self.base_location_of_backup_sessions = base_location_of_backup_sessions
 
-        self._moved_windowids_cache = []
+        self.window_restore_states = WindowRestoreStates()
+        self._geometry_cache = GeometryCache(RetryPolicies.GEOMETRY_PENDING_TIMEOUT, RetryPolicies.GEOMETRY_MAX_TIMES)
         self._suppress_log_if_already_in_workspace = False
         self.opened_window_id_pid: Dict[int, List[int]] = {}
         self.opened_window_id_pid_old: Dict[int, List[int]] = {}
 
-        self._windows_can_not_be_moved: List[XSessionConfigObject] = []
         self._restore_geometry_or_not = False
         self.verbose = verbose
         self.vv = vv
-        self.restore_app_countdown = -1
 
-        self.instance_lock = threading.Lock()
+        self._move_queue = None
+        self._move_futures: List[Future] = []
+        # Serialize the access to X between the thread launching apps and the thread moving windows
+        self._x_lock = threading.RLock()
+        # Created when restoring a session unless the available memory is ignored
+        self._admission_controller: AdmissionController = None
+        # Created when restoring a session
+        self._app_profiles: AppProfileStore = None
+        # When the apps were launched, keyed by the xid of the apps
+        self._launched_at: Dict[int, float] = {}
+        # Created when restoring a session
+        self._launch_pacer: LaunchPacer = None
+        # Created when restoring a session with priorities staged
+        self._priority_stager: PriorityStager = None
+        # Created when restoring a session
+        self._restore_report: RestoreReport = None
+        # The timelines of the apps being restored, keyed by the xid of the apps
+        self._app_timelines: Dict[int, AppTimeline] = {}
+        # Created when restoring a session
+        self._restore_job: RestoreJob = None
+
+        self._desktop_app_info = desktop_app_info
+        self._snapd = snapd
+        self._session_cache = session_cache
+        self._process_snapshot_provider = process_snapshot_provider
+        self._prefetched_cmds = prefetched_cmds if prefetched_cmds is not None else set()
+        self._launch_targets = launch_targets if launch_targets is not None else {}
+        self._desktop = desktop if desktop is not None else DesktopBackend()
+        self.app_profiles_path = app_profiles_path
+        self.restore_reports_path = restore_reports_path
+        self.metrics_path = metrics_path
+        self.restore_jobs_path = restore_jobs_path
+        self._profiler = profiler if profiler is not None else Profiler(enabled=False)
 
     def save_session(self, session_name: str, session_filter: SessionFilter=None):
-        x_session_config = self.get_session_details(remove_duplicates_by_pid=False,
-                                                    session_filters=[session_filter])
+        with self._record_metrics('save') as metrics:
+            x_session_config = self.get_session_details(remove_duplicates_by_pid=False,
+                                                        session_filters=(self.session_filters or [])
+                                                        + [session_filter])
+            with self._profiler.span('write session'):
+                self.write_session_config(session_name, x_session_config)
+            metrics.inc('xsm_windows_saved_total', len(x_session_config.x_session_config_objects))
+        logger.info('Done!')
+
+    @contextmanager
+    def _record_metrics(self, operation: str) -> Iterator[Metrics]:
+        """
+        Record how long an operation takes and the calls it makes, along with the metrics added to the ones
+        yielded, and write them to metrics_path once it is done.
+        """
+        metrics = Metrics()
+        started_at = time()
+        call_counts = get_call_counts()
+        try:
+            yield metrics
+        except Exception:
+            metrics.inc('xsm_operation_failures_total', operation=operation)
+            raise
+        finally:
+            if self.metrics_path is not None:
+                ended_at = time()
+                metrics.inc('xsm_operations_total', operation=operation)
+                metrics.observe('xsm_operation_duration_seconds', ended_at - started_at, operation=operation)
+                metrics.set('xsm_last_operation_timestamp_seconds', ended_at, operation=operation)
+                for tool, count in get_call_counts().items():
+                    if count > call_counts.get(tool, 0):
+                        metrics.inc('xsm_external_calls_total', count - call_counts.get(tool, 0), tool=tool)
+                try:
+                    metrics.write_textfile(self.metrics_path)
+                except OSError as e:
+                    logger.warning('Failed to write the metrics to %s: %s', self.metrics_path, e)
+
+    def write_session_config(self, session_name: str, x_session_config: XSessionConfig, backup: bool=True):
+        """
+        :param backup: backup the old session if it exists
+        """
         x_session_config.session_name = session_name
 
         session_path = Path(self.base_location_of_sessions, session_name)
-        print('Saving the session to: ' + str(session_path))
+        logger.info('Saving the session to: %s', session_path)
 
         if not session_path.parent.exists():
             session_path.parent.mkdir(parents=True, exist_ok=True)
         else:
             # Backup the old session
-            if session_path.exists():
+            if backup and session_path.exists():
                 self.backup_session(session_path)
 
         # Save a new session
         x_session_config.session_create_time = datetime.datetime.fromtimestamp(time()).strftime("%Y-%m-%d %H:%M:%S.%f")
         save_session_details_json = json.dumps(x_session_config, default=lambda o: o.__dict__)
         
-        if self.vv:
-            print('Saving the new json format x session [%s] ' % save_session_details_json)
+        logger.log(TRACE, 'Saving the new json format x session [%s] ', save_session_details_json)
         
         self.write_session(session_path, save_session_details_json)
-        print('Done!')
         
     def get_session_details(self, remove_duplicates_by_pid=True,
-                            session_filters: List[SessionFilter]=None) -> XSessionConfig:
+                            session_filters: List[SessionFilter]=None,
+                            previous_windows: Dict[int, XSessionConfigObject]=None,
+                            changed_window_ids: Set[int]=None) -> XSessionConfig:
 
         """
         Get the current running session details, including app name, process id,
@@ -93,52 +210,34 @@ class XSessionManager:
 
         See XSessionConfigObject for more information.
 
+        :param previous_windows: the windows got last time keyed by xid, reuse their details if they are not changed
+        :param changed_window_ids: the xids of the windows which are changed since last time
         :return: the current running session details
         """
 
-        running_windows: list = wmctl_wrapper.get_running_windows()
+        with self._profiler.span('list windows'):
+            running_windows: list = self._retry_policy(RetryPolicies.WMCTRL).call(self._desktop.get_running_windows)
         x_session_config: XSessionConfig = XSessionConfigObject.convert_wmctl_result_2_list(running_windows,
                                                                                             remove_duplicates_by_pid)
-        if self.vv:
-            print('Got the running process list according to wmctl: %s' % json.dumps(x_session_config, default=lambda o: o.__dict__))
+        logger.log(TRACE, 'Got the running process list according to wmctl: %s', LazyJson(x_session_config))
+        x_session_config.total_memory = self._desktop.get_total_memory()
         x_session_config_objects: List[XSessionConfigObject] = x_session_config.x_session_config_objects
         counter: collections.Counter = collections.Counter(window.pid for window in x_session_config_objects)
         for idx, sd in enumerate(x_session_config_objects):
-            try:
-                process = psutil.Process(sd.pid)
-                sd.username = process.username()
-                sd.cmd = process.cmdline()
-                sd.process_create_time = datetime.datetime.fromtimestamp(process.create_time()).strftime("%Y-%m-%d %H:%M:%S")
-                sd.cpu_percent = process.cpu_percent()
-                sd.memory_percent = process.memory_percent()
-            except psutil.NoSuchProcess as e:
-                if self.verbose:
-                    print('Failed to get process [%s] info using psutil due to: %s' % (sd, str(e)))
-                sd.username = ''
-                sd.cmd = []
-                sd.process_create_time = None
-                sd.cpu_percent = 0.0
-                sd.memory_percent = 0.0
-                
-            sd.app_name = wnck_utils.get_app_name(sd.window_id_the_int_type)
-            sd.window_state = sd.WindowState()
-            sd.window_state.is_above = wnck_utils.is_above(sd.window_id_the_int_type)
-            sd.window_state.is_sticky = wnck_utils.is_sticky(sd.window_id_the_int_type)
+            previous_window = previous_windows.get(sd.window_id_the_int_type) if previous_windows else None
+            if previous_window is not None and previous_window.pid == sd.pid:
+                self._copy_details(previous_window, sd, self._PROCESS_DETAILS)
+            else:
+                with self._profiler.span('get process details'):
+                    self._fill_process_details(sd)
+
+            if previous_window is not None \
+                    and (changed_window_ids is None or sd.window_id_the_int_type not in changed_window_ids):
+                self._copy_details(previous_window, sd, self._WINDOW_DETAILS)
+            else:
+                with self._profiler.span('get window details'):
+                    self._fill_window_details(sd)
             sd.windows_count = counter[sd.pid]
-            
-            geometry = wnck_utils.get_geometry(sd.window_id_the_int_type)
-            if geometry is None:
-                sleep(0.25)
-                geometry = wnck_utils.get_geometry(sd.window_id_the_int_type)
-            if geometry:
-                x_offset, y_offset, width, height = geometry
-                window_position = sd.WindowPosition()
-                window_position.x_offset = x_offset
-                window_position.y_offset = y_offset
-                window_position.width = width
-                window_position.height = height
-                window_position.provider = 'Wnck'
-                sd.window_position = window_position        
 
         if session_filters:
             for session_filter in session_filters:
@@ -147,11 +246,53 @@ class XSessionManager:
                 x_session_config.x_session_config_objects[:] = \
                     session_filter(x_session_config.x_session_config_objects)
 
-        if self.vv:
-            print('Completed the running process list and applied filters: %s' %
-                  json.dumps(x_session_config, default=lambda o: o.__dict__))
+        logger.log(TRACE, 'Completed the running process list and applied filters: %s', LazyJson(x_session_config))
         return x_session_config
 
+    # The details got from the process and from Wnck of a window, see get_session_details()
+    _PROCESS_DETAILS = ('username', 'cmd', 'process_create_time', 'cpu_percent', 'memory_percent')
+    _WINDOW_DETAILS = ('app_name', 'window_state', 'window_position')
+
+    def _copy_details(self, from_window: XSessionConfigObject, to_window: XSessionConfigObject, details: Tuple):
+        for detail in details:
+            if hasattr(from_window, detail):
+                setattr(to_window, detail, getattr(from_window, detail))
+
+    def _fill_process_details(self, sd: XSessionConfigObject):
+        process_details = self._desktop.get_process_details(sd.pid)
+        if process_details:
+            sd.username = process_details.username
+            sd.cmd = process_details.cmdline
+            sd.process_create_time = datetime.datetime.fromtimestamp(process_details.create_time) \
+                .strftime("%Y-%m-%d %H:%M:%S")
+            sd.cpu_percent = process_details.cpu_percent
+            sd.memory_percent = process_details.memory_percent
+        else:
+            logger.debug('Failed to get process [%s] info, it may have exited', sd)
+            sd.username = ''
+            sd.cmd = []
+            sd.process_create_time = None
+            sd.cpu_percent = 0.0
+            sd.memory_percent = 0.0
+
+    def _fill_window_details(self, sd: XSessionConfigObject):
+        sd.app_name = self._desktop.get_app_name(sd.window_id_the_int_type)
+        sd.window_state = sd.WindowState()
+        sd.window_state.is_above = self._desktop.is_above(sd.window_id_the_int_type)
+        sd.window_state.is_sticky = self._desktop.is_sticky(sd.window_id_the_int_type)
+
+        geometry = self._retry_policy(RetryPolicies.GET_GEOMETRY).call(self._desktop.get_geometry,
+                                                                      sd.window_id_the_int_type)
+        if geometry:
+            x_offset, y_offset, width, height = geometry
+            window_position = sd.WindowPosition()
+            window_position.x_offset = x_offset
+            window_position.y_offset = y_offset
+            window_position.width = width
+            window_position.height = height
+            window_position.provider = 'Wnck'
+            sd.window_position = window_position
+
     def backup_session(self, original_session_path):
         backup_time = datetime.datetime.fromtimestamp(time())
         with open(original_session_path, 'r') as file:
@@ -161,249 +302,743 @@ class XSessionManager:
                                    os.path.basename(original_session_path) + '.backup-' + current_time_str_as_backup_id)
         if not backup_session_path.parent.exists():
             backup_session_path.parent.mkdir(parents=True, exist_ok=True)
-        print('Backup the old session file [%s] to [%s]' % (original_session_path, backup_session_path))
+        logger.info('Backup the old session file [%s] to [%s]', original_session_path, backup_session_path)
         backup_time_str = backup_time.strftime("%Y-%m-%d %H:%M:%S.%f")
         namespace_objs.backup_time = backup_time_str
         backup_session_details_json = json.dumps(namespace_objs, default=lambda o: o.__dict__)
         self.write_session(backup_session_path, backup_session_details_json)
 
     def write_session(self, session_path, session_details_json):
-        with open(session_path, 'w') as file:
+        # Write to a temporary file and rename it, so that a session being read is never half written
+        temp_session_path = Path(str(session_path) + '.tmp')
+        with open(temp_session_path, 'w') as file:
             file.write(
                 json.dumps(
                     json.loads(session_details_json),
                     indent=4,
                     sort_keys=True))
+        os.replace(temp_session_path, session_path)
+
+    def load_session(self, session_name: str) -> XSessionConfig:
+        """
+        Load a saved session. The session may be shared with other callers, do not modify it.
 
-    def restore_session(self, session_name, restoring_interval=0.5):
+        :raise FileNotFoundError: if the session does not exist
+        """
         session_path = Path(self.base_location_of_sessions, session_name)
         if not session_path.exists():
             raise FileNotFoundError('Session file [%s] was not found.' % session_path)
+        if self._session_cache is not None:
+            return self._session_cache.load(session_path)
+        return load_session_file(session_path)
 
-        with open(session_path, 'r') as file:
-            print('Restoring session located [%s] ' % session_path)
-            namespace_objs: XSessionConfig = json.load(file, object_hook=lambda d: Namespace(**d))
-            # Note: os.fork() does not support MS Windows
-            pid = os.fork()
-            # Launch APPs in the child process
-            if pid == 0:
-                x_session_config_objects: List[XSessionConfigObject] = namespace_objs.x_session_config_objects
-                # Remove duplicates according to pid
-                session_details_dict = {x_session_config.pid: x_session_config
-                                        for x_session_config in x_session_config_objects}
-                x_session_config_objects = list(session_details_dict.values())
+    def restore_session(self, session_name, restoring_interval=0.5, fork=True, workspace_first=False,
+                        check_memory=True, min_restoring_interval=None, max_restoring_interval=None,
+                        prefetch=False, stage_priorities: List[str]=None):
+        """
+        :param restoring_interval: the interval between launching apps at normal loads,
+                                   see LaunchPacer for how it is adapted to the load of the system
+        :param min_restoring_interval: the lower bound of the interval, LaunchPacing.MIN_INTERVAL if None
+        :param max_restoring_interval: the upper bound of the interval, LaunchPacing.MAX_INTERVAL if None
+        :param prefetch: read the executables and libraries of apps into the page cache before launching them
+        :param stage_priorities: launch the apps on the current workspace and the apps matching these
+                                 at normal priority first, and the others at low priority. Not staged if None.
+        :param fork: restore in a detached process and return immediately
+        :param workspace_first: restore the apps on the current workspace first, see _launch_batches()
+        :param check_memory: hold launching apps until there is enough memory, see AdmissionController
+        """
+        with self._profiler.span('load session'):
+            namespace_objs: XSessionConfig = self.load_session(session_name)
+        logger.info('Restoring session located [%s] ', Path(self.base_location_of_sessions, session_name))
+        # Note: os.fork() does not support MS Windows
+        pid = self._fork_detached() if fork else 0
+        # Launch APPs in the child process
+        if pid == 0:
+            with self._record_metrics('restore') as metrics:
+                saved_windows: List[XSessionConfigObject] = namespace_objs.x_session_config_objects
                 if self.session_filters:
                     for session_filter in self.session_filters:
                         if session_filter is None:
                             continue
-                        x_session_config_objects[:] = session_filter(x_session_config_objects)
+                        saved_windows = session_filter(saved_windows)
+
+                # Remove duplicates according to pid
+                session_details_dict = {x_session_config.pid: x_session_config
+                                        for x_session_config in saved_windows}
+                x_session_config_objects = list(session_details_dict.values())
 
                 if len(x_session_config_objects) == 0:
-                    print('No application to restore.')
-                    print('Done!')
+                    logger.info('No application to restore.')
+                    logger.info('Done!')
                     return
 
-                def restore_sessions_async(_x_session_config_objects_copy: List[XSessionConfigObject]):
+                def restore_sessions_async(_x_session_config_objects_copy: List[XSessionConfigObject],
+                                           _saved_windows_of_apps: Dict[int, List[XSessionConfigObject]]):
                     t = threading.Thread(target=self._restore_sessions,
                                          args=(session_name,
                                                restoring_interval,
                                                _x_session_config_objects_copy,
+                                               _saved_windows_of_apps,
+                                               workspace_first,
                                                ))
                     t.start()
                     return t
 
                 x_session_config_objects_copy = copy.deepcopy(x_session_config_objects)
+                # The saved windows of each app to be restored, keyed by the xid of the app's copy
+                saved_windows_of_apps: Dict[int, List[XSessionConfigObject]] = {}
                 for x_session_config_object in x_session_config_objects_copy:
+                    saved_windows_of_apps[x_session_config_object.window_id_the_int_type] = \
+                        [w for w in saved_windows if w.pid == x_session_config_object.pid]
                     x_session_config_object.pid = None
 
+                self._app_profiles = AppProfileStore.load(self.app_profiles_path) if self.app_profiles_path \
+                    else AppProfileStore()
+                self._restore_report = RestoreReport(session_name)
+                apps_total = len(x_session_config_objects_copy)
+                self._restore_job = RestoreJob(session_name,
+                                               lambda: self._get_restore_progress(apps_total, saved_windows_of_apps),
+                                               self._cancel_restore,
+                                               self.restore_jobs_path)
+                self._launch_pacer = LaunchPacer(min_restoring_interval,
+                                                 max_restoring_interval,
+                                                 lambda: self._count_launches_in_flight(saved_windows_of_apps))
+                if check_memory:
+                    self._admission_controller = AdmissionController(getattr(namespace_objs, 'total_memory', None))
+
                 max_desktop_number = self._get_max_desktop_number(x_session_config_objects)
-                with wnck_utils.create_enough_workspaces(max_desktop_number):
+                with self._restore_job, self._desktop.create_enough_workspaces(max_desktop_number):
                     x_session_config_objects_copy.sort(key=attrgetter('memory_percent'), reverse=True)
-                    self.restore_app_countdown = len(x_session_config_objects_copy)
-                    restore_thread = restore_sessions_async(x_session_config_objects_copy)
-                    restore_thread.join()
-                    self._move_windows_while_restore(session_name, x_session_config_objects_copy)
-                print('Done!')
-
-    def _move_windows_while_restore(self, session_name, x_session_config_objects_copy: List[XSessionConfigObject]):
-        retry_count_down = self.calculate_retry_count_down(x_session_config_objects_copy)
-        # Retry some minutes
-        while retry_count_down > 0:
-            # handle pending events
-            while Gtk.events_pending():
-                Gtk.main_iteration()
-
-            retry_count_down -= 1
-
-            self._suppress_log_if_already_in_workspace = True
-            self.move_window(session_name)
-
-            with self.instance_lock:
-                if self.restore_app_countdown <= 0:
-                    break
-            
-    def calculate_retry_count_down(self, _x_session_config_objects_copy: List[XSessionConfigObject]) -> int:
-        retry_count_down = 15
-        if not _x_session_config_objects_copy:
-            retry_count_down = 1
-        else:
-            max_windows_count_app = max(_x_session_config_objects_copy, key=lambda x: x.windows_count 
-                                                    if hasattr(x, 'windows_count') else -1)
-            if hasattr(max_windows_count_app, 'windows_count') \
-                    and max_windows_count_app.windows_count == 1:
-                retry_count_down = 5
-        if self.verbose:
-            print('Calculated retry_count_down: %d' % retry_count_down)
-        return retry_count_down
-        
+                    if stage_priorities is not None:
+                        self._priority_stager = self._create_priority_stager(x_session_config_objects_copy,
+                                                                             saved_windows_of_apps,
+                                                                             stage_priorities)
+                        # Launch the apps of high priority first
+                        x_session_config_objects_copy.sort(
+                            key=lambda app: not self._priority_stager.is_high_priority(app))
+                    prefetcher = self._prefetch_apps(x_session_config_objects_copy) if prefetch else None
+                    with self._profiler.span('launch apps'):
+                        restore_thread = restore_sessions_async(x_session_config_objects_copy, saved_windows_of_apps)
+                        restore_thread.join()
+                    if prefetcher:
+                        prefetcher.shutdown()
+                    self._restore_job.transit(JobState.PLACING)
+                    with self._profiler.span('wait for windows'):
+                        self._move_windows_while_restore()
+                    self._restore_job.transit(JobState.DONE)
+                if self._priority_stager is not None:
+                    self._priority_stager.restore_all()
+                self._record_startup_latencies(saved_windows_of_apps)
+                self._write_restore_report(saved_windows_of_apps)
+                self._record_restore_metrics(metrics)
+                logger.info('Done!')
+
+    @staticmethod
+    def _fork_detached() -> int:
+        """
+        Fork a process which is not a child of this one, so that it is reaped by init once it exits, rather than
+        lingering as a zombie if this process lives on.
+
+        :return: 0 in the process forked, otherwise the pid of the intermediate process, which has exited
+        """
+        pid = os.fork()
+        if pid == 0:
+            if os.fork() != 0:
+                os._exit(0)
+            return 0
+        os.waitpid(pid, 0)
+        return pid
+
+    def _get_restore_progress(self,
+                              apps_total: int,
+                              saved_windows_of_apps: Dict[int, List[XSessionConfigObject]]) -> Dict[str, Any]:
+        """
+        Called by the thread of the restore job while restoring.
+        """
+        timelines = list(self._restore_report.apps)
+        statuses = [self.window_restore_states.get(saved_window.window_id_the_int_type)
+                    for saved_windows in list(saved_windows_of_apps.values())
+                    for saved_window in saved_windows]
+        current_app = timelines[-1] if timelines else None
+        return {'apps_total': apps_total,
+                'apps_launched': sum(1 for timeline in timelines if SPAWNED in timeline.events),
+                'apps_skipped': sum(1 for timeline in timelines
+                                    if timeline.outcome in (Outcome.ALREADY_RUNNING, Outcome.REJECTED,
+                                                            Outcome.CANCELLED)),
+                'apps_failed': sum(1 for timeline in timelines if timeline.outcome == Outcome.FAILED),
+                'apps_pending': apps_total - len(timelines),
+                'current_app': current_app.app_name if current_app is not None and current_app.outcome is None
+                               and SPAWNED not in current_app.events else None,
+                'windows_total': len(statuses),
+                'windows_placed': sum(1 for status in statuses
+                                      if status is not None and status.state == WindowRestoreState.DONE),
+                'windows_failed': sum(1 for status in statuses
+                                      if status is not None and status.state == WindowRestoreState.FAILED)}
+
+    def _cancel_restore(self):
+        """
+        Launch no more apps, and give up placing the windows not placed yet.
+        """
+        move_queue = self._move_queue
+        if move_queue is not None:
+            move_queue.cancel()
+
+    def _is_restore_cancelled(self) -> bool:
+        return self._restore_job is not None and self._restore_job.is_cancelled()
+
+    def _create_priority_stager(self,
+                                apps: List[XSessionConfigObject],
+                                saved_windows_of_apps: Dict[int, List[XSessionConfigObject]],
+                                high_priority_apps: List[str]) -> PriorityStager:
+        """
+        :param high_priority_apps: the apps of high priority besides the ones on the current workspace,
+                                   matched like -i/--include
+        """
+        current_workspace = self._desktop.get_active_workspace_number()
+        high_priority_matcher = SessionMatcher(high_priority_apps)
+        high_priority = []
+        for app in apps:
+            saved_windows = saved_windows_of_apps.get(app.window_id_the_int_type) or [app]
+            if any(int(saved_window.desktop_number) == current_workspace for saved_window in saved_windows) \
+                    or high_priority_matcher.matches(app):
+                high_priority.append(app)
+        logger.debug('Apps of high priority: %s', ', '.join(app.app_name for app in high_priority))
+        return PriorityStager(high_priority)
+
+    def _prefetch_apps(self, apps: List[XSessionConfigObject]) -> Prefetcher:
+        """
+        Read the files of apps into the page cache in the background, in the order of launching.
+        """
+        prefetcher = Prefetcher(Prefetch.MAX_WORKERS, Prefetch.LDD_TIMEOUT)
+        for app in apps:
+            # Apps without a command line are launched by their .desktop files
+            if len(app.cmd) > 0 and tuple(app.cmd) not in self._prefetched_cmds:
+                prefetcher.prefetch(app.cmd)
+        return prefetcher
+
+    def _move_windows_while_restore(self):
+        """
+        Wait until all windows submitted to the move queue are placed or timed out.
+        """
+        for future in as_completed(self._move_futures):
+            if future.cancelled():
+                continue
+            try:
+                status: WindowRestoreStatus = future.result()
+            except Exception as e:
+                logger.warning('%s', e)
+                continue
+            if status.state == WindowRestoreState.FAILED:
+                logger.warning('Failed to move window of %s: %s', status.saved_window.app_name, status.reason)
+
+        # Not created if no window was submitted, such as every app failed to launch
+        if self._move_queue is not None:
+            self._move_queue.shutdown()
+        if self._is_restore_cancelled():
+            self.window_restore_states.fail_unfinished('Cancelled')
+        self._finish_window_restore_states()
+
+    def _record_startup_latencies(self, saved_windows_of_apps: Dict[int, List[XSessionConfigObject]]):
+        """
+        Record how long each app launched took to map its first window and to get its windows placed,
+        which paces launching and placing its windows next time.
+        """
+        for xid, launched_at in self._launched_at.items():
+            statuses = [self.window_restore_states.get(saved_window.window_id_the_int_type)
+                        for saved_window in saved_windows_of_apps.get(xid, [])]
+            statuses = [status for status in statuses if status is not None]
+            if len(statuses) == 0:
+                continue
+            matched_at = [status.matched_at for status in statuses if status.matched_at is not None]
+            sample = StartupSample(first_window=min(matched_at) - launched_at if matched_at else None,
+                                   placed=max(status.updated_at for status in statuses) - launched_at,
+                                   timed_out=any(status.state == WindowRestoreState.FAILED for status in statuses))
+            app_name = statuses[0].saved_window.app_name
+            self._app_profiles.record(app_name, sample)
+            if sample.first_window is not None:
+                self._profiler.add('first window', launched_at, launched_at + sample.first_window, app_name)
+            self._profiler.add('windows placed', launched_at, launched_at + sample.placed, app_name)
+        try:
+            self._app_profiles.save()
+        except OSError as e:
+            logger.warning('Failed to save the app profiles: %s', e)
+
+    def _write_restore_report(self, saved_windows_of_apps: Dict[int, List[XSessionConfigObject]]):
+        """
+        Complete the timelines of the apps by the restoring progress of their windows, and keep the report.
+        """
+        for xid, timeline in self._app_timelines.items():
+            statuses = [self.window_restore_states.get(saved_window.window_id_the_int_type)
+                        for saved_window in saved_windows_of_apps.get(xid, [])]
+            timeline.add_windows([status for status in statuses if status is not None])
+            if timeline.outcome is None:
+                timeline.outcome = Outcome.RESTORED
+        if self.restore_reports_path is None:
+            return
+        try:
+            self._restore_report.write(self.restore_reports_path)
+        except OSError as e:
+            logger.warning('Failed to save the restore report: %s', e)
+
+    def _record_restore_metrics(self, metrics: Metrics):
+        for timeline in self._app_timelines.values():
+            metrics.inc('xsm_restored_apps_total', outcome=timeline.outcome)
+            if SPAWNED in timeline.events and STATE_APPLIED in timeline.events:
+                metrics.observe('xsm_window_placement_seconds',
+                                timeline.events[STATE_APPLIED] - timeline.events[SPAWNED])
+
+    def _count_launches_in_flight(self, saved_windows_of_apps: Dict[int, List[XSessionConfigObject]]) -> int:
+        """
+        :return: the number of apps launched which have not mapped a window yet, and are still waited for
+        """
+        launches_in_flight = 0
+        for xid in list(self._launched_at):
+            statuses = [self.window_restore_states.get(saved_window.window_id_the_int_type)
+                        for saved_window in saved_windows_of_apps.get(xid, [])]
+            if any(status is not None and (status.matched_at is not None or status.is_finished())
+                   for status in statuses):
+                continue
+            launches_in_flight += 1
+        return launches_in_flight
+
+    def _wait_before_next_launch(self, app: XSessionConfigObject, restoring_interval: float):
+        # Launchers handing over to a running instance exit right away
+        self._desktop.reap_children()
+        if self._is_restore_cancelled():
+            return
+        launch_interval = self.calculate_launch_interval(app, restoring_interval)
+        with self._profiler.span('launch interval', app.app_name):
+            if self._launch_pacer is None:
+                sleep(launch_interval)
+            else:
+                self._launch_pacer.wait(launch_interval)
+
+    def calculate_launch_interval(self, app: XSessionConfigObject, restoring_interval: float) -> float:
+        """
+        How long to wait before launching the next app at normal loads, in seconds.
+        """
+        if self._app_profiles is None:
+            return restoring_interval
+        return self._app_profiles.get(app.app_name).get_launch_interval(restoring_interval)
+
+    def calculate_move_timeout(self, saved_window: XSessionConfigObject) -> float:
+        """
+        How long to wait for a window of an app to be placed, in seconds.
+
+        Learned from how long the app took in previous restores. Otherwise, an app with multiple windows usually
+        maps its windows one by one, so give it more time.
+        """
+        move_timeout = RetryPolicies.MOVE_WINDOW.deadline
+        if hasattr(saved_window, 'windows_count') and saved_window.windows_count > 1:
+            move_timeout *= 3
+        if self._app_profiles is not None:
+            move_timeout = self._app_profiles.get(saved_window.app_name).get_move_timeout(move_timeout)
+        logger.debug('Calculated move_timeout of %s: %d', saved_window.app_name, move_timeout)
+        return move_timeout
+
+    def _place_windows_async(self, saved_windows: List[XSessionConfigObject], pid: int = None) -> List[Future]:
+        futures = [self._move_window_async(saved_window, pid) for saved_window in saved_windows]
+        self._move_futures.extend(futures)
+        return futures
+
     def _restore_sessions(self,
                           session_name,
                           restoring_interval,
-                          _x_session_config_objects_copy: List[XSessionConfigObject]):
+                          _x_session_config_objects_copy: List[XSessionConfigObject],
+                          saved_windows_of_apps: Dict[int, List[XSessionConfigObject]],
+                          workspace_first: bool=False):
         self._suppress_log_if_already_in_workspace = True
         self._restore_geometry_or_not = True
 
         running_restores = []
         failed_restores = []
-        succeeded_restores = []
+        # Activating an app which runs already only raises its window, so an app saved as many instances is spawned
+        instances_of_executables = collections.Counter(app.cmd[0] for app in _x_session_config_objects_copy
+                                                       if len(app.cmd) > 0)
         running_session: XSessionConfig = self.get_session_details(remove_duplicates_by_pid=False, 
                                                                    session_filters=self.session_filters);
-        for index, namespace_obj in enumerate(_x_session_config_objects_copy):
-            cmd: list = namespace_obj.cmd
-            app_name: str = namespace_obj.app_name
-            try:
-                is_running = False
-                for running_window in running_session.x_session_config_objects:
-                    if self._is_same_app(running_window, namespace_obj) \
-                            and self._is_same_cmd(running_window.cmd, cmd):
-                        print('%s is running in Workspace %d, skip...' % (app_name, running_window.desktop_number))
-                        namespace_obj.pid = running_window.pid
-                        running_restores.append(index)
-                        is_running = True
-                        with self.instance_lock:
-                            self.restore_app_countdown -= 1
-                        break
-                if is_running:
+        launch_batches = self._launch_batches(_x_session_config_objects_copy, saved_windows_of_apps, workspace_first)
+        for batch_number, apps in enumerate(launch_batches):
+            if batch_number > 0:
+                # The user may have started some apps while they were deferred
+                with self._x_lock:
+                    running_session = self.get_session_details(
+                        remove_duplicates_by_pid=False,
+                        session_filters=self.session_filters,
+                        previous_windows={running_window.window_id_the_int_type: running_window
+                                          for running_window in running_session.x_session_config_objects},
+                        changed_window_ids=set())
+            for namespace_obj in apps:
+                cmd: list = namespace_obj.cmd
+                app_name: str = namespace_obj.app_name
+                timeline = self._restore_report.add_app(app_name, cmd)
+                self._app_timelines[namespace_obj.window_id_the_int_type] = timeline
+                if self._is_restore_cancelled():
+                    timeline.fail(Outcome.CANCELLED, 'Cancelled before being launched')
+                    failed_restores.append(id(namespace_obj))
                     continue
-                
-                print('Restoring application:              [%s]' % app_name)
-                app_info = gio_utils.GDesktopAppInfo()
-                if len(cmd) == 0:
-                    def launched_callback(cb_data):
-                        namespace_obj.pid = cb_data['pid']
-                    launched = app_info.launch_app(app_name, launched_callback)
-                    if not launched:
-                        print('Failure to restore the application named %s '
-                              'due to empty commandline [%s]'
-                              % (app_name, str(cmd))) 
-                    else:
-                        sleep(restoring_interval)
-                        if self.verbose:
-                            print('%s launched' % app_name)
-                    self.move_window(session_name)
-                    continue
-
-                launched = False
                 try:
-                    namespace_obj.cmd = [c for c in cmd if c != "--gapplication-service"]
-                    process = subprocess_utils.launch_app(namespace_obj.cmd)
-                    namespace_obj.pid = process.pid
-                    succeeded_restores.append(index)
-                    launched = True
-                except FileNotFoundError as fnfe:
-                    def launched_callback(cb_data):
-                        namespace_obj.pid = cb_data['pid']
-
-                    part_cmd = namespace_obj.cmd[0]
-                    # Check if this is a Snap application
-                    snapd = snapd_workaround.Snapd()
-                    is_snap_app, snap_app_name = snapd.is_snap_app(part_cmd)
-                    if is_snap_app:
-                        print('%s is a Snap app' % app_name)
-                        launched = snapd.launch_app([snap_app_name], launched_callback)
-
-                    if not launched:
-                        print('Searching %s ...' % app_name)
-                        launched = app_info.launch_app(app_name, launched_callback)
-
-                    if not launched:
-                        raise fnfe
-
-                if launched:
-                    if self.verbose:
-                        print('%s launched' % app_name)
-                    sleep(restoring_interval)
-                    if index == len(_x_session_config_objects_copy) - 1 \
-                            or index % 3 == 0: # move windows while every 3 apps launched
-                        self.move_window(session_name)
+                    is_running = False
+                    for running_window in running_session.x_session_config_objects:
+                        if self._is_same_app(running_window, namespace_obj) \
+                                and self._is_same_cmd(running_window.cmd, cmd):
+                            logger.info('%s is running in Workspace %d, skip...',
+                                        app_name, running_window.desktop_number)
+                            namespace_obj.pid = running_window.pid
+                            timeline.pid = running_window.pid
+                            timeline.outcome = Outcome.ALREADY_RUNNING
+                            running_restores.append(id(namespace_obj))
+                            is_running = True
+                            break
+                    if is_running:
+                        self._place_windows_async(saved_windows_of_apps[namespace_obj.window_id_the_int_type],
+                                                  namespace_obj.pid)
+                        continue
 
-            except Exception as e:
-                failed_restores.append(index)
-                print(traceback.format_exc())
-                print('Failure to restore the application named %s due to the previous error' % app_name)
+                    if self._admission_controller is not None:
+                        with self._profiler.span('wait for memory', app_name):
+                            admission = self._admission_controller.admit(namespace_obj)
+                        if admission != Admission.ADMITTED:
+                            logger.warning('Skip restoring %s: %s', app_name, admission.value)
+                            timeline.fail(Outcome.REJECTED, admission.value)
+                            failed_restores.append(id(namespace_obj))
+                            continue
+                
+                    logger.info('Restoring application:              [%s]', app_name)
+                    timeline.mark(STARTED)
+                    if len(cmd) == 0:
+                        def launched_callback(cb_data):
+                            namespace_obj.pid = cb_data['pid']
+                        resolved_at = time()
+                        with self._x_lock, self._profiler.span('launch', app_name):
+                            launched = self._get_desktop_app_info().launch_app(app_name, launched_callback)
+                        if not launched:
+                            logger.warning('Failure to restore the application named %s '
+                                           'due to empty commandline [%s]', app_name, cmd)
+                            timeline.fail(Outcome.FAILED, 'No .desktop file found for the empty command line')
+                        else:
+                            move_futures = self._place_windows_async(
+                                saved_windows_of_apps[namespace_obj.window_id_the_int_type], namespace_obj.pid)
+                            self._app_launched(namespace_obj, move_futures, resolved_at)
+                            self._wait_before_next_launch(namespace_obj, restoring_interval)
+                            logger.debug('%s launched', app_name)
+                        continue
 
-        _x_session_config_objects_copy[:] = [o for index, o in enumerate(_x_session_config_objects_copy)
-                                             if index not in failed_restores + running_restores]
+                    # Updated before each way of launching it is tried
+                    resolved_at = time()
+                    pid = None
+                    if instances_of_executables[cmd[0]] == 1:
+                        with self._profiler.span('launch', app_name):
+                            pid = self._desktop.activate_app(cmd, self._get_dbus_app_id)
+                    if pid is not None:
+                        logger.debug('%s activated via D-Bus', app_name)
+                        namespace_obj.pid = pid
+                        move_futures = self._place_windows_async(
+                            saved_windows_of_apps[namespace_obj.window_id_the_int_type], namespace_obj.pid)
+                        self._app_launched(namespace_obj, move_futures, resolved_at)
+                        self._wait_before_next_launch(namespace_obj, restoring_interval)
+                        continue
 
-    def close_windows(self, including_apps_with_multiple_windows: bool = False):
-        sessions: List[XSessionConfigObject] = \
-            self.get_session_details(remove_duplicates_by_pid=False,
-                                     session_filters=self.session_filters).x_session_config_objects
+                    launched = False
+                    spawn_priority = self._priority_stager.get_spawn_priority(namespace_obj) \
+                        if self._priority_stager is not None else {}
+                    spawned = False
+                    try:
+                        namespace_obj.cmd = [c for c in cmd if c != "--gapplication-service"]
+                        resolved_at = time()
+                        with self._profiler.span('launch', app_name):
+                            process = self._desktop.launch_app(namespace_obj.cmd, **spawn_priority)
+                        namespace_obj.pid = process.pid
+                        launched = True
+                        spawned = True
+                    except FileNotFoundError as fnfe:
+                        def launched_callback(cb_data):
+                            namespace_obj.pid = cb_data['pid']
+
+                        part_cmd = namespace_obj.cmd[0]
+                        launch_target = self._launch_targets.get(part_cmd)
+                        # Check if this is a Snap application
+                        if launch_target is not None:
+                            is_snap_app = launch_target.snap_app_name is not None
+                            snap_app_name = launch_target.snap_app_name
+                        else:
+                            is_snap_app, snap_app_name = snapd_workaround.Snapd.is_snap_app(part_cmd)
+                        if is_snap_app:
+                            logger.info('%s is a Snap app', app_name)
+                            resolved_at = time()
+                            with self._x_lock, self._profiler.span('launch', app_name):
+                                launched = self._get_snapd().launch_app([snap_app_name], launched_callback)
+
+                        if not launched:
+                            logger.info('Searching %s ...', app_name)
+                            resolved_at = time()
+                            with self._x_lock, self._profiler.span('launch', app_name):
+                                launched = self._get_desktop_app_info().launch_app(app_name, launched_callback)
+
+                        if not launched:
+                            raise fnfe
+
+                    if launched:
+                        logger.debug('%s launched', app_name)
+                        move_futures = self._place_windows_async(
+                            saved_windows_of_apps[namespace_obj.window_id_the_int_type], namespace_obj.pid)
+                        self._app_launched(namespace_obj, move_futures, resolved_at,
+                                           spawned_at_low_priority=spawned and len(spawn_priority) > 0)
+                        self._wait_before_next_launch(namespace_obj, restoring_interval)
+
+                except Exception as e:
+                    failed_restores.append(id(namespace_obj))
+                    timeline.fail(Outcome.FAILED, str(e) or type(e).__name__)
+                    logger.exception('Failure to restore the application named %s', app_name)
+                finally:
+                    if self._priority_stager is not None \
+                            and namespace_obj.window_id_the_int_type not in self._launched_at:
+                        # Not launched, do not wait for it
+                        self._priority_stager.done(namespace_obj)
+
+        _x_session_config_objects_copy[:] = [o for o in _x_session_config_objects_copy
+                                             if id(o) not in failed_restores + running_restores]
+        if self._admission_controller is not None:
+            self._admission_controller.print_rejected_apps(session_name)
+
+    def _app_launched(self,
+                      app: XSessionConfigObject,
+                      move_futures: List[Future],
+                      resolved_at: float,
+                      spawned_at_low_priority: bool=False):
+        """
+        :param move_futures: the futures placing the windows of the app
+        :param resolved_at: when the launch which succeeded was started, after the ones which failed if any
+        :param spawned_at_low_priority: see PriorityStager.launched()
+        """
+        self._launched_at[app.window_id_the_int_type] = time()
+        timeline = self._app_timelines.get(app.window_id_the_int_type)
+        if timeline is not None:
+            timeline.mark(RESOLVED, resolved_at)
+            timeline.mark(SPAWNED, self._launched_at[app.window_id_the_int_type])
+            timeline.pid = app.pid
+        if self._admission_controller is not None:
+            self._admission_controller.launched(app)
+        if self._priority_stager is not None:
+            self._priority_stager.launched(app, move_futures, spawned_at_low_priority)
+
+    def _launch_batches(self,
+                        apps: List[XSessionConfigObject],
+                        saved_windows_of_apps: Dict[int, List[XSessionConfigObject]],
+                        workspace_first: bool) -> Iterator[List[XSessionConfigObject]]:
+        """
+        Yield the apps to launch batch by batch.
 
-        if len(sessions) == 0:
-            print('No application to close.')
+        If workspace_first, yield the apps on the current workspace first. Defer the ones on other workspaces
+        until the windows launched are placed and the system is idle, then yield them workspace by workspace
+        starting with the nearest one. If the user switches to a workspace meanwhile, yield its apps right away.
+        Otherwise, yield all apps at once.
+        """
+        if not workspace_first:
+            yield apps
             return
 
-        sessions.sort(key=attrgetter('pid'))
-        for pid, group_by_pid in groupby(sessions, key=attrgetter('pid')):
-            a_process_with_many_windows: List[XSessionConfigObject] = list(group_by_pid)
-            if len(a_process_with_many_windows) > 1:
-                # Do not close the app with more than one windows
-                if not including_apps_with_multiple_windows:
-                    continue
+        with self._x_lock:
+            current_workspace = self._desktop.get_active_workspace_number()
+            launch_plan = LaunchPlan(apps, saved_windows_of_apps, current_workspace)
+            handler_id = self._desktop.connect_active_workspace_changed(launch_plan.request_workspace)
+        try:
+            workspace = current_workspace
+            while workspace is not None:
+                apps_of_workspace = launch_plan.take_apps(workspace)
+                if len(apps_of_workspace) > 0:
+                    logger.info('Restoring %d application(s) in Workspace %d', len(apps_of_workspace), workspace)
+                    yield apps_of_workspace
+                if launch_plan.is_empty():
+                    break
+                with self._profiler.span('defer workspaces'):
+                    workspace = self._wait_for_idle_or_workspace_switch(launch_plan)
+        finally:
+            with self._x_lock:
+                self._desktop.disconnect(handler_id)
 
-                a_process_with_many_windows.sort(key=attrgetter('window_id'), reverse=True)
-                # Close one application's windows one by one, starting with the most top one
-                for session in a_process_with_many_windows:
-                    print('Closing %s(%s %s).' % (session.app_name, session.window_id, session.pid))
-                    wnck_utils.close_window_gracefully_async(session.window_id_the_int_type)
+    def _wait_for_idle_or_workspace_switch(self, launch_plan: LaunchPlan) -> int:
+        """
+        :return: the workspace whose apps are to be launched next
+        """
+        deferred_at = time()
+        idle_since = None
+        # The first call returns a meaningless 0.0, see psutil.cpu_percent()
+        self._desktop.get_cpu_percent()
+        while True:
+            sleep(WorkspaceFirstRestore.POLL_INTERVAL)
+            with self._x_lock:
+                # Emit active-workspace-changed if the user switched to another workspace
+                self._desktop.refresh_screen()
+            if self._is_restore_cancelled():
+                return launch_plan.next_workspace()
+            requested_workspace = launch_plan.take_requested_workspace()
+            if requested_workspace is not None:
+                logger.info('Switched to Workspace %d', requested_workspace)
+                return requested_workspace
+
+            now = time()
+            if all(future.done() for future in self._move_futures) \
+                    and self._desktop.get_cpu_percent() < WorkspaceFirstRestore.IDLE_CPU_PERCENT:
+                if idle_since is None:
+                    idle_since = now
             else:
-                session = a_process_with_many_windows[0]
-                print('Closing %s(%s %s).' % (session.app_name, session.window_id, session.pid))
-                wnck_utils.close_window_gracefully_async(session.window_id_the_int_type)
+                idle_since = None
+            if idle_since is not None and now - idle_since >= WorkspaceFirstRestore.IDLE_TIME:
+                return launch_plan.next_workspace()
+            if now - deferred_at >= WorkspaceFirstRestore.MAX_DEFERRAL:
+                logger.debug('The system is still busy after %ds, restore the next workspace anyway',
+                             WorkspaceFirstRestore.MAX_DEFERRAL)
+                return launch_plan.next_workspace()
+
+    def _get_desktop_app_info(self) -> 'gio_utils.GDesktopAppInfo':
+        # Scanning .desktop files is slow, do it once
+        if self._desktop_app_info is None:
+            self._desktop_app_info = gio_utils.GDesktopAppInfo()
+        return self._desktop_app_info
+
+    def _get_dbus_app_id(self, executable: str) -> str:
+        launch_target = self._launch_targets.get(executable)
+        if launch_target is not None:
+            # Resolved ahead, the .desktop files are not indexed for it
+            return launch_target.dbus_app_id
+        return self._get_desktop_app_info().get_dbus_app_id(executable)
+
+    def _get_snapd(self) -> snapd_workaround.Snapd:
+        if self._snapd is None:
+            self._snapd = snapd_workaround.Snapd()
+        return self._snapd
+
+    def close_windows(self,
+                      including_apps_with_multiple_windows: bool = False,
+                      batch_size: int = 10,
+                      timeout: float = 10):
+        """
+        Close windows gracefully, and confirm that they are closed.
+
+        :param batch_size: the max number of windows being closed at the same time
+        :param timeout: how long to wait for a window to be closed, in seconds
+        :return: the windows which are still open, such as the ones blocked on an "unsaved changes" dialog
+        """
+        with self._record_metrics('close') as metrics:
+            sessions: List[XSessionConfigObject] = \
+                self.get_session_details(remove_duplicates_by_pid=False,
+                                         session_filters=self.session_filters).x_session_config_objects
+
+            if len(sessions) == 0:
+                logger.info('No application to close.')
+                return []
+
+            windows_to_be_closed: List[XSessionConfigObject] = []
+            sessions.sort(key=attrgetter('pid'))
+            for pid, group_by_pid in groupby(sessions, key=attrgetter('pid')):
+                a_process_with_many_windows: List[XSessionConfigObject] = list(group_by_pid)
+                if len(a_process_with_many_windows) > 1:
+                    # Do not close the app with more than one windows
+                    if not including_apps_with_multiple_windows:
+                        continue
 
-            # Wait some time, in case of freezing the entire system
-            sleep(0.25)
+                    a_process_with_many_windows.sort(key=attrgetter('window_id'), reverse=True)
+                    # Close one application's windows one by one, starting with the most top one
+                    windows_to_be_closed.extend(a_process_with_many_windows)
+                else:
+                    windows_to_be_closed.append(a_process_with_many_windows[0])
+
+            with self._profiler.span('close windows'):
+                windows_still_open = self._close_windows_and_confirm(windows_to_be_closed, batch_size, timeout)
+
+            logger.info('%d window(s) closed.', len(windows_to_be_closed) - len(windows_still_open))
+            metrics.inc('xsm_windows_closed_total', len(windows_to_be_closed) - len(windows_still_open))
+            if len(windows_still_open) > 0:
+                metrics.inc('xsm_windows_still_open_total', len(windows_still_open))
+                logger.warning('%d window(s) still open, maybe waiting for your confirmation:',
+                               len(windows_still_open))
+                for session in windows_still_open:
+                    logger.info('    %s(%s %s): %s',
+                                session.app_name, session.window_id, session.pid, session.window_title)
+            return windows_still_open
+
+    def _close_windows_and_confirm(self,
+                                   windows: List[XSessionConfigObject],
+                                   batch_size: int,
+                                   timeout: float) -> List[XSessionConfigObject]:
+        """
+        Send close requests in batches, confirm them via the window-closed signal of Wnck or by checking whether
+        the windows still exist.
+
+        :return: the windows which are not closed before their deadlines
+        """
+        closed_window_ids = set()
+        handler_id = self._desktop.connect_window_closed(closed_window_ids.add)
+        pending_windows = collections.deque(windows)
+        # Windows being closed and their deadlines, keyed by xid
+        closing_windows: Dict[int, Tuple[XSessionConfigObject, float]] = {}
+        windows_still_open: List[XSessionConfigObject] = []
+
+        def any_window_finished() -> bool:
+            existing_window_ids = self._desktop.get_existing_window_ids(closing_windows.keys())
+            now = time()
+            finished = False
+            for xid, (session, deadline) in list(closing_windows.items()):
+                if xid in closed_window_ids or xid not in existing_window_ids:
+                    del closing_windows[xid]
+                    finished = True
+                elif now >= deadline:
+                    del closing_windows[xid]
+                    windows_still_open.append(session)
+                    finished = True
+            return finished
+
+        try:
+            while len(pending_windows) > 0 or len(closing_windows) > 0:
+                if len(pending_windows) > 0 and len(closing_windows) < batch_size:
+                    self._desktop.refresh_screen()
+                while len(pending_windows) > 0 and len(closing_windows) < batch_size:
+                    session = pending_windows.popleft()
+                    logger.info('Closing %s(%s %s).', session.app_name, session.window_id, session.pid)
+                    self._desktop.close_window_gracefully_async(session.window_id_the_int_type, refresh=False)
+                    closing_windows[session.window_id_the_int_type] = (session, time() + timeout)
+
+                earliest_deadline = min(deadline for _, deadline in closing_windows.values())
+                RetryPolicies.WAIT_FOR_CLOSING \
+                    .with_options(deadline=max(earliest_deadline - time(), 0)) \
+                    .call(any_window_finished)
+                # In case the deadline is reached right after the last check
+                any_window_finished()
+        finally:
+            self._desktop.disconnect(handler_id)
+
+        return windows_still_open
 
     def move_window(self, session_name):
-        session_path = Path(self.base_location_of_sessions, session_name)
-        if not session_path.exists():
-            raise FileNotFoundError('Session file [%s] was not found.' % session_path)
+        with self._record_metrics('move'):
+            self._move_windows_in_session(session_name)
+            self._finish_window_restore_states()
 
-        with open(session_path, 'r') as file:
-            namespace_objs: XSessionConfig = json.load(file, object_hook=lambda d: Namespace(**d))
+    def _move_windows_in_session(self, session_name):
+        with self._profiler.span('load session'):
+            namespace_objs: XSessionConfig = self.load_session(session_name)
 
-        x_session_config_objects: List[XSessionConfigObject] = namespace_objs.x_session_config_objects
-        x_session_config_objects.sort(key=attrgetter('desktop_number'))
+        x_session_config_objects: List[XSessionConfigObject] = sorted(namespace_objs.x_session_config_objects,
+                                                                      key=attrgetter('desktop_number'))
 
         if self.session_filters:
             for session_filter in self.session_filters:
                 if session_filter is None:
                     continue
-                x_session_config_objects[:] = session_filter(x_session_config_objects)
+                x_session_config_objects = session_filter(x_session_config_objects)
 
         if len(x_session_config_objects) == 0:
-            print('No application to move.')
+            logger.info('No application to move.')
             return
 
         max_desktop_number = self._get_max_desktop_number(x_session_config_objects)
-        with wnck_utils.create_enough_workspaces(max_desktop_number):
-            for namespace_obj in x_session_config_objects:
-                try:
-                    self._move_window(namespace_obj, need_retry=False)
-                except:  # Catch all exceptions to be able to restore other apps
-                    import traceback
-                    print(traceback.format_exc())
+        with self._desktop.create_enough_workspaces(max_desktop_number):
+            try:
+                move_plan = self._plan_moves(x_session_config_objects)
+                self._execute_move_plan(move_plan)
+            except Exception:  # Catch all exceptions to be able to restore other apps
+                logger.exception('Failed to move the windows')
 
     def _get_max_desktop_number(self, x_session_config_objects):
         return max([x_session_config_object.desktop_number
@@ -411,189 +1046,274 @@ class XSessionManager:
 
     def __getstate__(self):
         self_dict = self.__dict__.copy()
-        del self_dict['_moving_windows_pool']
+        # Threads and locks can not be pickled
+        del self_dict['_move_queue']
+        del self_dict['_move_futures']
+        del self_dict['_x_lock']
+        # Shared resources are not picklable, create them on demand
+        self_dict['_desktop_app_info'] = None
+        self_dict['_snapd'] = None
+        self_dict['_session_cache'] = None
+        self_dict['_process_snapshot_provider'] = None
+        self_dict['_app_profiles'] = None
+        self_dict['_restore_report'] = None
+        self_dict['_app_timelines'] = {}
+        self_dict['_restore_job'] = None
+        del self_dict['_profiler']
         return self_dict
 
     def __setstate__(self, state):
         self.__dict__.update(state)
+        self._move_queue = None
+        self._move_futures = []
+        self._x_lock = threading.RLock()
+        self._profiler = Profiler(enabled=False)
 
-    def _move_window_async(self, namespace_obj: XSessionConfigObject, pid: int = None):
-        self._moving_windows_pool.apply_async(
-            retry.Retry(6, 1).do_retry(self._move_window, (namespace_obj, pid)))
+    def _get_move_queue(self) -> MoveQueue:
+        if self._move_queue is None:
+            self._move_queue = MoveQueue(self._place_windows, self._retry_policy(RetryPolicies.MOVE_WINDOW))
+        return self._move_queue
 
-    def _move_window(self, saved_window: XSessionConfigObject, pid: int = None, need_retry=True):
-        try:
-            desktop_number = saved_window.desktop_number
-            if hasattr(saved_window, 'window_state'):
-                saved_window_state = saved_window.window_state
-            else:
-                saved_window_state = None
+    def _move_window_async(self, namespace_obj: XSessionConfigObject, pid: int = None) -> Future:
+        """
+        Place a saved window in the background, retry until it is placed or timed out.
 
-            pids = []
-            if pid:
-                pids = [c.pid for c in psutil.Process(pid).children()]
-                pids.append(pid)
+        :return: a future whose result is the WindowRestoreStatus of the saved window
+        """
+        return self._get_move_queue().submit(namespace_obj, pid, self.calculate_move_timeout(namespace_obj))
 
-            # Get process info according to command line
-            if len(pids) == 0:
-                cmd = saved_window.cmd
-                if len(cmd) <= 0:
-                    return
+    def _place_windows(self, move_jobs: List[MoveJob]) -> List[WindowRestoreStatus]:
+        with self._x_lock, self._profiler.span('place windows'):
+            move_plan = self._plan_moves([move_job.saved_window for move_job in move_jobs],
+                                         {move_job.saved_window.window_id_the_int_type: move_job.pid
+                                          for move_job in move_jobs})
+            self._execute_move_plan(move_plan)
+        return [self.window_restore_states.get_or_create(move_job.saved_window) for move_job in move_jobs]
 
-                for p in psutil.process_iter(attrs=['pid', 'cmdline']):
-                    try:
-                        cmdline: list = p.cmdline()
-                    except:
-                        # Eat all exceptions raised here, a process could exist a short while
-                        continue
+    def _retry_policy(self, retry_policy: RetryPolicy) -> RetryPolicy:
+        """
+        Log every retry if debugging.
+        """
+        if not logger.isEnabledFor(logging.DEBUG):
+            return retry_policy
 
-                    if len(cmdline) <= 0:
-                        continue
+        def on_attempt(attempt: Attempt):
+            if attempt.number > 1:
+                logger.debug('Retried %s times, took %.3fs', attempt.number - 1, attempt.duration)
+        return retry_policy.with_options(on_attempt=on_attempt)
 
-                    if self._is_same_cmd(cmdline, cmd):
-                        pids.append(p.pid)
+    def _take_process_snapshot(self) -> ProcessSnapshot:
+        if self._process_snapshot_provider is not None:
+            return self._process_snapshot_provider()
+        return self._desktop.take_process_snapshot()
 
-            if len(pids) == 0:
-                self._windows_can_not_be_moved.append(saved_window)
-                return
+    def _get_running_windows(self) -> List[XSessionConfigObject]:
+        running_windows = self._retry_policy(RetryPolicies.WMCTRL).call(self._desktop.get_running_windows)
 
-            no_need_to_move = True
-            moving_windows = []
-            try:
-                running_windows = wmctl_wrapper.get_running_windows()
-            except CalledProcessError:
-                # Try again. Handle the error of 'X Error of failed request:  BadWindow (invalid Window parameter)'
-                sleep(0.25)
-                running_windows = wmctl_wrapper.get_running_windows()
-
-            x_session_config: XSessionConfig = XSessionConfigObject.convert_wmctl_result_2_list(running_windows, False)
-            x_session_config_objects: List[XSessionConfigObject] = x_session_config.x_session_config_objects
-            x_session_config_objects.sort(key=attrgetter('desktop_number'))
-
-            # Used to calculate the number of windows of an app
-            counter: collections.Counter = collections.Counter(s.pid for s in x_session_config_objects)
-
-            for running_window in x_session_config_objects:
-                if running_window.pid in pids:
-                    no_need_to_compare_title = (counter[running_window.pid] == 1)
-                    if no_need_to_compare_title or\
-                            self._is_same_window(running_window,
-                                                 saved_window):
-                        if running_window.desktop_number == int(desktop_number):
-                            self._restore_geometry(saved_window)
-                            self.fix_window_state(saved_window_state, running_window.window_id_the_int_type)
-                            if not self._suppress_log_if_already_in_workspace:
-                                print('"%s" has already been in Workspace %s' % (running_window.window_title,
-                                                                                 desktop_number))
-                            # Record windows which are in it's Workspace already, so that we don't handle it later.
-                            if running_window.window_id not in self._moved_windowids_cache:
-                                self._moved_windowids_cache.append(running_window.window_id)
-                            continue
-                        moving_windows.append(running_window)
-                        no_need_to_move = False
-                else:
-                    no_need_to_move = False
-
-            if need_retry and len(moving_windows) == 0:
-                raise retry.NeedRetryException(saved_window)
-            elif no_need_to_move:
-                return
-
-            for running_window in moving_windows:
-                running_window_id = running_window.window_id
-                window_id_the_int_type = running_window.window_id_the_int_type
-                if running_window_id in self._moved_windowids_cache:
-                    self._restore_geometry(saved_window)
-                    self.fix_window_state(saved_window_state, window_id_the_int_type)
+        x_session_config: XSessionConfig = XSessionConfigObject.convert_wmctl_result_2_list(running_windows, False)
+        return x_session_config.x_session_config_objects
+
+    def _plan_moves(self, saved_windows: List[XSessionConfigObject], pids: Dict[int, int] = None) -> MovePlan:
+        """
+        Plan the outstanding work of saved windows according to their restoring states.
+
+        :param pids: the pids of the processes which the saved windows belong to, keyed by the xid of saved windows
+
+        Take one snapshot of running windows and processes, which is shared by all saved windows to be planned.
+        Windows which have been matched in previous passes keep their running windows.
+        """
+        with self._profiler.span('list windows'):
+            running_windows = self._get_running_windows()
+        with self._profiler.span('take process snapshot'):
+            process_snapshot = self._take_process_snapshot()
+        move_planner = MovePlanner(running_windows,
+                                   process_snapshot,
+                                   self.window_restore_states.claimed_window_ids(),
+                                   self._desktop.get_app_name)
+        move_plan = MovePlan()
+        for saved_window in saved_windows:
+            status = self.window_restore_states.get_or_create(saved_window)
+            if status.is_finished():
+                continue
+
+            if status.window_id is not None:
+                running_window = move_planner.find_running_window(status.window_id)
+                if running_window:
+                    move_plan.placements.append(WindowPlacement(saved_window, running_window))
                     continue
-                window_title = running_window.window_title
-                if string_utils.empty_string(window_title):
-                    window_title = wnck_utils.get_app_name(window_id_the_int_type)
-                print('Moving window to desktop:           [%s : %s]' % (window_title, desktop_number))
-                # wmctl_wrapper.move_window_to(running_window_id, str(desktop_number))
-                is_sticky = wnck_utils.is_sticky(window_id_the_int_type)
-                wnck_utils.move_window_to(window_id_the_int_type, desktop_number)
-                # Wait some time for processing event completely, no guarantee though
-                sleep(0.25)
-
-                self._moved_windowids_cache.append(running_window_id)
-                self.fix_window_state(saved_window_state, window_id_the_int_type)
-                if not wnck_utils.is_sticky(window_id_the_int_type) and is_sticky:
-                    wnck_utils.stick(window_id_the_int_type)
-
-                self._restore_geometry(saved_window)
-
-        except retry.NeedRetryException as ne:
-            raise ne
-        except Exception as e:
-            import traceback
-            print(traceback.format_exc())
-
-    def _restore_geometry(self, x_session_config_object: XSessionConfigObject):
-        if not self._restore_geometry_or_not:
-            return
+                status.unmatch('Window %s has been closed' % status.window_id)
+
+            windows_not_found_count = len(move_plan.windows_not_found)
+            pid = pids.get(saved_window.window_id_the_int_type) if pids else None
+            placement = move_planner.plan_window(saved_window, move_plan, pid)
+            if placement:
+                status.match(placement.running_window)
+            elif len(move_plan.windows_not_found) > windows_not_found_count:
+                status.reason = 'Process not found'
+            else:
+                status.reason = 'Window not found'
+        return move_plan
+
+    def _execute_move_plan(self, move_plan: MovePlan):
+        """
+        Do the outstanding work of each placement, and advance its restoring state.
+        """
+        moves = []
+        moving_statuses: List[WindowRestoreStatus] = []
+        windows_already_in_workspace = 0
+        for placement in move_plan.placements:
+            status = self.window_restore_states.get_or_create(placement.saved_window)
+            if status.state != WindowRestoreState.MATCHED:
+                continue
+
+            running_window = placement.running_window
+            desktop_number = int(placement.saved_window.desktop_number)
+            if not placement.need_move:
+                windows_already_in_workspace += 1
+                if not self._suppress_log_if_already_in_workspace:
+                    logger.info('"%s" has already been in Workspace %s', running_window.window_title, desktop_number)
+                status.transit(WindowRestoreState.MOVED)
+                continue
+
+            window_title = running_window.window_title
+            if string_utils.empty_string(window_title):
+                window_title = self._desktop.get_app_name(running_window.window_id_the_int_type)
+            logger.info('Moving window to desktop:           [%s : %s]', window_title, desktop_number)
+            moves.append((running_window.window_id_the_int_type, desktop_number))
+            moving_statuses.append(status)
+
+        if len(moves) > 0:
+            with self._profiler.span('move to workspaces'):
+                self._desktop.move_windows_to(moves)
+                self._retry_policy(RetryPolicies.WAIT_FOR_MOVING).call(self._desktop.are_in_workspaces, moves)
+            for status in moving_statuses:
+                status.transit(WindowRestoreState.MOVED)
+
+        with self._profiler.span('restore geometries'):
+            self._restore_geometries(move_plan.placements)
+
+        if len(move_plan.placements) > 0:
+            self._desktop.refresh_screen()
+        for placement in move_plan.placements:
+            status = self.window_restore_states.get_or_create(placement.saved_window)
+            window_id_the_int_type = placement.running_window.window_id_the_int_type
+            saved_window = placement.saved_window
+            if status.state == WindowRestoreState.GEOMETRY_APPLIED:
+                saved_window_state = saved_window.window_state if hasattr(saved_window, 'window_state') else None
+                self.fix_window_state(saved_window_state, window_id_the_int_type, refresh=False)
+                status.transit(WindowRestoreState.STATE_APPLIED)
+            if status.state == WindowRestoreState.STATE_APPLIED:
+                status.transit(WindowRestoreState.DONE)
+
+        logger.log(logging.DEBUG if self._suppress_log_if_already_in_workspace else logging.INFO,
+                   'Moved %d window(s), %d window(s) already in their Workspaces, '
+                   '%d window(s) not found, %d window(s) not matched.',
+                   len(moves),
+                   windows_already_in_workspace,
+                   len(move_plan.windows_not_found),
+                   len(move_plan.windows_not_matched))
+
+    def _finish_window_restore_states(self):
+        """
+        Mark windows which are still not restored as failed, and print the restoring states for diagnostics.
+        """
+        self.window_restore_states.fail_unfinished()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Window restoring states:')
+            self.window_restore_states.log_states()
+
+    @property
+    def windows_can_not_be_moved(self) -> List[XSessionConfigObject]:
+        return [status.saved_window for status in self.window_restore_states.in_state(WindowRestoreState.FAILED)]
 
+    def _get_saved_geometry(self, x_session_config_object: XSessionConfigObject) -> Tuple[int, int, int, int]:
         window_position = x_session_config_object.window_position
         if not hasattr(window_position, 'provider'):
-            return
+            return None
 
         provider = window_position.provider
         if provider == 'Wnck':
-            x_offset = window_position.x_offset
-            y_offset = window_position.y_offset
-            width = window_position.width
-            height = window_position.height
-            wnck_utils.set_geometry(x_session_config_object.window_id_the_int_type,
-                                    x_offset,
-                                    y_offset,
-                                    width,
-                                    height)
+            return (window_position.x_offset,
+                    window_position.y_offset,
+                    window_position.width,
+                    window_position.height)
+        return None
+
+    def _restore_geometries(self, placements: List[WindowPlacement]):
+        """
+        Restore the geometries of moved windows.
+
+        Compare the saved geometries with one snapshot of the current ones, and only set those which differ.
+        A geometry request is not issued again while the window manager is still processing it.
+        """
+        saved_geometries: Dict[int, Tuple[int, int, int, int]] = {}
+        statuses: Dict[int, WindowRestoreStatus] = {}
+        for placement in placements:
+            status = self.window_restore_states.get_or_create(placement.saved_window)
+            if status.state != WindowRestoreState.MOVED:
+                continue
+
+            saved_geometry = self._get_saved_geometry(placement.saved_window) \
+                if self._restore_geometry_or_not else None
+            if saved_geometry is None:
+                status.transit(WindowRestoreState.GEOMETRY_APPLIED)
+                continue
+
+            window_id_the_int_type = placement.running_window.window_id_the_int_type
+            saved_geometries[window_id_the_int_type] = saved_geometry
+            statuses[window_id_the_int_type] = status
+
+        if len(saved_geometries) == 0:
+            return
+
+        current_geometries = self._desktop.get_geometries(saved_geometries.keys())
+        geometries_to_be_set: Dict[int, Tuple[int, int, int, int]] = {}
+        for xid, saved_geometry in saved_geometries.items():
+            current_geometry = current_geometries.get(xid)
+            # The window may be closed or not be ready, try it next time
+            if current_geometry is None:
+                continue
+            if current_geometry == saved_geometry:
+                statuses[xid].transit(WindowRestoreState.GEOMETRY_APPLIED)
+            elif self._geometry_cache.is_exhausted(xid, saved_geometry):
+                # The window manager does not accept the saved geometry exactly, give up
+                statuses[xid].transit(WindowRestoreState.GEOMETRY_APPLIED,
+                                      'Geometry is %s instead of %s' % (current_geometry, saved_geometry))
+            elif not self._geometry_cache.is_pending(xid, saved_geometry):
+                geometries_to_be_set[xid] = saved_geometry
+
+        if len(geometries_to_be_set) == 0:
+            return
+
+        self._desktop.set_geometries(geometries_to_be_set)
+        for xid, saved_geometry in geometries_to_be_set.items():
+            self._geometry_cache.record(xid, saved_geometry)
+
+        def geometries_applied() -> bool:
+            _current_geometries = self._desktop.get_geometries(geometries_to_be_set.keys())
+            for _xid, _saved_geometry in geometries_to_be_set.items():
+                if _current_geometries.get(_xid) == _saved_geometry:
+                    statuses[_xid].transit(WindowRestoreState.GEOMETRY_APPLIED)
+            return all(statuses[_xid].state == WindowRestoreState.GEOMETRY_APPLIED for _xid in geometries_to_be_set)
+        self._retry_policy(RetryPolicies.WAIT_FOR_GEOMETRIES).call(geometries_applied)
 
     def fix_window_state(self,
                          window_state: XSessionConfigObject.WindowState,
-                         window_id_the_int_type: int):
+                         window_id_the_int_type: int,
+                         refresh: bool=True):
         if window_state:
             if window_state.is_sticky:
-                wnck_utils.stick(window_id_the_int_type)
+                self._desktop.stick(window_id_the_int_type, refresh=refresh)
             if window_state.is_above:
-                wnck_utils.make_above(window_id_the_int_type)
+                self._desktop.make_above(window_id_the_int_type, refresh=refresh)
 
     def _is_same_app(self, running_window1: XSessionConfigObject, window2: XSessionConfigObject):
-        app_name1 = wnck_utils.get_app_name(running_window1.window_id_the_int_type)
+        app_name1 = self._desktop.get_app_name(running_window1.window_id_the_int_type)
         app_name2 = window2.app_name
         if string_utils.empty_string(app_name1) \
                 or string_utils.empty_string(app_name2):
             return False
         return app_name1 == app_name2
     
-    def _is_same_window(self, running_window1: XSessionConfigObject, window2: XSessionConfigObject):
-        # Deal with JetBrains products. Move the window if they are the same project.
-        app_name1 = wnck_utils.get_app_name(running_window1.window_id_the_int_type)
-        app_name2 = window2.app_name
-        if app_name1 == app_name2 and app_name1.startswith('jetbrains-'):
-            return running_window1.window_title.split(' ')[0] == window2.window_title.split(' ')[0]
-
-        if running_window1.window_title == window2.window_title:
-            return True
-
-        return False
-
     def _is_same_cmd(self, first_cmdline: List, second_cmd: List):
-        # Remove consecutive duplicates
-        # The args could be duplicated in some apps, like Chromium-based browsers, such as Microsoft Edge 96.0.1054.43, eg: msedge --enable-crashpad --enable-crashpad
-        first_cmdline = [c[0] for c in groupby(first_cmdline) if (c[0] != "--gapplication-service" and not c[0].startswith('--pid='))]
-        second_cmd = [c[0] for c in groupby(second_cmd) if (c[0] != "--gapplication-service" and not c[0].startswith('--pid='))]
-        if len(first_cmdline) == 0 and len(second_cmd) == 0:
-            return True
-        
-        if len(first_cmdline) <= 0 or len(second_cmd) <= 0:
-            return False
-
-        first_one_is_snap_app, first_snap_app_name = snapd_workaround.Snapd.is_snap_app(first_cmdline[0])
-        if first_one_is_snap_app:
-            second_one_also_is_snap_app, second_snap_app_name = snapd_workaround.Snapd.is_snap_app(second_cmd[0])
-            if second_one_also_is_snap_app:
-                return first_snap_app_name == second_snap_app_name
-
-        return first_cmdline == second_cmd
-
+        return cmd_key(first_cmdline) == cmd_key(second_cmd)